@@ -18,11 +18,11 @@ def __(mo):
 
 @app.cell
 def __():
-    from cpgdata.rule import BaseRule
+    from cpgdata.rule import SpecRule
     from cpgdata.utils import get_package_root_path
     import polars as pl
     from pprint import pprint
-    return BaseRule, get_package_root_path, pl, pprint
+    return SpecRule, get_package_root_path, pl, pprint
 
 
 @app.cell(disabled=True)
@@ -43,17 +43,10 @@ def __(mo):
 
 
 @app.cell
-def __(BaseRule, pl, pprint):
-    class CheckSizeNotZero(BaseRule):
-        def validate(self, df: pl.LazyFrame) -> bool:
-            df = df.filter(
-                pl.col("is_dir").ne(True) & pl.col("size").eq(0)
-            ).collect()
-            pprint(df.to_dicts())
-            if len(df) != 0:
-                return False
-            else:
-                return True
+def __(SpecRule, pl):
+    class CheckSizeNotZero(SpecRule):
+        where = [pl.col("is_dir").ne(True), pl.col("size").eq(0)]
+        select = [pl.col("obj_key")]
     return CheckSizeNotZero,
 
 
@@ -70,15 +63,10 @@ def __(mo):
 
 
 @app.cell
-def __(BaseRule, pl, pprint):
-    class CheckParsingErrors(BaseRule):
-        def validate(self, df: pl.LazyFrame) -> bool:
-            df = df.filter(pl.col("is_parsing_error").eq(True)).collect()
-            pprint(df.to_dicts())
-            if len(df) != 0:
-                return False
-            else:
-                return True
+def __(SpecRule, pl):
+    class CheckParsingErrors(SpecRule):
+        where = [pl.col("is_parsing_error").eq(True)]
+        select = [pl.col("obj_key"), pl.col("error_code")]
     return CheckParsingErrors,
 
 
@@ -95,26 +83,14 @@ def __(mo):
 
 
 @app.cell
-def __(BaseRule, pl, pprint):
-    class CheckIllumExist(BaseRule):
-        def validate(self, df: pl.LazyFrame) -> bool:
-            df = (
-                df.filter(pl.col("dataset_id").str.contains("jump+"))
-                .filter(
-                    pl.col("images_images_root_dir").ne(None)
-                    | pl.col("images_illum_root_dir").ne(None)
-                )
-                .group_by(pl.col("batch_id"))
-                .select(pl.col("obj_key"))
-                .collect()
-            )
-            print(len(df))
-            pprint(df)
-            # pprint(df[0:10].to_dicts()
-            if len(df) != 0:
-                return False
-            else:
-                return True
+def __(SpecRule, pl):
+    class CheckIllumExist(SpecRule):
+        where = [
+            pl.col("dataset_id").cast(pl.Utf8).str.contains("jump+"),
+            pl.col("images_images_root_dir").ne(None)
+            | pl.col("images_illum_root_dir").ne(None),
+        ]
+        select = [pl.col("obj_key")]
     return CheckIllumExist,
 
 
@@ -131,22 +107,14 @@ def __(mo):
 
 
 @app.cell
-def __(BaseRule, pl, pprint):
-    class CheckTotalSize(BaseRule):
-        def validate(self, df: pl.LazyFrame) -> bool:
-            df = (
-                df
-                .filter(pl.col("dataset_id").eq("cpg0016-jump"))
-                .filter(pl.col("source_id").eq("source_4"))
-                .filter(pl.col("leaf_node").str.contains("Cells.csv"))
-                .select(pl.col("key"))
-                .collect()
-            )
-            pprint(df.to_dicts()[0:10])
-            if len(df) != 0:
-                return False
-            else:
-                return True
+def __(SpecRule, pl):
+    class CheckTotalSize(SpecRule):
+        where = [
+            pl.col("dataset_id").eq("cpg0016-jump"),
+            pl.col("source_id").eq("source_4"),
+            pl.col("leaf_node").str.contains("Cells.csv"),
+        ]
+        select = [pl.col("obj_key")]
     return CheckTotalSize,
 
 
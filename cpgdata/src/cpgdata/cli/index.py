@@ -48,7 +48,7 @@ def sync(out: str, bucket: str, prefix: str, force: bool, debug: bool) -> None:
         Run in debug mode.
 
     """
-    sync_s3_prefix(bucket, prefix, Path(out))
+    sync_s3_prefix(bucket, prefix, Path(out), force=force)
 
 
 @click.group
@@ -1,14 +1,15 @@
 """Inventory cli commands."""
 
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 import click
 
 from cpgdata.pipe import check as _check
+from cpgdata.pipe import diff as _diff
 from cpgdata.pipe import measure as _measure
 from cpgdata.pipe import validate
-from cpgdata.utils import sync_inventory
+from cpgdata.utils import build_inventory, sync_inventory
 
 
 @click.command(help="Sync inventory files to a local directory.")
@@ -34,10 +35,36 @@ from cpgdata.utils import sync_inventory
     default="cellpainting-gallery/whole_bucket/",
 )
 @click.option(
-    "-f", "--force", is_flag=True, help="Force re-generating all measurement files."
+    "-r",
+    "--revision",
+    type=click.INT,
+    help="Revision to sync, 0 is the latest revision.",
+    default=0,
+)
+@click.option(
+    "-f", "--force", is_flag=True, help="Force re-verifying all synced files."
+)
+@click.option(
+    "--metrics-dir",
+    type=click.Path(),
+    help="Path to write the run report with stage timings and counters.",
+)
+@click.option(
+    "--prometheus",
+    is_flag=True,
+    help="Also write the run report in the Prometheus text format.",
 )
 @click.option("-d", "--debug", is_flag=True, help="Run in debug mode.")
-def sync(out: str, bucket: str, prefix: str, force: bool, debug: bool) -> None:
+def sync(
+    out: str,
+    bucket: str,
+    prefix: str,
+    revision: int,
+    force: bool,
+    metrics_dir: Optional[str],
+    prometheus: bool,
+    debug: bool,
+) -> None:
     """Sync inventory files to a local directory.
 
     Parameters
@@ -48,12 +75,86 @@ def sync(out: str, bucket: str, prefix: str, force: bool, debug: bool) -> None:
         Bucket name.
     prefix: str
         Bucket prefix.
+    revision : int
+        Revision to sync.
     force : bool
-        Force re-validation.
+        Force re-verifying checksums of all synced files.
+    metrics_dir : Optional[str]
+        Path to write the run report.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
+    debug : bool
+        Run in debug mode.
+    """
+    sync_inventory(
+        bucket,
+        prefix,
+        Path(out),
+        revision,
+        force,
+        metrics_dir=Path(metrics_dir) if metrics_dir else None,
+        prometheus=prometheus,
+    )
+
+
+@click.command(help="Build an inventory from a local tree or an S3 listing.")
+@click.option(
+    "-i",
+    "--inp",
+    type=click.STRING,
+    help="Local directory or s3://bucket/prefix to list.",
+    required=True,
+)
+@click.option(
+    "-o",
+    "--out",
+    type=click.Path(),
+    help="Path to write the inventory file",
+    required=True,
+)
+@click.option(
+    "-b",
+    "--bucket",
+    type=click.STRING,
+    help="Bucket name recorded for local files.",
+    default="cellpainting-gallery",
+)
+@click.option(
+    "-p",
+    "--prefix",
+    type=click.STRING,
+    help="S3 prefix the local files are uploaded to.",
+    default="",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.INT,
+    help="Number of concurrent list requests or directory scans.",
+    default=32,
+)
+@click.option("-d", "--debug", is_flag=True, help="Run in debug mode.")
+def build(inp: str, out: str, bucket: str, prefix: str, jobs: int, debug: bool) -> None:
+    """Build an inventory from a local tree or an S3 listing.
+
+    Parameters
+    ----------
+    inp : str
+        Local directory or S3 url to list.
+    out : str
+        Path to output inventory.
+    bucket: str
+        Bucket name recorded for local files.
+    prefix: str
+        S3 prefix the local files are uploaded to.
+    jobs : int
+        Number of concurrent list requests or directory scans.
     debug : bool
         Run in debug mode.
     """
-    sync_inventory(bucket, prefix, Path(out))
+    out_file = Path(out).joinpath("inventory.parquet")
+    num_rows = build_inventory(inp, out_file, bucket, prefix, jobs)
+    print(f"Listed {num_rows} objects to {out_file}")
 
 
 @click.command()
@@ -97,7 +198,7 @@ def gen(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -> No
     debug : bool
         Run in debug mode.
     """
-    validate(Path(inp), Path(out), jobs=jobs)
+    validate(Path(inp), Path(out), jobs=jobs, force=force)
 
 
 @click.command()
@@ -141,7 +242,7 @@ def val(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -> No
     debug : bool
         Run in debug mode.
     """
-    validate(Path(inp), Path(out), jobs=jobs)
+    validate(Path(inp), Path(out), jobs=jobs, force=force)
 
 
 @click.command()
@@ -165,11 +266,91 @@ def val(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -> No
     type=click.INT,
     help="Number of jobs to launch.",
 )
+@click.option(
+    "-e",
+    "--engine",
+    type=click.Choice(["columnar", "pydantic"]),
+    help="Measurement engine, pydantic is the row wise reference implementation.",
+    default="columnar",
+)
+@click.option(
+    "-t",
+    "--parse-threads",
+    type=click.INT,
+    help="Number of native prefix parser threads per job, 0 uses all cores.",
+    default=1,
+)
+@click.option(
+    "--parse-cache-size",
+    type=click.INT,
+    help="Number of directories cached by the prefix parser per job, 0 disables it.",
+    default=4096,
+)
+@click.option(
+    "--project",
+    is_flag=True,
+    help="Only read inventory columns needed by the rules, the rest is null.",
+)
+@click.option(
+    "-c",
+    "--column",
+    type=click.STRING,
+    multiple=True,
+    help="Additional inventory column to read with --project.",
+)
+@click.option(
+    "--partition",
+    is_flag=True,
+    help="Write measurements partitioned by dataset_id and source_id.",
+)
+@click.option(
+    "--split-row-groups",
+    is_flag=True,
+    help="Split large inventory files across jobs by row groups.",
+)
+@click.option(
+    "--compact",
+    is_flag=True,
+    help="Merge the measurement parts of split inventory files.",
+)
+@click.option(
+    "--pipeline-workers",
+    type=click.INT,
+    help="Number of measure threads per job overlapping reads and writes.",
+    default=0,
+)
 @click.option(
     "-f", "--force", is_flag=True, help="Force re-generating all measurement files."
 )
+@click.option(
+    "--metrics-dir",
+    type=click.Path(),
+    help="Path to write the run report with stage timings and counters.",
+)
+@click.option(
+    "--prometheus",
+    is_flag=True,
+    help="Also write the run report in the Prometheus text format.",
+)
 @click.option("-d", "--debug", is_flag=True, help="Run in debug mode.")
-def measure(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -> None:
+def measure(
+    inp: str,
+    out: str,
+    jobs: Optional[int],
+    engine: str,
+    parse_threads: int,
+    parse_cache_size: int,
+    project: bool,
+    column: Tuple[str, ...],
+    partition: bool,
+    split_row_groups: bool,
+    compact: bool,
+    pipeline_workers: int,
+    force: bool,
+    metrics_dir: Optional[str],
+    prometheus: bool,
+    debug: bool,
+) -> None:
     """Run measurement module.
 
     Parameters
@@ -180,12 +361,50 @@ def measure(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -
         Path to output reports.
     jobs: Optional[int]
         Number of jobs to launch.
+    engine : str
+        Measurement engine.
+    parse_threads : int
+        Number of native prefix parser threads per job.
+    parse_cache_size : int
+        Number of directories cached by the prefix parser per job.
+    project : bool
+        Only read inventory columns needed by the rules.
+    column : Tuple[str, ...]
+        Additional inventory columns to read.
+    partition : bool
+        Write a hive partitioned measurement dataset.
+    split_row_groups : bool
+        Split large inventory files across jobs.
+    compact : bool
+        Merge the measurement parts of split inventory files.
+    pipeline_workers : int
+        Number of measure threads per job, 0 measures sequentially.
     force : bool
         Force re-validation.
+    metrics_dir : Optional[str]
+        Path to write the run report.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
     debug : bool
         Run in debug mode.
     """
-    _measure(Path(inp), Path(out), jobs=jobs)
+    _measure(
+        Path(inp),
+        Path(out),
+        jobs=jobs,
+        engine=engine,
+        parse_threads=parse_threads,
+        project=project,
+        columns=list(column),
+        force=force,
+        parse_cache_size=parse_cache_size,
+        partition=partition,
+        split_row_groups=split_row_groups,
+        compact=compact,
+        pipeline_workers=pipeline_workers,
+        metrics_dir=Path(metrics_dir) if metrics_dir else None,
+        prometheus=prometheus,
+    )
 
 
 @click.command()
@@ -209,11 +428,27 @@ def measure(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -
     type=click.INT,
     help="Number of jobs to launch.",
 )
+@click.option("-f", "--force", is_flag=True, help="Force re-evaluating all rules.")
 @click.option(
-    "-f", "--force", is_flag=True, help="Force re-generating all measurement files."
+    "--metrics-dir",
+    type=click.Path(),
+    help="Path to write the run report with stage timings and counters.",
+)
+@click.option(
+    "--prometheus",
+    is_flag=True,
+    help="Also write the run report in the Prometheus text format.",
 )
 @click.option("-d", "--debug", is_flag=True, help="Run in debug mode.")
-def check(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) -> None:
+def check(
+    inp: str,
+    out: str,
+    jobs: Optional[int],
+    force: bool,
+    metrics_dir: Optional[str],
+    prometheus: bool,
+    debug: bool,
+) -> None:
     """Run check module.
 
     Parameters
@@ -226,10 +461,74 @@ def check(inp: str, out: str, jobs: Optional[int], force: bool, debug: bool) ->
         Number of jobs to launch.
     force : bool
         Force re-validation.
+    metrics_dir : Optional[str]
+        Path to write the run report.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
+    debug : bool
+        Run in debug mode.
+    """
+    _check(
+        Path(inp),
+        Path(out),
+        jobs=jobs,
+        force=force,
+        metrics_dir=Path(metrics_dir) if metrics_dir else None,
+        prometheus=prometheus,
+    )
+
+
+@click.command(help="Measure and check changes between two inventory revisions.")
+@click.option(
+    "--old",
+    type=click.Path(),
+    help="Path to read inventory files of the old revision",
+    required=True,
+)
+@click.option(
+    "--new",
+    type=click.Path(),
+    help="Path to read inventory files of the new revision",
+    required=True,
+)
+@click.option(
+    "-o",
+    "--out",
+    type=click.Path(),
+    help="Path to write generated delta files",
+    required=True,
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.INT,
+    help="Number of jobs to launch.",
+)
+@click.option(
+    "-f", "--force", is_flag=True, help="Force re-generating all measurement files."
+)
+@click.option("-d", "--debug", is_flag=True, help="Run in debug mode.")
+def diff(
+    old: str, new: str, out: str, jobs: Optional[int], force: bool, debug: bool
+) -> None:
+    """Run measurement and check modules on the delta between revisions.
+
+    Parameters
+    ----------
+    old : str
+        Path to the old inventory.
+    new : str
+        Path to the new inventory.
+    out : str
+        Path to output delta files.
+    jobs: Optional[int]
+        Number of jobs to launch.
+    force : bool
+        Force re-validation.
     debug : bool
         Run in debug mode.
     """
-    _check(Path(inp), Path(out), jobs=jobs)
+    _diff(Path(old), Path(new), Path(out), jobs=jobs, force=force)
 
 
 @click.group
@@ -240,6 +539,8 @@ def inventory() -> None:
 
 inventory.add_command(val)
 inventory.add_command(sync)
+inventory.add_command(build)
 inventory.add_command(gen)
 inventory.add_command(measure)
 inventory.add_command(check)
+inventory.add_command(diff)
@@ -7,6 +7,7 @@ or S3 API.
 from functools import lru_cache
 from typing import Any, List
 
+import polars as pl
 from pydantic import ValidationInfo
 
 
@@ -144,3 +145,58 @@ def get_file_type(key: str) -> bool:
         return True
     else:
         return False
+
+
+def is_dir_expr(key: pl.Expr) -> pl.Expr:
+    """Columnar version of `get_is_dir`.
+
+    Parameters
+    ----------
+    key : pl.Expr
+        Expression for object keys on S3.
+
+    Returns
+    -------
+    pl.Expr
+        True if key is a dir else False.
+    """
+    return key.str.ends_with("/")
+
+
+def key_parts_expr(key: pl.Expr) -> pl.Expr:
+    """Columnar version of `get_key_parts`.
+
+    Parameters
+    ----------
+    key : pl.Expr
+        Expression for object keys on S3.
+
+    Returns
+    -------
+    pl.Expr
+        A list of key parts.
+    """
+    return key.str.split("/")
+
+
+def workspace_dir_expr(workspace_root_dir: pl.Expr) -> pl.Expr:
+    """Extract workspace folder from the parsed workspace root dir.
+
+    Mirrors `str(workspace_root_dir).split("/")[0]`, so a missing
+    workspace root dir maps to the string "None".
+
+    Parameters
+    ----------
+    workspace_root_dir : pl.Expr
+        Expression for the parsed workspace root dir.
+
+    Returns
+    -------
+    pl.Expr
+        Workspace folder.
+    """
+    return (
+        pl.when(workspace_root_dir.is_null())
+        .then(pl.lit("None"))
+        .otherwise(workspace_root_dir.str.split("/").list.first())
+    )
@@ -0,0 +1,427 @@
+"""Run metrics.
+
+This module collects per stage timings and counters of pipeline runs and
+writes them as machine readable run reports.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Generator, List, Optional
+
+import pyarrow as pa
+from pyarrow import parquet as pq
+
+# Prefix of the metric names in run reports
+METRIC_PREFIX = "cpgdata"
+
+
+def get_peak_rss() -> int:
+    """Get the peak resident set size of the current process.
+
+    Returns
+    -------
+    int
+        Peak resident set size in bytes, 0 if it is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class StageCounter:
+    """Throughput counter of a pipeline stage.
+
+    Parameters
+    ----------
+    name : str
+        Stage name.
+    workers : int
+        Number of threads running the stage.
+    """
+
+    def __init__(self: "StageCounter", name: str, workers: int = 1) -> None:
+        """Initialize the counter of a stage without processed rows.
+
+        Parameters
+        ----------
+        name : str
+            Stage name.
+        workers : int
+            Number of threads running the stage.
+        """
+        self.name = name
+        self.workers = workers
+        self.rows = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self: "StageCounter", rows: int, busy: float) -> None:
+        """Record a processed batch.
+
+        Parameters
+        ----------
+        rows : int
+            Number of rows in the batch.
+        busy : float
+            Seconds spent processing the batch.
+        """
+        with self._lock:
+            self.rows += rows
+            self.busy += busy
+
+    def rows_per_sec(self: "StageCounter") -> float:
+        """Get the throughput of the stage if it never waited on other stages.
+
+        Returns
+        -------
+        float
+            Rows processed per second.
+        """
+        if self.busy == 0:
+            return 0.0
+        return self.rows * self.workers / self.busy
+
+
+class RunMetrics:
+    """Stage timings and counters of a worker.
+
+    Metrics are recorded in the worker and returned as a snapshot, which
+    the driver merges into the run report.
+    """
+
+    def __init__(self: "RunMetrics") -> None:
+        """Initialize metrics without stages or counters."""
+        self.stages: Dict[str, StageCounter] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def stage(self: "RunMetrics", name: str, workers: int = 1) -> StageCounter:
+        """Get the counter of a stage, created on first use.
+
+        Parameters
+        ----------
+        name : str
+            Stage name.
+        workers : int
+            Number of threads running the stage.
+
+        Returns
+        -------
+        StageCounter
+            Stage counter.
+        """
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageCounter(name, workers)
+            return self.stages[name]
+
+    def get_stages(self: "RunMetrics") -> List[StageCounter]:
+        """Get the counters of the stages created so far.
+
+        Stages are created by the threads running them, so the counters are
+        copied under the lock before they are iterated.
+
+        Returns
+        -------
+        List[StageCounter]
+            Stage counters in creation order.
+        """
+        with self._lock:
+            return list(self.stages.values())
+
+    @contextmanager
+    def timed(self: "RunMetrics", name: str, rows: int = 0) -> Generator:
+        """Time a block as work of a stage.
+
+        Parameters
+        ----------
+        name : str
+            Stage name.
+        rows : int
+            Number of rows processed by the block.
+
+        Yields
+        ------
+        None
+            Control to the timed block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(name).add(rows, time.perf_counter() - start)
+
+    def inc(self: "RunMetrics", name: str, value: float = 1) -> None:
+        """Increment a counter.
+
+        Parameters
+        ----------
+        name : str
+            Counter name, like `bytes_read` or `parse_errors`.
+        value : float
+            Increment.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self: "RunMetrics") -> dict:
+        """Get the metrics recorded so far.
+
+        Returns
+        -------
+        dict
+            Process id, peak RSS, stages and counters of the worker.
+        """
+        return {
+            "pid": os.getpid(),
+            "peak_rss_bytes": get_peak_rss(),
+            "stages": {
+                stage.name: {
+                    "rows": stage.rows,
+                    "seconds": stage.busy,
+                    "workers": stage.workers,
+                }
+                for stage in self.get_stages()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    """Merge worker snapshots into a run summary.
+
+    Snapshots of the same process are merged into one worker, stage rows,
+    seconds and counters are summed over all workers.
+
+    Parameters
+    ----------
+    snapshots : List[dict]
+        Snapshots, see `RunMetrics.snapshot`.
+
+    Returns
+    -------
+    dict
+        Summed stages and counters, and the merged workers.
+    """
+    workers: Dict[int, dict] = {}
+    for snapshot in snapshots:
+        worker = workers.setdefault(
+            snapshot["pid"],
+            {"pid": snapshot["pid"], "peak_rss_bytes": 0, "stages": {}, "counters": {}},
+        )
+        worker["peak_rss_bytes"] = max(
+            worker["peak_rss_bytes"], snapshot["peak_rss_bytes"]
+        )
+        merge_metrics(worker, snapshot)
+    summary: dict = {"stages": {}, "counters": {}}
+    for worker in workers.values():
+        merge_metrics(summary, worker)
+    for stage in summary["stages"].values():
+        stage["rows_per_sec"] = (
+            stage["rows"] * stage["workers"] / stage["seconds"]
+            if stage["seconds"] != 0
+            else 0.0
+        )
+    summary["workers"] = list(workers.values())
+    return summary
+
+
+def merge_metrics(target: dict, source: dict) -> None:
+    """Add the stages and counters of a snapshot to another one.
+
+    Parameters
+    ----------
+    target : dict
+        Snapshot to update.
+    source : dict
+        Snapshot to add.
+    """
+    for name, stage in source["stages"].items():
+        merged = target["stages"].setdefault(
+            name, {"rows": 0, "seconds": 0.0, "workers": stage["workers"]}
+        )
+        merged["rows"] += stage["rows"]
+        merged["seconds"] += stage["seconds"]
+    for name, value in source["counters"].items():
+        target["counters"][name] = target["counters"].get(name, 0) + value
+
+
+def gen_metric_samples(report: dict) -> List[dict]:
+    """Flatten a run report into metric samples.
+
+    Parameters
+    ----------
+    report : dict
+        Run report, see `write_run_report`.
+
+    Returns
+    -------
+    List[dict]
+        Samples with a metric name, labels and a value.
+    """
+    command = report["command"]
+    samples = [
+        {
+            "metric": "run_wall_seconds",
+            "labels": {"command": command},
+            "value": report["wall_seconds"],
+        }
+    ]
+    for name, stage in report["stages"].items():
+        for field in ["rows", "seconds", "rows_per_sec"]:
+            samples.append(
+                {
+                    "metric": f"stage_{field}",
+                    "labels": {"command": command, "stage": name},
+                    "value": stage[field],
+                }
+            )
+    for name, value in report["counters"].items():
+        samples.append({"metric": name, "labels": {"command": command}, "value": value})
+    for worker in report["workers"]:
+        samples.append(
+            {
+                "metric": "worker_peak_rss_bytes",
+                "labels": {"command": command, "pid": str(worker["pid"])},
+                "value": worker["peak_rss_bytes"],
+            }
+        )
+    return samples
+
+
+def format_prometheus(samples: List[dict]) -> str:
+    """Format metric samples in the Prometheus text format.
+
+    Parameters
+    ----------
+    samples : List[dict]
+        Samples, see `gen_metric_samples`.
+
+    Returns
+    -------
+    str
+        Prometheus text exposition, e.g. for the node exporter textfile
+        collector.
+    """
+    lines = []
+    typed = set()
+    for sample in samples:
+        name = f"{METRIC_PREFIX}_{sample['metric']}"
+        if name not in typed:
+            lines.append(f"# TYPE {name} gauge")
+            typed.add(name)
+        labels = ",".join(
+            f'{key}="{value}"' for key, value in sorted(sample["labels"].items())
+        )
+        lines.append(f"{name}{{{labels}}} {sample['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_run_report(
+    report_dir: Path,
+    command: str,
+    snapshots: List[dict],
+    wall_seconds: float,
+    prometheus: bool = False,
+) -> Path:
+    """Write the run report of a command.
+
+    The report is written as `<command>.json` with the summary and the
+    workers, and as `<command>.parquet` with one row per metric sample.
+
+    Parameters
+    ----------
+    report_dir : Path
+        Path to dir to write the report.
+    command : str
+        Name of the command, like `measure` or `check`.
+    snapshots : List[dict]
+        Worker snapshots, see `RunMetrics.snapshot`.
+    wall_seconds : float
+        Wall time of the run.
+    prometheus : bool
+        Also write `<command>.prom` in the Prometheus text format.
+
+    Returns
+    -------
+    Path
+        Path to the JSON report.
+    """
+    report = {
+        "command": command,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "wall_seconds": wall_seconds,
+        **merge_snapshots(snapshots),
+    }
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_json = report_dir.joinpath(f"{command}.json")
+    with report_json.open("w") as f:
+        json.dump(report, f, indent=2)
+    samples = gen_metric_samples(report)
+    pq.write_table(
+        pa.Table.from_pylist(
+            [
+                {
+                    "metric": sample["metric"],
+                    "command": command,
+                    "stage": sample["labels"].get("stage"),
+                    "pid": sample["labels"].get("pid"),
+                    "value": float(sample["value"]),
+                }
+                for sample in samples
+            ],
+            schema=pa.schema(
+                [
+                    ("metric", pa.string()),
+                    ("command", pa.string()),
+                    ("stage", pa.string()),
+                    ("pid", pa.string()),
+                    ("value", pa.float64()),
+                ]
+            ),
+        ),
+        report_dir.joinpath(f"{command}.parquet"),
+    )
+    if prometheus is True:
+        report_dir.joinpath(f"{command}.prom").write_text(format_prometheus(samples))
+    return report_json
+
+
+def write_metrics(
+    report_dir: Optional[Path],
+    command: str,
+    snapshots: List[dict],
+    start: float,
+    prometheus: bool = False,
+) -> None:
+    """Write the run report of a command if a report dir is given.
+
+    Parameters
+    ----------
+    report_dir : Optional[Path]
+        Path to dir to write the report, nothing is written if missing.
+    command : str
+        Name of the command.
+    snapshots : List[dict]
+        Worker snapshots, see `RunMetrics.snapshot`.
+    start : float
+        `time.perf_counter` at the start of the run.
+    prometheus : bool
+        Also write the report in the Prometheus text format.
+    """
+    if report_dir is None:
+        return
+    report_json = write_run_report(
+        report_dir, command, snapshots, time.perf_counter() - start, prometheus
+    )
+    print(f"Run report written to {report_json}")
@@ -9,7 +9,7 @@ The parsed inputs can later be passed to the
 
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
 
 import pyarrow as pa
 from lark import Lark
@@ -19,7 +19,9 @@ from pydantic import (
     BeforeValidator,
     ConfigDict,
     Field,
+    ValidationError,
     computed_field,
+    create_model,
 )
 from typing_extensions import Annotated
 
@@ -85,9 +87,100 @@ class WorkspaceFolder(Enum):
     ASSAY_DEV = "assaydev"
     PIPELINES = "pipelines"
     SOFTWARE = "software"
+    EMBEDDINGS = "embeddings"
+    SEGMENTATION = "segmentation"
+    SCRATCH = "scratch"
     NONE = "None"
 
 
+class ErrorCode(Enum):
+    """Enum for measurement error codes."""
+
+    PARSE = "parse_error"
+    VALIDATION = "validation_error"
+    VALUE = "value_error"
+
+
+class MeasurementError(NamedTuple):
+    """Compact error of a key that failed to measure."""
+
+    obj_key: Optional[str]
+    error_code: str
+    # Grammar rule expected by the parser, or model field that failed
+    error_rule: Optional[str]
+    # Byte position in the key where parsing failed
+    error_pos: Optional[int]
+    # Message without the key, so it is shared by the errors of many keys
+    error_message: str
+
+    @staticmethod
+    def from_null_key() -> "MeasurementError":
+        """Generate the parse error of a missing key.
+
+        Returns
+        -------
+        "MeasurementError"
+            Parse error, same as the one of `cpgparser.parse_prefixes`.
+        """
+        return MeasurementError(None, ErrorCode.PARSE.value, None, None, "key is null")
+
+    @staticmethod
+    def from_parse_error(obj_key: str, e: ValueError) -> "MeasurementError":
+        """Generate an error from a prefix parser error.
+
+        Parameters
+        ----------
+        obj_key : str
+            Object key.
+        e : ValueError
+            Error raised by `cpgparser.parse_prefix`, with the `message`, `rule`
+            and `pos` attributes since cpgparser 0.5.
+
+        Returns
+        -------
+        "MeasurementError"
+            Parse error.
+        """
+        return MeasurementError(
+            obj_key,
+            ErrorCode.PARSE.value,
+            getattr(e, "rule", None),
+            getattr(e, "pos", None),
+            getattr(e, "message", str(e)),
+        )
+
+    @staticmethod
+    def from_exception(obj_key: str, e: ValueError) -> "MeasurementError":
+        """Generate an error from a validation error.
+
+        Parameters
+        ----------
+        obj_key : str
+            Object key.
+        e : ValueError
+            Pydantic validation error, or value error of a computed field.
+
+        Returns
+        -------
+        "MeasurementError"
+            Validation or value error.
+        """
+        if not isinstance(e, ValidationError):
+            return MeasurementError(obj_key, ErrorCode.VALUE.value, None, None, str(e))
+        # Error details without the input values
+        details = [
+            (".".join(str(loc) for loc in detail["loc"]), detail["msg"])
+            for detail in e.errors(include_url=False)
+        ]
+        return MeasurementError(
+            obj_key,
+            ErrorCode.VALIDATION.value,
+            details[0][0] if len(details) != 0 else None,
+            None,
+            "; ".join(f"{loc}: {msg}" for loc, msg in details),
+        )
+
+
 class File(BaseModel):
     """Parser for a file object."""
 
@@ -181,7 +274,7 @@ class MeasuredPrefix(InventoryRowParser, ParsedPrefix):
     """Generate measurement for a prefix."""
 
     is_parsing_error: bool = Field(default=False)
-    errors: Optional[str] = Field(default=None)
+    error_code: Optional[str] = Field(default=None)
     is_dir: Annotated[bool, BeforeValidator(get_is_dir)] = Field(
         validation_alias="key", default=False
     )
@@ -219,29 +312,52 @@ class MeasuredPrefix(InventoryRowParser, ParsedPrefix):
         return {**model_fields, **self.model_computed_fields}
 
     @staticmethod
-    def gen_error_entry(obj_key: str, e: Exception) -> "MeasuredPrefix":
+    def gen_error_entry(error: MeasurementError) -> "MeasuredPrefix":
         """Generate an error entry for the parsed object.
 
         Parameters
         ----------
-        obj_key : str
-            Object key.
-        e : Exception
-            Pydantic validation error.
+        error : MeasurementError
+            Error of the object, its details are written separately.
 
         Returns
         -------
         "MeasuredPrefix"
-           Validation error as a parsed object.
+           Error as a parsed object.
         """
-        print(f"I am called with the error {e}")
         return MeasuredPrefix.model_construct(
-            obj_key=obj_key,
+            obj_key=error.obj_key,
             is_parsing_error=True,
-            errors=str(e),
+            error_code=error.error_code,
         )
 
 
+def gen_projected_model(columns: List[str]) -> Type[MeasuredPrefix]:
+    """Generate a measurement model for a projected inventory read.
+
+    Inventory fields whose column is not in `columns` become optional
+    with a `None` default, so they are filled with nulls.
+
+    Parameters
+    ----------
+    columns : List[str]
+        Inventory columns that are read.
+
+    Returns
+    -------
+    Type[MeasuredPrefix]
+        Measurement model for the projection.
+    """
+    dropped_fields: Dict[str, Tuple[Any, None]] = {
+        name: (Optional[field.annotation], None)  # type: ignore
+        for name, field in InventoryRowParser.model_fields.items()
+        if (field.validation_alias or name) not in columns
+    }
+    return create_model(  # type: ignore
+        "ProjectedMeasuredPrefix", __base__=MeasuredPrefix, **dropped_fields
+    )
+
+
 py_to_pa = {
     int: pa.int64(),
     str: pa.string(),
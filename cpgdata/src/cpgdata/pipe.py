@@ -4,24 +4,134 @@ This module collects data I/O and transformers into a
 sequentially parallel pipeline.
 """
 
+import hashlib
+import json
 import math
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any, Generator, List, Optional, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    get_args,
+)
+from urllib.parse import quote, unquote
 
 import cpgparser
 import polars as pl
 import pyarrow as pa
-from lark import ParseError
+import pyarrow.compute as pc
+from joblib import cpu_count
 from pyarrow import parquet as pq
-from pyarrow.parquet import FileMetaData
-from pydantic import TypeAdapter, ValidationError
+from pydantic import TypeAdapter
 from pydantic.fields import ComputedFieldInfo, FieldInfo
 from tqdm import tqdm
 
-from cpgdata.parser import MeasuredPrefix, py_to_pa
-from cpgdata.rule import BaseRule, CheckJUMPProjectStructure, CheckWorkspaceDirs
-from cpgdata.utils import parallel
+from cpgdata.measurement import is_dir_expr, key_parts_expr, workspace_dir_expr
+from cpgdata.metrics import RunMetrics, StageCounter, write_metrics
+from cpgdata.parser import (
+    ErrorCode,
+    InventoryRowParser,
+    MeasuredPrefix,
+    MeasurementError,
+    ParsedPrefix,
+    WorkspaceFolder,
+    gen_projected_model,
+    py_to_pa,
+)
+from cpgdata.rule import (
+    PARTITION_COLUMNS,
+    RULE_CACHE_DIR,
+    RULE_PARTIALS_DIR,
+    BaseRule,
+    CheckJUMPProjectStructure,
+    CheckParsingErrors,
+    CheckWorkspaceDirs,
+    PartialStore,
+    RuleCache,
+    evaluate_rules,
+    get_files_fingerprint,
+    sink_plan,
+)
+from cpgdata.utils import (
+    INVENTORY_MANIFEST,
+    S3_INVENTORY_SCHEMA,
+    get_unreported_fields,
+    parallel,
+)
+
+# Number of inventory rows measured and written at a time
+MEASUREMENT_BATCH_SIZE = 10000
+# Manifest of measured inventory files, written next to the measurements
+MEASUREMENT_MANIFEST = "manifest.json"
+
+# Low cardinality measurement columns, stored dictionary encoded
+DICTIONARY_COLUMNS = {
+    "bucket",
+    "storage_class",
+    "replication_status",
+    "encryption_status",
+    "object_lock_mode",
+    "object_lock_legal_hold_status",
+    "intelligent_tiering_access_tier",
+    "bucket_key_status",
+    "checksum_algorithm",
+    "object_owner",
+    "sep",
+    "images",
+    "workspace",
+    "workspace_dl",
+    "dataset_id",
+    "source_id",
+    "batch_id",
+    "plate_id",
+    "extension",
+    "workspace_dir",
+    "error_code",
+}
+
+# Compact errors of the keys that failed to measure, written next to the
+# measurements. Rules and messages are stored once per row group.
+MEASUREMENT_ERRORS_DIR = "errors"
+ERRORS_SCHEMA = pa.schema(
+    [
+        ("obj_key", pa.string()),
+        ("error_code", pa.dictionary(pa.int32(), pa.string())),
+        ("error_rule", pa.dictionary(pa.int32(), pa.string())),
+        ("error_pos", pa.int64()),
+        ("error_message", pa.dictionary(pa.int32(), pa.string())),
+    ]
+)
+
+# Measurement parquet writer settings
+MEASUREMENT_COMPRESSION = "zstd"
+MEASUREMENT_ROW_GROUP_SIZE = 100000
+
+# Measurement tasks planned per job when splitting inventory files
+MEASUREMENT_TASKS_PER_JOB = 4
+
+# Number of measured batches buffered per worker of a pipelined measurement
+MEASUREMENT_PIPELINE_DEPTH = 2
+
+# Hive partitioning of the measurement dataset
+MEASUREMENT_PARTITION_COLUMNS = PARTITION_COLUMNS
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Measurement types of the inventory columns kept only if already decoded as such
+PASSTHROUGH_TYPES = {pa.string(): pl.Utf8, pa.bool_(): pl.Boolean}
 
 
 def get_field_type(model_field: Union[FieldInfo, ComputedFieldInfo]) -> Any:  # noqa
@@ -59,136 +169,1350 @@ def gen_pq_schema(pydantic_model: Type[MeasuredPrefix]) -> pa.Schema:
     """
     constructed_model = pydantic_model.model_construct()
     model_fields = constructed_model.get_all_fields()
-    schema = [
-        pa.field(key, py_to_pa[get_field_type(val)])  # noqa
-        for key, val in model_fields.items()
-    ]
+    schema = []
+    for key, val in model_fields.items():
+        pa_type = py_to_pa[get_field_type(val)]  # noqa
+        if key in DICTIONARY_COLUMNS:
+            pa_type = pa.dictionary(pa.int32(), pa_type)
+        schema.append(pa.field(key, pa_type))
     return pa.schema(schema)
 
 
-def gen_lazy_slice(lazy_df: pl.LazyFrame, metadata: FileMetaData) -> Generator:
-    """Split dataframe using row groups as boundaries.
+def get_inventory_columns() -> List[str]:
+    """Get names of the inventory columns read by the measurements.
+
+    Returns
+    -------
+    List[str]
+        Inventory column names.
+    """
+    return [
+        field.validation_alias if isinstance(field.validation_alias, str) else name
+        for name, field in InventoryRowParser.model_fields.items()
+    ]
+
+
+def get_projected_columns(
+    rules: List[BaseRule], columns: Optional[List[str]] = None
+) -> List[str]:
+    """Get inventory columns needed by the rules.
+
+    Parameters
+    ----------
+    rules : List[BaseRule]
+        Rules that will be applied on the measurements.
+    columns : Optional[List[str]]
+        Additional inventory or measurement columns to read.
+
+    Returns
+    -------
+    List[str]
+        Inventory column names, always including the object key.
+    """
+    needed = {col for rule in rules for col in rule.columns} | set(columns or [])
+    return [
+        col
+        for col, name in zip(get_inventory_columns(), InventoryRowParser.model_fields)
+        if col == "key" or col in needed or name in needed
+    ]
+
+
+def gen_inventory_batches(
+    file: Path,
+    columns: Optional[List[str]] = None,
+    batch_size: int = MEASUREMENT_BATCH_SIZE,
+    row_groups: Optional[List[int]] = None,
+) -> Generator[pl.DataFrame, None, None]:
+    """Stream an inventory parquet file in bounded batches.
+
+    Only the inventory columns used by the measurements are decoded, and
+    batches are read sequentially across row groups, so memory usage does
+    not depend on the row group size of the inventory file.
 
     Parameters
     ----------
-    lazy_df : pl.LazyFrame
-        Polars lazy dataframe.
-    metadata : FileMetaData
-        Parquet metadata for row group information.
+    file : Path
+        Path to the raw inventory parquet file.
+    columns : Optional[List[str]]
+        Inventory columns to read, defaults to all inventory columns.
+    batch_size : int
+        Maximum number of rows per batch.
+    row_groups : Optional[List[int]]
+        Row groups to read, defaults to all row groups.
+
+    Yields
+    ------
+    pl.DataFrame
+        Polars dataframe for the batch.
     """
-    row_groups = metadata.num_row_groups
-    num_rows = [metadata.row_group(i).num_rows for i in range(row_groups)]
-    offsets = [sum(num_rows[0:i]) for i in range(row_groups)]
-    for row in range(row_groups):
-        yield lazy_df.slice(offsets[row], metadata.row_group(row).num_rows)
+    pq_file = pq.ParquetFile(file)
+    file_columns = set(pq_file.schema_arrow.names)
+    columns = [col for col in columns or get_inventory_columns() if col in file_columns]
+    for record_batch in pq_file.iter_batches(
+        batch_size=batch_size, row_groups=row_groups, columns=columns
+    ):
+        yield pl.from_arrow(record_batch)  # type: ignore
+
+
+def measure_row(
+    row: dict, measured_prefix_adapter: TypeAdapter
+) -> Tuple[dict, Optional[MeasurementError]]:
+    """Generate measurements for an inventory row.
+
+    Parameters
+    ----------
+    row : dict
+        Inventory row.
+    measured_prefix_adapter : TypeAdapter
+        Adapter of the measurement model.
+
+    Returns
+    -------
+    Tuple[dict, Optional[MeasurementError]]
+        Measurements, and the error if the row failed to measure.
+    """
+    if row["key"] is None:
+        error = MeasurementError.from_null_key()
+        return MeasuredPrefix.gen_error_entry(error).model_dump(), error
+    try:
+        parsed_prefix_dict = cpgparser.parse_prefix(row["key"])  # type: ignore
+    except ValueError as e:
+        error = MeasurementError.from_parse_error(row["key"], e)
+        return MeasuredPrefix.gen_error_entry(error).model_dump(), error
+    try:
+        measured_prefix = measured_prefix_adapter.validate_python(
+            {**row, **parsed_prefix_dict}
+        ).model_dump()
+    except ValueError as e:
+        # Also catches pydantic ValidationError
+        error = MeasurementError.from_exception(row["key"], e)
+        return MeasuredPrefix.gen_error_entry(error).model_dump(), error
+    return measured_prefix, None
+
+
+def gen_errors_table(errors: List[MeasurementError]) -> pa.Table:
+    """Convert measurement errors to a table.
+
+    Parameters
+    ----------
+    errors : List[MeasurementError]
+        Measurement errors.
+
+    Returns
+    -------
+    pa.Table
+        Errors with the `ERRORS_SCHEMA`.
+    """
+    return pa.Table.from_pylist(
+        [error._asdict() for error in errors], schema=ERRORS_SCHEMA
+    )
 
 
-def parse_batch(batch: pl.DataFrame) -> dict:
+def parse_batch(
+    batch: pl.DataFrame,
+    model: Type[MeasuredPrefix] = MeasuredPrefix,
+    errors: Optional[List[pa.Table]] = None,
+) -> dict:
     """Generate measurements for a batch.
 
+    This is the reference implementation that validates each row with
+    pydantic. `measure_batch` must produce the same output.
+
     Parameters
     ----------
     batch : pl.DataFrame
         Polars dataframe for the batch.
+    model : Type[MeasuredPrefix]
+        Measurement model, see `gen_projected_model`.
+    errors : Optional[List[pa.Table]]
+        Collects the errors of the rows that failed to measure, see
+        `ERRORS_SCHEMA`.
 
     Returns
     -------
     dict
         Generated column major dict of MeasuredPrefix objects.
     """
-    measured_prefix_adapter = TypeAdapter(MeasuredPrefix)
+    measured_prefix_adapter = TypeAdapter(model)
     row_dicts = batch.to_dicts()
     parsed_batch = {
         key: [] for key in MeasuredPrefix.model_construct().get_all_fields().keys()
     }
+    batch_errors = []
     for row in row_dicts:
-        try:
-            parsed_prefix_dict = cpgparser.parse_prefix(row["key"])  # type: ignore
-            measured_prefix = measured_prefix_adapter.validate_python(
-                {**row, **parsed_prefix_dict}
+        measured_prefix, error = measure_row(row, measured_prefix_adapter)
+        if error is not None:
+            batch_errors.append(error)
+        # Error entries do not carry the inventory fields
+        for key, values in parsed_batch.items():
+            values.append(measured_prefix.get(key))
+    if errors is not None and len(batch_errors) != 0:
+        errors.append(gen_errors_table(batch_errors))
+    return parsed_batch
+
+
+def parse_prefixes(
+    keys: pl.Series,
+    n_threads: int = 1,
+    parser: Optional["cpgparser.PrefixParser"] = None,
+) -> pl.DataFrame:
+    """Parse a column of S3 keys with the batch prefix parser.
+
+    Parameters
+    ----------
+    keys : pl.Series
+        S3 object keys.
+    n_threads : int
+        Number of native parser threads, 0 uses all cores.
+    parser : Optional[cpgparser.PrefixParser]
+        Parser with a directory cache, shared across batches.
+
+    Returns
+    -------
+    pl.DataFrame
+        One column per parsed grammar rule, and the `error`, `error_rule`
+        and `error_pos` columns of keys that failed to parse.
+    """
+    if parser is None:
+        parsed = cpgparser.parse_prefixes(keys.to_arrow(), n_threads)  # type: ignore
+    else:
+        parsed = parser.parse_prefixes(keys.to_arrow(), n_threads)
+    parsed_df = pl.from_arrow(parsed)
+    # model_ is a protected namespace for pydantic, see ParsedPrefix
+    return parsed_df.rename({"model_id": "ml_model_id"})  # type: ignore
+
+
+def coerce_integer_series(series: pl.Series) -> Optional[pl.Series]:
+    """Coerce an inventory column to an integer measurement.
+
+    Parameters
+    ----------
+    series : pl.Series
+        Raw inventory column.
+
+    Returns
+    -------
+    Optional[pl.Series]
+        Coerced column, or `None` if the column type can not be coerced.
+    """
+    if series.dtype.is_integer():
+        return series.cast(pl.Int64)
+    if series.dtype == pl.Utf8:
+        return series.str.strip_chars().cast(pl.Int64, strict=False)
+    return None
+
+
+def coerce_timestamp_series(series: pl.Series) -> Optional[pl.Series]:
+    """Coerce an inventory column to a UTC timestamp measurement in ms.
+
+    Parameters
+    ----------
+    series : pl.Series
+        Raw inventory column.
+
+    Returns
+    -------
+    Optional[pl.Series]
+        Coerced column, or `None` if the column type can not be coerced.
+    """
+    dtype = series.dtype
+    if isinstance(dtype, pl.Datetime):
+        if dtype.time_zone is None:  # type: ignore
+            series = series.dt.replace_time_zone("UTC")
+        else:
+            series = series.dt.convert_time_zone("UTC")
+        return series.dt.cast_time_unit("ms")
+    if dtype == pl.Utf8:
+        return series.str.to_datetime(time_unit="ms", time_zone="UTC", strict=False)
+    return None
+
+
+def coerce_series(series: pl.Series, pa_type: pa.DataType) -> pl.Series:
+    """Coerce an inventory column to the measurement type.
+
+    Values that can not be coerced are set to null so that the caller can
+    route them through the reference implementation.
+
+    Parameters
+    ----------
+    series : pl.Series
+        Raw inventory column.
+    pa_type : pa.DataType
+        Target arrow type from the measurement schema.
+
+    Returns
+    -------
+    pl.Series
+        Coerced column.
+    """
+    if series.dtype == pl.Null:
+        return series
+    if series.dtype == pl.Categorical:
+        series = series.cast(pl.Utf8)
+    if pa.types.is_dictionary(pa_type):
+        pa_type = pa_type.value_type
+    if pa.types.is_integer(pa_type):
+        coerced = coerce_integer_series(series)
+    elif pa.types.is_timestamp(pa_type):
+        coerced = coerce_timestamp_series(series)
+    else:
+        passthrough = PASSTHROUGH_TYPES.get(pa_type)
+        coerced = (
+            series if passthrough is not None and series.dtype == passthrough else None
+        )
+    if coerced is None:
+        return pl.Series(series.name, [None] * len(series), dtype=pl.Null)
+    return coerced
+
+
+def measure_batch(
+    batch: pl.DataFrame,
+    n_threads: int = 1,
+    model: Type[MeasuredPrefix] = MeasuredPrefix,
+    parser: Optional["cpgparser.PrefixParser"] = None,
+    metrics: Optional[RunMetrics] = None,
+    errors: Optional[List[pa.Table]] = None,
+) -> pa.Table:
+    """Generate measurements for a batch using columnar expressions.
+
+    Keys that fail to parse become error entries, rows that fail to
+    validate are handed over to `parse_batch`, so the output is identical
+    to the pydantic reference implementation.
+
+    Parameters
+    ----------
+    batch : pl.DataFrame
+        Polars dataframe for the batch.
+    n_threads : int
+        Number of native parser threads, 0 uses all cores.
+    model : Type[MeasuredPrefix]
+        Measurement model, see `gen_projected_model`.
+    parser : Optional[cpgparser.PrefixParser]
+        Parser with a directory cache, shared across batches.
+    metrics : Optional[RunMetrics]
+        Records the parse, validate and dump stages.
+    errors : Optional[List[pa.Table]]
+        Collects the errors of the rows that failed to measure, see
+        `ERRORS_SCHEMA`.
+
+    Returns
+    -------
+    pa.Table
+        Measurements with the `MeasuredPrefix` parquet schema.
+    """
+    metrics = metrics or RunMetrics()
+    pq_schema = gen_pq_schema(MeasuredPrefix)
+    with metrics.timed("parse", len(batch)):
+        parsed = parse_prefixes(batch.get_column("key"), n_threads, parser)
+    start = time.perf_counter()
+    # Missing keys are reported as parse errors by the parser
+    parse_failed = parsed.get_column("error").is_not_null()
+    fallback = pl.Series("fallback", [False] * len(batch), dtype=pl.Boolean)
+
+    # Inventory columns
+    inventory_columns = []
+    for name in InventoryRowParser.model_fields.keys():
+        field = model.model_fields[name]
+        if name == "obj_key":
+            continue
+        if name not in batch.columns:
+            # pydantic requires every non projected inventory field
+            if field.is_required():
+                fallback = fallback | True
+            inventory_columns.append(pl.Series(name, [None] * len(batch)))
+            continue
+        raw = batch.get_column(name)
+        coerced = coerce_series(raw, pq_schema.field(name).type)
+        fallback = fallback | (coerced.is_null() & raw.is_not_null())
+        if type(None) not in get_args(field.annotation):
+            fallback = fallback | raw.is_null()
+        inventory_columns.append(coerced)
+
+    # Parsed prefix columns, rules that the parser did not report stay null
+    prefix_columns = [
+        parsed.get_column(name)
+        if name in parsed.columns
+        else pl.Series(name, [None] * len(batch), dtype=pl.Utf8)
+        for name in ParsedPrefix.model_fields.keys()
+    ]
+
+    key = pl.col("key")
+    measured = pl.DataFrame(prefix_columns + inventory_columns).with_columns(
+        obj_key=key,
+        is_parsing_error=pl.lit(False),
+        error_code=pl.lit(None, dtype=pl.Utf8),
+        is_dir=is_dir_expr(key),
+        key_parts=key_parts_expr(key),
+        workspace_dir=workspace_dir_expr(pl.col("workspace_root_dir")),
+    )
+    fallback = fallback | ~measured.get_column("workspace_dir").is_in(
+        [folder.value for folder in WorkspaceFolder]
+    )
+    fallback = fallback & ~parse_failed
+    measured_rows = ~fallback & ~parse_failed
+    row_idx = pl.int_range(0, len(batch), eager=True)
+    tables = [
+        measured.filter(measured_rows)
+        .select(pq_schema.names)
+        .to_arrow()
+        .cast(pq_schema)
+    ]
+    table_rows = [row_idx.filter(measured_rows)]
+    if parse_failed.any():
+        tables.append(
+            gen_parse_error_entries(
+                batch.get_column("key").filter(parse_failed),
+                parsed.filter(parse_failed),
+                pq_schema,
+                errors,
+            )
+        )
+        table_rows.append(row_idx.filter(parse_failed))
+    metrics.stage("dump").add(len(batch), time.perf_counter() - start)
+    if fallback.any():
+        with metrics.timed("validate", fallback.sum()):
+            tables.append(
+                pa.Table.from_pydict(
+                    parse_batch(batch.filter(fallback), model, errors),
+                    schema=pq_schema,
+                )
+            )
+        table_rows.append(row_idx.filter(fallback))
+    if len(tables) == 1:
+        return tables[0]
+
+    # Keep the input row order when merging the error and reference rows in
+    order = pl.concat(table_rows).arg_sort()
+    return pa.concat_tables(tables).take(order.to_arrow())
+
+
+def gen_parse_error_entries(
+    keys: pl.Series,
+    parsed: pl.DataFrame,
+    pq_schema: pa.Schema,
+    errors: Optional[List[pa.Table]] = None,
+) -> pa.Table:
+    """Generate the error entries of keys that failed to parse.
+
+    Error entries only differ by their key, so a single entry is generated
+    by `MeasuredPrefix.gen_error_entry` and repeated for all keys.
+
+    Parameters
+    ----------
+    keys : pl.Series
+        S3 object keys that failed to parse.
+    parsed : pl.DataFrame
+        Parsed prefixes of the keys, see `parse_prefixes`.
+    pq_schema : pa.Schema
+        Measurement parquet schema.
+    errors : Optional[List[pa.Table]]
+        Collects the parse errors, see `ERRORS_SCHEMA`.
+
+    Returns
+    -------
+    pa.Table
+        Error entries with the `MeasuredPrefix` parquet schema.
+    """
+    if errors is not None:
+        errors.append(
+            pl.DataFrame(
+                {
+                    "obj_key": keys,
+                    "error_code": [ErrorCode.PARSE.value] * len(keys),
+                    "error_rule": parsed.get_column("error_rule"),
+                    "error_pos": parsed.get_column("error_pos"),
+                    "error_message": parsed.get_column("error"),
+                }
+            )
+            .to_arrow()
+            .cast(ERRORS_SCHEMA)
+        )
+    entry = MeasuredPrefix.gen_error_entry(
+        MeasurementError("", ErrorCode.PARSE.value, None, None, "")
+    ).model_dump()
+    entries = pa.Table.from_pylist(
+        [{name: entry.get(name) for name in pq_schema.names}], schema=pq_schema
+    ).take(pl.zeros(len(keys), dtype=pl.Int32, eager=True).to_arrow())
+    obj_key_idx = pq_schema.get_field_index("obj_key")
+    return entries.set_column(
+        obj_key_idx, pq_schema.field(obj_key_idx), keys.to_arrow().cast(pa.string())
+    )
+
+
+def write_row_group(pq_writer: pq.ParquetWriter, tables: List[pa.Table]) -> None:
+    """Write measured batches as a single row group.
+
+    Batches carry their own dictionaries, they are unified so that the
+    row group is written with one dictionary page per column.
+
+    Parameters
+    ----------
+    pq_writer : pq.ParquetWriter
+        Writer for the measurement parquet file.
+    tables : List[pa.Table]
+        Measured batches.
+    """
+    table = pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+    pq_writer.write_table(table, row_group_size=table.num_rows)
+
+
+def get_partition_path(out_path: Path, partition: Dict[str, Any]) -> Path:
+    """Get the hive partition dir for partition values.
+
+    Parameters
+    ----------
+    out_path : Path
+        Path to the measurement dataset.
+    partition : Dict[str, Any]
+        Value by partition column, null values go to the default partition.
+
+    Returns
+    -------
+    Path
+        Partition dir, e.g. `dataset_id=cpg0016-jump/source_id=source_4`.
+    """
+    for col, value in partition.items():
+        value = HIVE_DEFAULT_PARTITION if value is None else quote(str(value), safe="")
+        out_path = out_path.joinpath(f"{col}={value}")
+    return out_path
+
+
+def split_partitions(
+    table: pa.Table, partition_cols: List[str]
+) -> Generator[Tuple[Dict[str, Any], pa.Table], None, None]:
+    """Split a measured batch by partition values.
+
+    Parameters
+    ----------
+    table : pa.Table
+        Measured batch.
+    partition_cols : List[str]
+        Partition columns.
+
+    Yields
+    ------
+    Generator[Tuple[Dict[str, Any], pa.Table], None, None]
+        Partition values and the rows of the partition.
+    """
+    partitions = table.select(partition_cols).group_by(partition_cols).aggregate([])
+    for partition in partitions.to_pylist():
+        mask = None
+        for col, value in partition.items():
+            if value is None:
+                col_mask = pc.is_null(table.column(col))
+            else:
+                col_mask = pc.equal(table.column(col), value)
+            mask = col_mask if mask is None else pc.and_(mask, col_mask)
+        yield partition, table.filter(mask)
+
+
+class MeasurementWriter:
+    """Write measurements of an inventory file.
+
+    Measured batches are buffered into large row groups. With partition
+    columns, rows are written to a hive partitioned dataset with one file per
+    inventory file and partition.
+    """
+
+    def __init__(
+        self: "MeasurementWriter",
+        out_path: Path,
+        file_name: str,
+        pq_schema: pa.Schema,
+        partition_cols: Optional[List[str]] = None,
+    ) -> None:
+        """Initialize MeasurementWriter.
+
+        Parameters
+        ----------
+        out_path : Path
+            Path to output dir for writing measurement files.
+        file_name : str
+            Name of the measurement files.
+        pq_schema : pa.Schema
+            Measurement parquet schema.
+        partition_cols : Optional[List[str]]
+            Columns to partition the measurements by.
+        """
+        self.out_path = out_path
+        self.file_name = file_name
+        self.pq_schema = pq_schema
+        self.partition_cols = partition_cols or []
+        self.writers: Dict[Path, pq.ParquetWriter] = {}
+        self.pending: Dict[Path, List[pa.Table]] = {}
+        self.bytes_written = 0
+        self.closed = False
+
+    def __enter__(self: "MeasurementWriter") -> "MeasurementWriter":
+        """Enter the writer context."""
+        return self
+
+    def __exit__(self: "MeasurementWriter", *args: object) -> None:
+        """Flush and close all files."""
+        self.close()
+
+    def write(self: "MeasurementWriter", table: pa.Table) -> None:
+        """Write a measured batch.
+
+        Parameters
+        ----------
+        table : pa.Table
+            Measured batch.
+        """
+        if table.num_rows == 0:
+            return
+        if len(self.partition_cols) == 0:
+            self.append(self.out_path, table)
+            return
+        for partition, partition_table in split_partitions(table, self.partition_cols):
+            self.append(get_partition_path(self.out_path, partition), partition_table)
+
+    def append(self: "MeasurementWriter", path: Path, table: pa.Table) -> None:
+        """Buffer rows of a file and write them once a row group is full.
+
+        Parameters
+        ----------
+        path : Path
+            Dir of the measurement file.
+        table : pa.Table
+            Rows to append.
+        """
+        pending = self.pending.setdefault(path, [])
+        pending.append(table)
+        if sum(pending_table.num_rows for pending_table in pending) >= (
+            MEASUREMENT_ROW_GROUP_SIZE
+        ):
+            self.flush(path)
+
+    def flush(self: "MeasurementWriter", path: Path) -> None:
+        """Write buffered rows of a file as a row group.
+
+        Parameters
+        ----------
+        path : Path
+            Dir of the measurement file.
+        """
+        if path not in self.writers:
+            path.mkdir(parents=True, exist_ok=True)
+            self.writers[path] = pq.ParquetWriter(
+                path.joinpath(self.file_name),
+                self.pq_schema,
+                compression=MEASUREMENT_COMPRESSION,
             )
-        except ParseError as e:
-            measured_prefix = MeasuredPrefix.gen_error_entry(row["key"], e)
-        except ValidationError as e:
-            measured_prefix = MeasuredPrefix.gen_error_entry(row["key"], e)
-        except ValueError as e:
-            measured_prefix = MeasuredPrefix.gen_error_entry(row["key"], e)
+        pending = self.pending.pop(path, [])
+        if len(pending) != 0:
+            write_row_group(self.writers[path], pending)
+
+    def close(self: "MeasurementWriter") -> None:
+        """Flush buffered rows and close all files."""
+        if self.closed:
+            return
+        self.closed = True
+        for path in list(self.pending):
+            self.flush(path)
+        if len(self.partition_cols) == 0 and len(self.writers) == 0:
+            # Empty inventory files still get a measurement file
+            self.flush(self.out_path)
+        for path, writer in self.writers.items():
+            writer.close()
+            self.bytes_written += path.joinpath(self.file_name).stat().st_size
+        self.writers = {}
+
+
+class MeasurementTask(NamedTuple):
+    """Rows of an inventory file measured by a single task."""
+
+    file: Path
+    # Row groups to measure, None measures the whole file
+    row_groups: Optional[List[int]]
+    # Output part of the task, None writes a single output for the file
+    part: Optional[int]
+    num_rows: int
+
+    @property
+    def out_name(self: "MeasurementTask") -> str:
+        """Name of the measurement file written by the task."""
+        if self.part is None:
+            return self.file.name
+        return f"{self.file.stem}-part{self.part:05d}.parquet"
+
+
+def plan_measurement_tasks(
+    files: List[Path], num_tasks: int, split_row_groups: bool = False
+) -> List[MeasurementTask]:
+    """Plan measurement tasks of balanced size.
+
+    Inventory files larger than the target task size are split into tasks
+    of consecutive row groups.
+
+    Parameters
+    ----------
+    files : List[Path]
+        Raw inventory parquet files.
+    num_tasks : int
+        Number of tasks to aim for.
+    split_row_groups : bool
+        Split large inventory files across tasks.
+
+    Returns
+    -------
+    List[MeasurementTask]
+        Measurement tasks.
+    """
+    file_metas = [(file, pq.read_metadata(file)) for file in files]
+    if split_row_groups is False:
+        return [
+            MeasurementTask(file, None, None, file_meta.num_rows)
+            for file, file_meta in file_metas
+        ]
+    total_rows = sum(file_meta.num_rows for _, file_meta in file_metas)
+    target_rows = max(math.ceil(total_rows / max(num_tasks, 1)), 1)
+    tasks = []
+    for file, file_meta in file_metas:
+        file_tasks = []
+        row_groups: List[int] = []
+        rows = 0
+        for row_group in range(file_meta.num_row_groups):
+            row_groups.append(row_group)
+            rows += file_meta.row_group(row_group).num_rows
+            if rows >= target_rows:
+                file_tasks.append(
+                    MeasurementTask(file, row_groups, len(file_tasks), rows)
+                )
+                row_groups, rows = [], 0
+        if len(row_groups) != 0:
+            file_tasks.append(MeasurementTask(file, row_groups, len(file_tasks), rows))
+        if len(file_tasks) <= 1:
+            file_tasks = [MeasurementTask(file, None, None, file_meta.num_rows)]
+        tasks.extend(file_tasks)
+    return tasks
+
+
+def get_measurement_outputs(measurement_out_path: Path, name: str) -> List[Path]:
+    """Get the measurement files written for an inventory file.
+
+    Parameters
+    ----------
+    measurement_out_path : Path
+        Path to dir containing measurement files.
+    name : str
+        Name of the inventory file.
+
+    Returns
+    -------
+    List[Path]
+        Measurement files and parts in all partitions.
+    """
+    return [
+        *measurement_out_path.glob(f"**/{name}"),
+        *measurement_out_path.glob(f"**/{Path(name).stem}-part*.parquet"),
+    ]
+
+
+def compact_measurements(
+    file_names: List[str], measurement_out_path: Path, job_idx: int = 0
+) -> None:
+    """Compact the measurement parts of inventory files.
+
+    Parts in the same dir are merged into a single measurement file, keeping
+    their row groups.
+
+    Parameters
+    ----------
+    file_names : List[str]
+        Names of the inventory files.
+    measurement_out_path : Path
+        Path to dir containing measurement files.
+    job_idx : int
+        Job index for tqdm progress bar ordering.
+    """
+    for name in tqdm(file_names, desc="Compacting measurements", position=job_idx):
+        part_dirs: Dict[Path, List[Path]] = {}
+        for part in measurement_out_path.glob(f"**/{Path(name).stem}-part*.parquet"):
+            part_dirs.setdefault(part.parent, []).append(part)
+        for part_dir, parts in part_dirs.items():
+            parts = sorted(parts)
+            with pq.ParquetWriter(
+                part_dir.joinpath(name),
+                pq.read_schema(parts[0]),
+                compression=MEASUREMENT_COMPRESSION,
+            ) as pq_writer:
+                for part in parts:
+                    pq_part = pq.ParquetFile(part)
+                    for row_group in range(pq_part.num_row_groups):
+                        table = pq_part.read_row_group(row_group)
+                        pq_writer.write_table(table, row_group_size=table.num_rows)
+            for part in parts:
+                part.unlink()
+
+
+def get_inventory_read_bytes(
+    task: MeasurementTask, columns: Optional[List[str]] = None
+) -> int:
+    """Get the compressed size of the inventory columns read by a task.
+
+    Parameters
+    ----------
+    task : MeasurementTask
+        Measurement task.
+    columns : Optional[List[str]]
+        Inventory columns to read, defaults to all inventory columns.
+
+    Returns
+    -------
+    int
+        Number of compressed bytes read.
+    """
+    metadata = pq.read_metadata(task.file)
+    read_columns = set(columns or get_inventory_columns())
+    row_groups = task.row_groups or range(metadata.num_row_groups)
+    return sum(
+        row_group.column(i).total_compressed_size
+        for row_group in map(metadata.row_group, row_groups)
+        for i in range(row_group.num_columns)
+        if row_group.column(i).path_in_schema in read_columns
+    )
+
+
+def gen_timed_batches(
+    batches: Iterable[pl.DataFrame], counter: StageCounter
+) -> Generator[pl.DataFrame, None, None]:
+    """Count the time spent reading each batch.
+
+    Parameters
+    ----------
+    batches : Iterable[pl.DataFrame]
+        Inventory batches, see `gen_inventory_batches`.
+    counter : StageCounter
+        Counter of the read stage.
+
+    Yields
+    ------
+    pl.DataFrame
+        Polars dataframe for the batch.
+    """
+    batch_iter = iter(batches)
+    while True:
+        start = time.perf_counter()
+        batch = next(batch_iter, None)
+        if batch is None:
+            return
+        counter.add(len(batch), time.perf_counter() - start)
+        yield batch
+
+
+def gen_pipelined_measurements(
+    batches: Iterable[pl.DataFrame],
+    measure_fn: Callable[[pl.DataFrame], Tuple[pa.Table, pa.Table]],
+    workers: int,
+    depth: int = MEASUREMENT_PIPELINE_DEPTH,
+) -> Generator[Tuple[pa.Table, pa.Table], None, None]:
+    """Measure batches with overlapping read, measure and write stages.
+
+    A reader thread decodes inventory batches and submits them to a pool
+    of measure workers. Pending results are queued in input order and
+    yielded to the caller, which writes them. The queue is bounded, so the
+    reader waits when the writer falls behind. Arrow releases the GIL while
+    decoding and encoding parquet, and the prefix parser while parsing.
+
+    Parameters
+    ----------
+    batches : Iterable[pl.DataFrame]
+        Inventory batches, see `gen_inventory_batches`.
+    measure_fn : Callable[[pl.DataFrame], Tuple[pa.Table, pa.Table]]
+        Function measuring a batch into measurements and errors, called
+        from the worker threads.
+    workers : int
+        Number of measure worker threads.
+    depth : int
+        Number of measured batches buffered per worker.
+
+    Yields
+    ------
+    Tuple[pa.Table, pa.Table]
+        Measurements and errors of each batch, in input order.
+    """
+    pending: queue.Queue = queue.Queue(maxsize=workers * depth)
+    stop = threading.Event()
+
+    def put(item: Optional[Future]) -> bool:
+        # Give up waiting on a full queue once the writer stopped
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(pool: ThreadPoolExecutor) -> None:
+        try:
+            for batch in batches:
+                if not put(pool.submit(measure_fn, batch)):
+                    return
         except Exception as e:
-            raise (e)
-        for key, value in measured_prefix.model_dump().items():
-            parsed_batch[key].append(value)
-    return parsed_batch
+            # Hand read errors to the writer in place of the next batch
+            failed: Future = Future()
+            failed.set_exception(e)
+            put(failed)
+        put(None)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        reader = threading.Thread(target=read, args=(pool,), daemon=True)
+        reader.start()
+        try:
+            while (future := pending.get()) is not None:
+                yield future.result()
+        finally:
+            stop.set()
+            reader.join()
+
+
+def get_measurement_model(
+    inventory_file: Path, columns: Optional[List[str]] = None
+) -> Type[MeasuredPrefix]:
+    """Get the measurement model of an inventory file.
+
+    Required fields that a built inventory leaves null are measured as
+    optional fields, see `get_unreported_fields`.
+
+    Parameters
+    ----------
+    inventory_file : Path
+        Path of the inventory parquet file.
+    columns : Optional[List[str]]
+        Inventory columns to read, the rest is filled with nulls.
+
+    Returns
+    -------
+    Type[MeasuredPrefix]
+        Measurement model.
+    """
+    unreported = get_unreported_fields(inventory_file)
+    if columns is None and len(unreported) == 0:
+        return MeasuredPrefix
+    return gen_projected_model(
+        [
+            name
+            for name in columns or S3_INVENTORY_SCHEMA.names
+            if name not in unreported
+        ]
+    )
 
 
 def gen_measurement(
-    file_path_list: List[Path], out_path: Path, job_idx: int = 0
-) -> None:
+    task_list: List[MeasurementTask],
+    out_path: Path,
+    engine: str = "columnar",
+    parse_threads: int = 1,
+    columns: Optional[List[str]] = None,
+    parse_cache_size: int = 4096,
+    partition_cols: Optional[List[str]] = None,
+    pipeline_workers: int = 0,
+    job_idx: int = 0,
+) -> dict:
     """Generate measurement parquet files.
 
+    Errors of the keys that failed to measure are written with the same file
+    name to the `errors` dir next to `out_path`, see `ERRORS_SCHEMA`.
+
     Parameters
     ----------
-    file_path_list : List[Path]
-        List of file paths to read raw inventory parquet files.
+    task_list : List[MeasurementTask]
+        Inventory files, or row groups of them, to measure.
     out_path : Path
         Path to output dir for writing generated measurement files.
+    engine : str
+        Measurement engine, either "columnar" or the "pydantic" reference.
+    parse_threads : int
+        Number of native parser threads for the columnar engine.
+    columns : Optional[List[str]]
+        Inventory columns to read, the rest is filled with nulls.
+    parse_cache_size : int
+        Number of directories cached by the prefix parser, 0 disables it.
+    partition_cols : Optional[List[str]]
+        Columns to hive partition the measurements by.
+    pipeline_workers : int
+        Number of measure threads of the pipelined measurement, 0 reads,
+        measures and writes each batch sequentially.
     job_idx : int
         Job index for tqdm progress bar ordering.
+
+    Returns
+    -------
+    dict
+        Metrics of the worker, see `RunMetrics.snapshot`.
     """
+    # Cache is shared by all files of the worker
+    parser = cpgparser.PrefixParser(parse_cache_size)  # type: ignore
+    # Creating parquet schema for streaming write
+    pq_schema = gen_pq_schema(MeasuredPrefix)
+    errors_out_path = out_path.parent.joinpath(MEASUREMENT_ERRORS_DIR)
+    metrics = RunMetrics()
+    # Stages of `measure_fn` run in all pipeline threads
+    for stage in ["measure", "parse", "dump", "validate"]:
+        metrics.stage(stage, max(pipeline_workers, 1))
+
+    def measure_fn(
+        batch: pl.DataFrame, model: Type[MeasuredPrefix]
+    ) -> Tuple[pa.Table, pa.Table]:
+        errors: List[pa.Table] = [ERRORS_SCHEMA.empty_table()]
+        with metrics.timed("measure", len(batch)):
+            if engine == "pydantic":
+                with metrics.timed("validate", len(batch)):
+                    table = pa.Table.from_pydict(
+                        parse_batch(batch, model, errors), schema=pq_schema
+                    )
+            else:
+                table = measure_batch(
+                    batch, parse_threads, model, parser, metrics, errors
+                )
+        errors_table = pa.concat_tables(errors)
+        error_codes = errors_table.column("error_code").cast(pa.string())
+        for error_count in pc.value_counts(error_codes).to_pylist():
+            metrics.inc(f"{error_count['values']}s", error_count["counts"])
+        return table, errors_table
+
     w_id = os.getpid()
-    for i, file in tqdm(
-        enumerate(file_path_list),
+    for i, task in tqdm(
+        enumerate(task_list),
         desc=f"Measurement Worker {w_id} is processing file: ",
         position=job_idx,
     ):
-        file_meta = pq.read_metadata(file)
-        # Streaming the parquet file instead of reading the whole file
-        df = pl.scan_parquet(file)
-        # Creating parquet schema for streaming write
-        pq_schema = gen_pq_schema(MeasuredPrefix)
-        with pq.ParquetWriter(out_path.joinpath(file.name), pq_schema) as pq_writer:
-            for j, frame in enumerate(gen_lazy_slice(df, file_meta)):
-                # loading one frame into memory ~ 500MB(AWS row grouping is sub optimal)
-                frame = frame.collect()
-                rows, _ = frame.shape
-                # Iterating over slices vs iterating row wise
-                # Look warning here: https://pola-rs.github.io/polars/py-polars/html/reference/dataframe/api/polars.DataFrame.iter_rows.html#polars.DataFrame.iter_rows
-                for batch in tqdm(
-                    frame.iter_slices(),
-                    desc=f"Worker {w_id} | ({i+1}/{len(file_path_list)}) | ({j+1}/{file_meta.num_row_groups}): {file.name}",  # noqa: E501
+        # Streaming bounded batches instead of materializing whole row groups
+        batches = gen_timed_batches(
+            gen_inventory_batches(task.file, columns, row_groups=task.row_groups),
+            metrics.stage("read"),
+        )
+        metrics.inc("bytes_read", get_inventory_read_bytes(task, columns))
+        measure_task = partial(
+            measure_fn, model=get_measurement_model(task.file, columns)
+        )
+        if pipeline_workers > 0:
+            tables: Iterable[Tuple[pa.Table, pa.Table]] = gen_pipelined_measurements(
+                batches, measure_task, pipeline_workers
+            )
+        else:
+            tables = map(measure_task, batches)
+        with MeasurementWriter(
+            out_path, task.out_name, pq_schema, partition_cols
+        ) as measurement_writer, MeasurementWriter(
+            errors_out_path, task.out_name, ERRORS_SCHEMA
+        ) as errors_writer:
+            for table, errors_table in (
+                pbar := tqdm(
+                    tables,
+                    desc=f"Worker {w_id} | ({i+1}/{len(task_list)}): {task.out_name}",
                     position=job_idx,
-                    total=math.ceil(rows / 10000),
-                ):
-                    parsed_batch = parse_batch(batch)
-                    pq_writer.write_table(
-                        pa.Table.from_pydict(parsed_batch, schema=pq_schema)
-                    )
+                    total=math.ceil(task.num_rows / MEASUREMENT_BATCH_SIZE),
+                )
+            ):
+                with metrics.timed("write", table.num_rows):
+                    measurement_writer.write(table)
+                    errors_writer.write(errors_table)
+                # Rows per second of each stage, the slowest one bounds the run
+                postfix = {
+                    stage.name: f"{stage.rows_per_sec():.0f}"
+                    for stage in metrics.get_stages()
+                }
+                if engine != "pydantic":
+                    cache_info = parser.cache_info()
+                    lookups = max(cache_info["hits"] + cache_info["misses"], 1)
+                    hit_rate = cache_info["hits"] / lookups
+                    postfix["parse_cache_hit_rate"] = f"{hit_rate:.3f}"
+                pbar.set_postfix(postfix)
+            with metrics.timed("write"):
+                measurement_writer.close()
+                errors_writer.close()
+        metrics.inc("bytes_written", measurement_writer.bytes_written)
+        metrics.inc("bytes_written", errors_writer.bytes_written)
+        metrics.inc("files")
+    return metrics.snapshot()
+
+
+def get_measurement_partitions(measurements_dir: Path) -> pl.DataFrame:
+    """Get measurement files with their hive partition values.
+
+    Parameters
+    ----------
+    measurements_dir : Path
+        Path to dir containing measurement files.
+
+    Returns
+    -------
+    pl.DataFrame
+        One row per measurement file with a `path` column and one column per
+        partition column found in the dir names.
+    """
+    rows = []
+    schema = {"path": pl.Utf8}
+    for file in sorted(measurements_dir.glob("**/*.parquet")):
+        row: Dict[str, Optional[str]] = {"path": str(file)}
+        for part in file.relative_to(measurements_dir).parent.parts:
+            col, _, value = part.partition("=")
+            row[col] = None if value == HIVE_DEFAULT_PARTITION else unquote(value)
+            schema[col] = pl.Utf8
+        rows.append(row)
+    return pl.DataFrame(rows, schema=schema)
+
+
+def get_measurement_files(
+    measurements_dir: Path, partition_filter: Optional[pl.Expr] = None
+) -> List[Path]:
+    """Get measurement files, pruning hive partitions.
+
+    Parameters
+    ----------
+    measurements_dir : Path
+        Path to dir containing measurement files.
+    partition_filter : Optional[pl.Expr]
+        Filter on partition columns, ignored if the measurements are not
+        partitioned by the columns it uses.
+
+    Returns
+    -------
+    List[Path]
+        Paths of the measurement files.
+    """
+    partitions = get_measurement_partitions(measurements_dir)
+    if partition_filter is not None and set(
+        partition_filter.meta.root_names()
+    ).issubset(partitions.columns):
+        partitions = partitions.filter(partition_filter)
+    return [Path(path) for path in partitions.get_column("path")]
+
+
+def scan_inventory(inventory_dir: Path) -> pl.LazyFrame:
+    """Scan raw inventory files.
+
+    Parameters
+    ----------
+    inventory_dir : Path
+        Path to dir containing raw inventory parquet files.
+
+    Returns
+    -------
+    pl.LazyFrame
+        Inventory lazyframe, empty if the dir has no inventory files.
+    """
+    files = sorted(inventory_dir.glob("*.parquet"))
+    if len(files) == 0:
+        return pl.LazyFrame(
+            schema=pl.from_arrow(S3_INVENTORY_SCHEMA.empty_table()).schema
+        )
+    return pl.scan_parquet(files)
+
+
+def scan_measurements(
+    measurements_dir: Path, partition_filter: Optional[pl.Expr] = None
+) -> pl.LazyFrame:
+    """Scan measurement files, pruning hive partitions.
+
+    Parameters
+    ----------
+    measurements_dir : Path
+        Path to dir containing measurement files.
+    partition_filter : Optional[pl.Expr]
+        Filter on partition columns, see `get_measurement_files`.
+
+    Returns
+    -------
+    pl.LazyFrame
+        Measurement lazyframe.
+    """
+    files = get_measurement_files(measurements_dir, partition_filter)
+    if len(files) == 0:
+        return pl.LazyFrame(
+            schema=pl.from_arrow(gen_pq_schema(MeasuredPrefix).empty_table()).schema
+        )
+    # Partition columns are also stored in the files
+    return pl.scan_parquet(files, hive_partitioning=False)
+
+
+def group_rules(rules: List[BaseRule]) -> List[List[BaseRule]]:
+    """Group rules that scan the same measurement partitions.
+
+    Parameters
+    ----------
+    rules : List[BaseRule]
+        Rules to group.
+
+    Returns
+    -------
+    List[List[BaseRule]]
+        Rules grouped by their partition filter.
+    """
+    groups: Dict[str, List[BaseRule]] = {}
+    for rule in rules:
+        groups.setdefault(str(rule.partition_filter), []).append(rule)
+    return list(groups.values())
 
 
 def apply_rules(
-    rule_list: List[BaseRule], measurements_dir: Path, job_idx: int
-) -> None:
+    rule_groups: List[List[BaseRule]],
+    measurements_dir: Path,
+    force: bool = False,
+    job_idx: int = 0,
+) -> dict:
     """Apply rules on the measurement parquet files.
 
+    Each group of rules is evaluated in a single pass over its partitions.
+    Results of rules whose code and measurement files did not change are
+    taken from the rule cache, and mergeable rules only compute the partial
+    aggregates of changed measurement files.
+
     Parameters
     ----------
-    rule_list : List[BaseRule]
-        A list of `Rule` to apply.
+    rule_groups : List[List[BaseRule]]
+        Groups of `Rule` to apply, see `group_rules`.
     measurements_dir : Path
         Path to dir containing measurement files.
+    force : bool
+        Re-evaluate all rules.
     job_idx : int
         Job index for tqdm progress bar ordering.
+
+    Returns
+    -------
+    dict
+        Metrics of the worker, see `RunMetrics.snapshot`.
     """
-    files = [file for file in measurements_dir.glob("*.parquet")]
-    df = pl.scan_parquet(files)
+    metrics = RunMetrics()
     w_id = os.getpid()
-    for _, rule in (pbar := tqdm(enumerate(rule_list), position=job_idx)):
-        pbar.set_description(f"Worker {w_id} applying rule: {rule}")
-        rule.validate(df)
+    # Dictionary columns of all files share the categories
+    with pl.StringCache():
+        for rules in (pbar := tqdm(rule_groups, position=job_idx)):
+            names = ", ".join(type(rule).__name__ for rule in rules)
+            pbar.set_description(f"Worker {w_id} applying rules: {names}")
+            files = get_measurement_files(measurements_dir, rules[0].partition_filter)
+            df = scan_measurements(measurements_dir, rules[0].partition_filter)
+            cache, partial_store = None, None
+            if force is False:
+                cache = RuleCache(rules[0].out_path.joinpath(RULE_CACHE_DIR))
+            if force is False and len(files) != 0:
+                partial_store = PartialStore(
+                    rules[0].out_path.joinpath(RULE_PARTIALS_DIR), files
+                )
+            metrics.inc("bytes_read", sum(file.stat().st_size for file in files))
+            with metrics.timed("evaluate", len(rules)):
+                passed = evaluate_rules(
+                    rules, df, cache, get_files_fingerprint(files), partial_store
+                )
+            metrics.inc("rules_failed", passed.count(False))
+    return metrics.snapshot()
+
+
+def load_inventory_checksums(in_path: Path) -> Dict[str, str]:
+    """Load checksums of inventory files from the AWS inventory manifest.
+
+    `sync_inventory` saves the manifest of the synced revision next to the
+    data dir, see `INVENTORY_MANIFEST`.
+
+    Parameters
+    ----------
+    in_path : Path
+        Path to raw inventory parquet files.
+
+    Returns
+    -------
+    Dict[str, str]
+        MD5 checksum by inventory file name.
+    """
+    checksums = {}
+    manifest_json = in_path.parent.joinpath(INVENTORY_MANIFEST)
+    if not manifest_json.exists():
+        return checksums
+    with manifest_json.open() as f:
+        manifest = json.load(f)
+    for obj in manifest.get("files", []):
+        if "MD5checksum" in obj:
+            checksums[obj["key"].split("/")[-1]] = obj["MD5checksum"]
+    return checksums
+
+
+def get_file_identity(file: Path, checksums: Dict[str, str]) -> dict:
+    """Get identity of an inventory file for incremental measurement.
+
+    The inventory checksum is preferred because the modification time
+    changes when the same file is synced again.
+
+    Parameters
+    ----------
+    file : Path
+        Path to raw inventory parquet file.
+    checksums : Dict[str, str]
+        MD5 checksum by inventory file name.
+
+    Returns
+    -------
+    dict
+        File identity.
+    """
+    stat = file.stat()
+    if file.name in checksums:
+        return {"size": stat.st_size, "md5": checksums[file.name]}
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_measurement_manifest(measurement_out_path: Path) -> dict:
+    """Read the manifest of measured inventory files.
+
+    Parameters
+    ----------
+    measurement_out_path : Path
+        Path to dir containing measurement files.
+
+    Returns
+    -------
+    dict
+        Measurement manifest, empty if it does not exist.
+    """
+    manifest_json = measurement_out_path.joinpath(MEASUREMENT_MANIFEST)
+    if not manifest_json.exists():
+        return {}
+    with manifest_json.open() as f:
+        return json.load(f)
+
 
+def write_measurement_manifest(measurement_out_path: Path, manifest: dict) -> None:
+    """Write the manifest of measured inventory files.
 
-def measure(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
+    Parameters
+    ----------
+    measurement_out_path : Path
+        Path to dir containing measurement files.
+    manifest : dict
+        Measurement manifest.
+    """
+    manifest_json = measurement_out_path.joinpath(MEASUREMENT_MANIFEST)
+    tmp_json = manifest_json.with_suffix(".tmp")
+    with tmp_json.open("w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp_json.replace(manifest_json)
+
+
+def measure(
+    in_path: Path,
+    out_path: Path,
+    jobs: Optional[int] = None,
+    engine: str = "columnar",
+    parse_threads: int = 1,
+    project: bool = False,
+    columns: Optional[List[str]] = None,
+    force: bool = False,
+    parse_cache_size: int = 4096,
+    partition: bool = False,
+    split_row_groups: bool = False,
+    compact: bool = False,
+    pipeline_workers: int = 0,
+    metrics_dir: Optional[Path] = None,
+    prometheus: bool = False,
+) -> None:
     """Measure inventory.
 
+    Measurement is incremental: inventory files that are unchanged since
+    the last run are skipped, unless `force` is set.
+
     Parameters
     ----------
     in_path : Path
@@ -197,15 +1521,156 @@ def measure(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
         Path to save generated parquet files.
     jobs : Optional[int]
         Number of jobs to launch.
+    engine : str
+        Measurement engine, either "columnar" or the "pydantic" reference.
+    parse_threads : int
+        Number of native parser threads for the columnar engine.
+    project : bool
+        Only read the inventory columns needed by the rules.
+    columns : Optional[List[str]]
+        Additional columns to read when projecting.
+    force : bool
+        Re-generate all measurement files.
+    parse_cache_size : int
+        Number of directories cached by the prefix parser per job.
+    partition : bool
+        Write a hive partitioned dataset by `dataset_id` and `source_id`.
+    split_row_groups : bool
+        Split large inventory files into tasks of row groups, each task
+        writes its own measurement part.
+    compact : bool
+        Merge the measurement parts of each inventory file.
+    pipeline_workers : int
+        Number of measure threads per job overlapping with reading and
+        writing batches, 0 measures batches sequentially.
+    metrics_dir : Optional[Path]
+        Path to dir to write the run report, see `write_run_report`.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
     """
+    start = time.perf_counter()
+    metrics = RunMetrics()
+    snapshots = []
     files = [file for file in in_path.glob("*.parquet")]
     measurement_out_path = out_path.joinpath("measurements")
     measurement_out_path.mkdir(parents=True, exist_ok=True)
+    errors_out_path = out_path.joinpath(MEASUREMENT_ERRORS_DIR)
+    read_columns = None
+    if project is True:
+        read_columns = get_projected_columns(
+            get_rules(out_path.joinpath("checks")), columns
+        )
+
+    # Find inventory files that changed since the last run
+    checksums = load_inventory_checksums(in_path)
+    identities = {file.name: get_file_identity(file, checksums) for file in files}
+    # Measurements written with another schema are regenerated
+    schema_hash = hashlib.md5(
+        gen_pq_schema(MeasuredPrefix).to_string().encode()
+    ).hexdigest()
+    partition_cols = MEASUREMENT_PARTITION_COLUMNS if partition is True else None
+    options = {
+        "columns": read_columns,
+        "schema": schema_hash,
+        "partition_cols": partition_cols,
+    }
+    manifest = read_measurement_manifest(measurement_out_path)
+    measured = manifest.get("files", {})
+    if force is True or manifest.get("options") != options:
+        measured = {}
+    measured = {
+        name: identity
+        for name, identity in measured.items()
+        if identities.get(name) == identity
+        and len(get_measurement_outputs(measurement_out_path, name)) != 0
+    }
+    for name in (set(manifest.get("files", {})) | set(identities)) - set(measured):
+        # Drop measurements of removed inventory files and of files that
+        # are measured again, their rows may land in other partitions
+        for measurement_file in [
+            *get_measurement_outputs(measurement_out_path, name),
+            *get_measurement_outputs(errors_out_path, name),
+        ]:
+            measurement_file.unlink()
+    for partition_dir in sorted(measurement_out_path.glob("**/*=*"), reverse=True):
+        if partition_dir.is_dir() and not any(partition_dir.iterdir()):
+            partition_dir.rmdir()
+    files = [file for file in files if file.name not in measured]
+    # Record only up to date files in case the run is interrupted
+    write_measurement_manifest(
+        measurement_out_path, {"options": options, "files": measured}
+    )
+    print(f"Measuring {len(files)} inventory files, {len(measured)} up to date")
+
     if len(files) != 0:
-        parallel(files, gen_measurement, [measurement_out_path], jobs=jobs)
+        tasks = plan_measurement_tasks(
+            files, (jobs or cpu_count()) * MEASUREMENT_TASKS_PER_JOB, split_row_groups
+        )
+        snapshots = parallel(
+            tasks,
+            gen_measurement,
+            [
+                measurement_out_path,
+                engine,
+                parse_threads,
+                read_columns,
+                parse_cache_size,
+                partition_cols,
+                pipeline_workers,
+            ],
+            jobs=jobs,
+            # Inventory files differ a lot in size, schedule the largest first
+            sizes=[task.num_rows for task in tasks],
+            dynamic=True,
+            metrics=metrics,
+        )
+        if compact is True and split_row_groups is True:
+            parallel(
+                [file.name for file in files],
+                compact_measurements,
+                [measurement_out_path],
+                jobs=jobs,
+                metrics=metrics,
+            )
+            compact_measurements([file.name for file in files], errors_out_path)
+    write_measurement_manifest(
+        measurement_out_path, {"options": options, "files": identities}
+    )
+    metrics.inc("files_up_to_date", len(measured))
+    write_metrics(
+        metrics_dir, "measure", snapshots + [metrics.snapshot()], start, prometheus
+    )
 
 
-def check(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
+def get_rules(check_out_path: Path) -> List[BaseRule]:
+    """Get the rules applied by `check`.
+
+    Parameters
+    ----------
+    check_out_path : Path
+        Path to write rule outputs.
+
+    Returns
+    -------
+    List[BaseRule]
+        Active rules.
+    """
+    return [
+        CheckParsingErrors(check_out_path),
+        CheckWorkspaceDirs(check_out_path),
+        CheckJUMPProjectStructure(check_out_path),
+    ]
+
+
+def check(
+    in_path: Path,
+    out_path: Path,
+    jobs: Optional[int] = None,
+    force: bool = False,
+    metrics_dir: Optional[Path] = None,
+    prometheus: bool = False,
+    row_level: bool = False,
+) -> None:
     """Check inventory.
 
     Parameters
@@ -216,19 +1681,45 @@ def check(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
         Path to save generated parquet files.
     jobs : Optional[int]
         Number of jobs to launch.
+    force : bool
+        Re-evaluate rules with cached results.
+    metrics_dir : Optional[Path]
+        Path to dir to write the run report, see `write_run_report`.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
+    row_level : bool
+        Only apply row level rules, for measurements of a part of the
+        inventory. Rules that aggregate rows would judge partial data.
     """
+    start = time.perf_counter()
+    metrics = RunMetrics()
+    snapshots = []
     measurement_out_path = out_path.joinpath("measurements")
     check_out_path = out_path.joinpath("checks")
     check_out_path.mkdir(parents=True, exist_ok=True)
-    rules = [
-        # CheckWorkspaceDirs(check_out_path),
-        CheckJUMPProjectStructure(check_out_path),
-    ]
-    if len(rules) != 0:
-        parallel(rules, apply_rules, [measurement_out_path], jobs=jobs)
+    rules = get_rules(check_out_path)
+    if row_level is True:
+        skipped = [type(rule).__name__ for rule in rules if not rule.is_row_level()]
+        if len(skipped) != 0:
+            print(f"Skipping rules that aggregate rows: {', '.join(skipped)}")
+        rules = [rule for rule in rules if rule.is_row_level()]
+    rule_groups = group_rules(rules)
+    if len(rule_groups) != 0:
+        snapshots = parallel(
+            rule_groups,
+            apply_rules,
+            [measurement_out_path, force],
+            jobs=jobs,
+            metrics=metrics,
+        )
+    write_metrics(
+        metrics_dir, "check", snapshots + [metrics.snapshot()], start, prometheus
+    )
 
 
-def validate(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
+def validate(
+    in_path: Path, out_path: Path, jobs: Optional[int] = None, force: bool = False
+) -> None:
     """Valiadate inventory.
 
     Parameters
@@ -239,8 +1730,80 @@ def validate(in_path: Path, out_path: Path, jobs: Optional[int] = None) -> None:
         Path to save generated parquet files.
     jobs : Optional[int]
         Number of jobs to launch.
+    force : bool
+        Re-generate all measurement files.
     """
     # Create Measurements
-    measure(in_path, out_path, jobs)
+    measure(in_path, out_path, jobs, force=force)
     # Apply rules
     # check(in_path, out_path, jobs)
+
+
+def diff(
+    old_path: Path,
+    new_path: Path,
+    out_path: Path,
+    jobs: Optional[int] = None,
+    force: bool = False,
+) -> None:
+    """Measure and check the delta between two inventory revisions.
+
+    Keys are compared on e_tag and size. Added and modified rows of the new
+    revision are written as a delta inventory, which is then measured like a
+    full inventory. Only row level rules are checked on the delta, rules
+    that aggregate rows need the full inventory. Removed keys are only
+    listed.
+
+    Parameters
+    ----------
+    old_path : Path
+        Path to raw inventory parquet files of the old revision.
+    new_path : Path
+        Path to raw inventory parquet files of the new revision.
+    out_path : Path
+        Path to save generated delta files.
+    jobs : Optional[int]
+        Number of jobs to launch.
+    force : bool
+        Re-generate all measurement files and re-evaluate all rules.
+    """
+    old_df = scan_inventory(old_path)
+    new_df = scan_inventory(new_path)
+    old_ids = old_df.select("key", "e_tag", "size")
+    new_ids = new_df.select("key", "e_tag", "size")
+
+    added = new_ids.join(old_ids, on="key", how="anti").select(
+        pl.col("key"), pl.lit("added").alias("change")
+    )
+    removed = old_ids.join(new_ids, on="key", how="anti").select(
+        pl.col("key"), pl.lit("removed").alias("change")
+    )
+    modified = (
+        new_ids.join(old_ids, on="key", how="inner", suffix="_old")
+        .filter(
+            pl.col("e_tag").ne_missing(pl.col("e_tag_old"))
+            | pl.col("size").ne_missing(pl.col("size_old"))
+        )
+        .select(pl.col("key"), pl.lit("modified").alias("change"))
+    )
+    changes = pl.concat(pl.collect_all([added, removed, modified]))
+    out_path.mkdir(parents=True, exist_ok=True)
+    changes.write_parquet(out_path.joinpath("changes.parquet"))
+    print(changes.group_by("change").len().sort("change"))
+
+    # Write new and modified rows as a delta inventory
+    delta_inventory_path = out_path.joinpath("inventory")
+    delta_inventory_path.mkdir(parents=True, exist_ok=True)
+    delta_file = delta_inventory_path.joinpath("delta.parquet")
+    delta_keys = changes.filter(pl.col("change").ne("removed")).select("key").unique()
+    if len(delta_keys) == 0:
+        # Drops the measurements of an earlier delta
+        delta_file.unlink(missing_ok=True)
+        measure(delta_inventory_path, out_path, jobs, force=force)
+        print("No added or modified keys to check")
+        return
+    # Inner join on unique keys, unlike a semi join it can be streamed
+    sink_plan(new_df.join(delta_keys.lazy(), on="key", how="inner"), delta_file)
+
+    measure(delta_inventory_path, out_path, jobs, force=force)
+    check(delta_inventory_path, out_path, jobs, force, row_level=True)
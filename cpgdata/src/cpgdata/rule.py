@@ -3,15 +3,107 @@
 This module provide `rules` that can be chained together in a `pipe`
 to enforce arbitrary schema.
 """
+import hashlib
+import inspect
+import json
+import re
 from abc import ABC, abstractmethod
 from pathlib import Path
+from types import CodeType
+from typing import Any, ClassVar, Dict, List, Optional, Type, Union
 
 import polars as pl
 
+# Hive partition columns of the measurement dataset
+PARTITION_COLUMNS = ["dataset_id", "source_id"]
+
+# Workspace dirs every project is expected to have
+REQUIRED_WORKSPACE_DIRS = ["analysis", "backend", "load_data_csv", "profiles"]
+
+# Number of result rows kept in memory for streamed rule results
+REPORT_SAMPLE_SIZE = 10
+
+# Dir of the rule result cache, inside the rule out path
+RULE_CACHE_DIR = ".rule_cache"
+
+# Dir of the partial aggregates of mergeable rules, inside the rule out path
+RULE_PARTIALS_DIR = ".rule_partials"
+
+# Word boundaries of CamelCase rule names
+CAMEL_CASE_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+
+def describe_attribute(value: Any) -> str:  # noqa: ANN401
+    """Describe a rule class attribute independent of the running process.
+
+    Parameters
+    ----------
+    value : Any
+        Class attribute.
+
+    Returns
+    -------
+    str
+        Stable description of the attribute.
+    """
+    if isinstance(value, (pl.Expr, MergeableAgg)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(describe_attribute(item) for item in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        # Iteration order of sets depends on the hash seed of the process
+        return "{" + ", ".join(sorted(describe_attribute(item) for item in value)) + "}"
+    if isinstance(value, CodeType):
+        # Nested code objects, e.g. lambdas, have their address in their repr
+        return (
+            value.co_code.hex()
+            + repr(value.co_names)
+            + describe_attribute(value.co_consts)
+        )
+    code = getattr(value, "__code__", None)
+    if code is not None:
+        return describe_attribute(code)
+    if callable(value) or isinstance(value, (classmethod, staticmethod, property)):
+        return type(value).__name__
+    return repr(value)
+
+
+def get_class_source(cls: type) -> str:
+    """Get the source of a rule class.
+
+    Parameters
+    ----------
+    cls : type
+        Rule class.
+
+    Returns
+    -------
+    str
+        Source of the class, or a description of its attributes if it has
+        no source file.
+    """
+    try:
+        return inspect.getsource(cls)
+    except (OSError, TypeError):
+        # Rules defined in notebooks or at runtime have no source file
+        return "\n".join(
+            f"{name}={describe_attribute(value)}"
+            for name, value in sorted(vars(cls).items())
+            if not name.startswith("_")
+        )
+
 
 class BaseRule(ABC):
     """Base class for defining rules."""
 
+    # Measurement columns read by the rule
+    columns: ClassVar[List[str]] = []
+    # Filter on hive partition columns, used to skip measurement files
+    partition_filter: ClassVar[Optional[pl.Expr]] = None
+    # Bump to invalidate cached results when the rule changes in other ways
+    # than its source, e.g. through a helper function
+    version: ClassVar[int] = 1
+
     def __init__(self: "BaseRule", out_path: Path) -> None:
         """Initialize Rule.
 
@@ -22,6 +114,111 @@ class BaseRule(ABC):
         """
         self.out_path = out_path
 
+    def plan(self: "BaseRule", df: pl.LazyFrame) -> Optional[pl.LazyFrame]:
+        """Build the query of the rule.
+
+        Rules that return a query are evaluated together with the other rules
+        in a single pass over the measurements, see `evaluate_rules`. Their
+        `validate` evaluates the query on its own, see `SpecRule.validate`.
+
+        Parameters
+        ----------
+        df : pl.LazyFrame
+            Mesaurement lazyframe.
+
+        Returns
+        -------
+        Optional[pl.LazyFrame]
+            Query of the rule, None if the rule only implements `validate`.
+        """
+        return None
+
+    def is_mergeable(self: "BaseRule") -> bool:
+        """Check if the rule is computed from per file partial aggregates.
+
+        Returns
+        -------
+        bool
+            Flag indicating the rule is mergeable, see `SpecRule`.
+        """
+        return False
+
+    def is_row_level(self: "BaseRule") -> bool:
+        """Check if each measurement row is judged on its own.
+
+        Row level rules give the same violations on a subset of the
+        measurements, e.g. the delta of two inventory revisions.
+
+        Returns
+        -------
+        bool
+            Flag indicating the rule is row level.
+        """
+        return False
+
+    def get_sink_path(self: "BaseRule") -> Optional[Path]:
+        """Get the parquet file the query result is streamed to.
+
+        Returns
+        -------
+        Optional[Path]
+            Path of the sink, None if the result is collected in memory.
+        """
+        return None
+
+    def get_output_paths(self: "BaseRule") -> List[Path]:
+        """Get the files written by the rule.
+
+        Cached results are only used while all of them exist.
+
+        Returns
+        -------
+        List[Path]
+            Paths of the rule outputs.
+        """
+        sink_path = self.get_sink_path()
+        return [] if sink_path is None else [sink_path]
+
+    def get_identity(self: "BaseRule") -> str:
+        """Get a hash identifying the rule code and configuration.
+
+        Returns
+        -------
+        str
+            Rule identity hash.
+        """
+        rule_cls = type(self)
+        # Base classes up to BaseRule plan and report the rule too
+        mro = rule_cls.__mro__
+        sources = [get_class_source(cls) for cls in mro[: mro.index(BaseRule) + 1]]
+        identity = [
+            f"{rule_cls.__module__}.{rule_cls.__qualname__}",
+            str(self.version),
+            *sources,
+            # Aggregations built by helpers like `agg_set` change with them
+            describe_attribute(getattr(self, "agg", [])),
+            str(self.out_path),
+        ]
+        return hashlib.md5("\n".join(identity).encode()).hexdigest()
+
+    def report(self: "BaseRule", result: pl.DataFrame, num_rows: int) -> bool:
+        """Check and write out the query result.
+
+        Parameters
+        ----------
+        result : pl.DataFrame
+            Collected result of `plan`, or a sample of it if the result was
+            streamed to the sink path.
+        num_rows : int
+            Number of rows in the query result.
+
+        Returns
+        -------
+        bool
+            Flag indicating check passed or not.
+        """
+        return True
+
     @abstractmethod
     def validate(self: "BaseRule", df: pl.LazyFrame) -> bool:
         """Run validation.
@@ -39,30 +236,598 @@ class BaseRule(ABC):
         pass
 
 
-class CheckProjectDirs(BaseRule):
-    """Check if all defined dirs are present for a project."""
+def get_files_fingerprint(files: List[Path]) -> str:
+    """Get a fingerprint of the measurement files read by rules.
 
-    def validate(self: "CheckProjectDirs", df: pl.LazyFrame) -> bool:
-        """Run validation.
+    Parameters
+    ----------
+    files : List[Path]
+        Measurement files.
+
+    Returns
+    -------
+    str
+        Hash of the paths, sizes and modification times of the files.
+    """
+    stats = []
+    for file in sorted(files):
+        stat = file.stat()
+        stats.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.md5("\n".join(stats).encode()).hexdigest()
+
+
+class RuleCache:
+    """Cache of rule results.
+
+    Results are keyed on a fingerprint of the measurement files read by the
+    rule and on the rule identity, see `BaseRule.get_identity`. Each rule is
+    cached in its own file, so rules evaluated by different workers do not
+    race on the cache.
+    """
+
+    def __init__(self: "RuleCache", cache_dir: Path) -> None:
+        """Initialize RuleCache.
 
         Parameters
         ----------
-        df : pl.LazyFrame
-            Mesaurement lazyframe.
+        cache_dir : Path
+            Dir to store cached results.
+        """
+        self.cache_dir = cache_dir
+
+    def get_entry_path(self: "RuleCache", rule: BaseRule) -> Path:
+        """Get the cache file of a rule.
+
+        Parameters
+        ----------
+        rule : BaseRule
+            Cached rule.
 
         Returns
         -------
-        bool
+        Path
+            Path of the cache file.
+        """
+        rule_cls = type(rule)
+        return self.cache_dir.joinpath(
+            f"{rule_cls.__module__}.{rule_cls.__qualname__}.json"
+        )
+
+    def get(self: "RuleCache", rule: BaseRule, fingerprint: str) -> Optional[bool]:
+        """Get the cached result of a rule.
+
+        Parameters
+        ----------
+        rule : BaseRule
+            Rule to look up.
+        fingerprint : str
+            Fingerprint of the measurement files read by the rule.
+
+        Returns
+        -------
+        Optional[bool]
+            Cached flag indicating check passed or not, None on a cache miss.
+        """
+        entry_path = self.get_entry_path(rule)
+        if not entry_path.exists():
+            return None
+        with entry_path.open() as f:
+            entry = json.load(f)
+        if (
+            entry.get("identity") != rule.get_identity()
+            or entry.get("fingerprint") != fingerprint
+            or not all(path.exists() for path in rule.get_output_paths())
+        ):
+            return None
+        return entry["passed"]
+
+    def put(self: "RuleCache", rule: BaseRule, fingerprint: str, passed: bool) -> None:
+        """Cache the result of a rule.
+
+        Parameters
+        ----------
+        rule : BaseRule
+            Evaluated rule.
+        fingerprint : str
+            Fingerprint of the measurement files read by the rule.
+        passed : bool
             Flag indicating check passed or not.
         """
-        return True
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self.get_entry_path(rule)
+        tmp_path = entry_path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(
+                {
+                    "identity": rule.get_identity(),
+                    "fingerprint": fingerprint,
+                    "passed": passed,
+                },
+                f,
+                indent=2,
+            )
+        tmp_path.replace(entry_path)
 
 
-class CheckJUMPProjectStructure(BaseRule):
-    """Check if the JUMP projects meets the required directory structure."""
+class PartialStore:
+    """Store of the partial aggregates of mergeable rules.
+
+    Partial aggregates are stored for each rule and measurement file, keyed
+    on the rule identity and the fingerprint of the file. Only the partials
+    of new or changed measurement files are computed.
+    """
+
+    def __init__(self: "PartialStore", store_dir: Path, files: List[Path]) -> None:
+        """Initialize PartialStore.
+
+        Parameters
+        ----------
+        store_dir : Path
+            Dir to store partial aggregates.
+        files : List[Path]
+            Measurement files read by the rules.
+        """
+        self.store_dir = store_dir
+        self.files = files
+        self.partial_paths: Dict[int, List[Path]] = {}
+
+    def get_rule_dir(self: "PartialStore", rule: BaseRule) -> Path:
+        """Get the dir of the partial aggregates of a rule.
+
+        Parameters
+        ----------
+        rule : BaseRule
+            Mergeable rule.
+
+        Returns
+        -------
+        Path
+            Dir of the partial aggregates.
+        """
+        rule_cls = type(rule)
+        return self.store_dir.joinpath(f"{rule_cls.__module__}.{rule_cls.__qualname__}")
+
+    def update(self: "PartialStore", rules: List[BaseRule]) -> None:
+        """Compute missing partial aggregates and drop stale ones.
+
+        Partials of all rules are computed in a single pass over each
+        measurement file.
+
+        Parameters
+        ----------
+        rules : List[BaseRule]
+            Mergeable rules.
+        """
+        for rule in rules:
+            identity = rule.get_identity()
+            self.partial_paths[id(rule)] = [
+                self.get_rule_dir(rule).joinpath(
+                    hashlib.md5(f"{identity}\n{file}".encode()).hexdigest()
+                    + f"-{get_files_fingerprint([file])}.parquet"
+                )
+                for file in self.files
+            ]
+        for idx, file in enumerate(self.files):
+            missing = [
+                rule for rule in rules if not self.partial_paths[id(rule)][idx].exists()
+            ]
+            if len(missing) == 0:
+                continue
+            df = pl.scan_parquet(file, hive_partitioning=False)
+            partials = pl.collect_all(
+                [rule.plan_partial(df) for rule in missing],  # type: ignore
+                streaming=True,
+            )
+            for rule, partial in zip(missing, partials):
+                partial_path = self.partial_paths[id(rule)][idx]
+                partial_path.parent.mkdir(parents=True, exist_ok=True)
+                partial.write_parquet(partial_path)
+        # Partials of changed or removed measurement files
+        for rule in rules:
+            current = set(self.partial_paths[id(rule)])
+            for partial_path in self.get_rule_dir(rule).glob("*.parquet"):
+                if partial_path not in current:
+                    partial_path.unlink()
+
+    def plan(self: "PartialStore", rule: BaseRule) -> pl.LazyFrame:
+        """Build the query of a mergeable rule from the stored partials.
+
+        Parameters
+        ----------
+        rule : BaseRule
+            Mergeable rule, updated with `update`.
+
+        Returns
+        -------
+        pl.LazyFrame
+            Violations of the rule.
+        """
+        partials = pl.scan_parquet(
+            self.partial_paths[id(rule)], hive_partitioning=False
+        )
+        return rule.plan_merge(partials)  # type: ignore
 
-    def validate(self: "BaseRule", df: pl.LazyFrame) -> bool:
-        """Run validation.
+
+def sink_plan(plan: pl.LazyFrame, sink_path: Path) -> None:
+    """Stream the result of a query to a parquet file.
+
+    Queries that the streaming engine can not sink, like some aggregations,
+    are collected in streaming mode and written out.
+
+    Parameters
+    ----------
+    plan : pl.LazyFrame
+        Rule query.
+    sink_path : Path
+        Path of the parquet file.
+    """
+    try:
+        plan.sink_parquet(sink_path)
+    except pl.InvalidOperationError:
+        plan.collect(streaming=True).write_parquet(sink_path)
+
+
+def evaluate_rules(
+    rules: List[BaseRule],
+    df: pl.LazyFrame,
+    cache: Optional[RuleCache] = None,
+    fingerprint: Optional[str] = None,
+    partial_store: Optional[PartialStore] = None,
+) -> List[bool]:
+    """Evaluate rules in a single pass over the measurements.
+
+    The queries of all rules are collected together in streaming mode, so
+    that polars scans the shared measurements once. Rules with a sink path
+    stream their result to parquet instead and are reported with a sample,
+    so large results never have to fit in memory. Rules without a query are
+    validated on their own.
+
+    Parameters
+    ----------
+    rules : List[BaseRule]
+        Rules to evaluate.
+    df : pl.LazyFrame
+        Mesaurement lazyframe.
+    cache : Optional[RuleCache]
+        Cache of rule results, unchanged rules are not evaluated again.
+    fingerprint : Optional[str]
+        Fingerprint of the measurement files in `df`, required with `cache`.
+    partial_store : Optional[PartialStore]
+        Store of partial aggregates, mergeable rules are merged from the
+        partials instead of scanning `df`.
+
+    Returns
+    -------
+    List[bool]
+        Flag indicating check passed or not, for each rule.
+    """
+    if cache is not None and fingerprint is not None:
+        cached = [cache.get(rule, fingerprint) for rule in rules]
+        for rule, passed in zip(rules, cached):
+            if passed is not None:
+                print(f"{type(rule).__name__}: cached, passed={passed}")
+        stale = [rule for rule, passed in zip(rules, cached) if passed is None]
+        evaluated = evaluate_rules(stale, df, partial_store=partial_store)
+        for rule, passed in zip(stale, evaluated):
+            cache.put(rule, fingerprint, passed)
+        evaluated_iter = iter(evaluated)
+        return [next(evaluated_iter) if passed is None else passed for passed in cached]
+    if partial_store is not None:
+        partial_store.update([rule for rule in rules if rule.is_mergeable()])
+    plans = [
+        partial_store.plan(rule)
+        if partial_store is not None and rule.is_mergeable()
+        else rule.plan(df)
+        for rule in rules
+    ]
+    sink_paths = [rule.get_sink_path() for rule in rules]
+    results = iter(
+        pl.collect_all(
+            [
+                plan
+                for plan, sink_path in zip(plans, sink_paths)
+                if plan is not None and sink_path is None
+            ],
+            streaming=True,
+        )
+    )
+    passed = []
+    for rule, plan, sink_path in zip(rules, plans, sink_paths):
+        if plan is None:
+            passed.append(rule.validate(df))
+        elif sink_path is None:
+            result = next(results)
+            passed.append(rule.report(result, len(result)))
+        else:
+            sink_plan(plan, sink_path)
+            num_rows = pl.scan_parquet(sink_path).select(pl.len()).collect().item()
+            sample = pl.read_parquet(sink_path, n_rows=REPORT_SAMPLE_SIZE)
+            passed.append(rule.report(sample, num_rows))
+    return passed
+
+
+def get_root_names(exprs: List[pl.Expr]) -> List[str]:
+    """Get the columns used by expressions.
+
+    Parameters
+    ----------
+    exprs : List[pl.Expr]
+        Polars expressions.
+
+    Returns
+    -------
+    List[str]
+        Column names, in order of first use.
+    """
+    names = [name for expr in exprs for name in expr.meta.root_names()]
+    return list(dict.fromkeys(names))
+
+
+class MergeableAgg:
+    """Aggregation that can be merged from partial aggregates.
+
+    The `partial` expression aggregates the rows of a group in one
+    measurement file, the `merge` expression combines the partial
+    aggregates of all files into the final value.
+    """
+
+    def __init__(self: "MergeableAgg", partial: pl.Expr, merge: pl.Expr) -> None:
+        """Initialize MergeableAgg.
+
+        Parameters
+        ----------
+        partial : pl.Expr
+            Aggregation of the rows of a measurement file.
+        merge : pl.Expr
+            Aggregation of the partial aggregates.
+        """
+        self.partial = partial
+        self.merge = merge
+
+    def __str__(self: "MergeableAgg") -> str:
+        """Describe the aggregation."""
+        return f"MergeableAgg({self.partial}, {self.merge})"
+
+
+def agg_set(expr: pl.Expr) -> MergeableAgg:
+    """Aggregate the unique values of an expression.
+
+    Parameters
+    ----------
+    expr : pl.Expr
+        Expression to aggregate.
+
+    Returns
+    -------
+    MergeableAgg
+        Mergeable unique values aggregation.
+    """
+    name = expr.meta.output_name()
+    return MergeableAgg(expr.unique(), pl.col(name).explode().unique())
+
+
+def agg_count(name: str = "len") -> MergeableAgg:
+    """Aggregate the number of rows.
+
+    Parameters
+    ----------
+    name : str
+        Name of the output column.
+
+    Returns
+    -------
+    MergeableAgg
+        Mergeable count aggregation.
+    """
+    return MergeableAgg(pl.len().alias(name), pl.col(name).sum())
+
+
+def agg_sum(expr: pl.Expr) -> MergeableAgg:
+    """Aggregate the sum of an expression.
+
+    Parameters
+    ----------
+    expr : pl.Expr
+        Expression to aggregate.
+
+    Returns
+    -------
+    MergeableAgg
+        Mergeable sum aggregation.
+    """
+    return MergeableAgg(expr.sum(), pl.col(expr.meta.output_name()).sum())
+
+
+def agg_min(expr: pl.Expr) -> MergeableAgg:
+    """Aggregate the minimum of an expression.
+
+    Parameters
+    ----------
+    expr : pl.Expr
+        Expression to aggregate.
+
+    Returns
+    -------
+    MergeableAgg
+        Mergeable minimum aggregation.
+    """
+    return MergeableAgg(expr.min(), pl.col(expr.meta.output_name()).min())
+
+
+def agg_max(expr: pl.Expr) -> MergeableAgg:
+    """Aggregate the maximum of an expression.
+
+    Parameters
+    ----------
+    expr : pl.Expr
+        Expression to aggregate.
+
+    Returns
+    -------
+    MergeableAgg
+        Mergeable maximum aggregation.
+    """
+    return MergeableAgg(expr.max(), pl.col(expr.meta.output_name()).max())
+
+
+class SpecRule(BaseRule):
+    """Base class for rules defined by a declarative specification.
+
+    The query of the rule is built from its specification: rows matching all
+    `where` conditions are grouped by `group_by` and aggregated with `agg`,
+    then projected with `select`. Result rows that do not meet `expect` are
+    violations; without `expect` every result row is a violation. Violations
+    are written to `out_name` in the rule out path.
+
+    If all aggregations are `MergeableAgg`, the rule is mergeable: partial
+    aggregates are computed for each measurement file and merged, so only
+    the partials of changed files have to be computed again.
+
+    The columns and partitions read by the rule are derived from the
+    specification, so the engine pushes them down into the parquet scan.
+    """
+
+    # Row conditions, all of them have to match
+    where: ClassVar[List[pl.Expr]] = []
+    # Columns to group the matching rows by
+    group_by: ClassVar[List[str]] = []
+    # Aggregations for each group
+    agg: ClassVar[List[Union[pl.Expr, MergeableAgg]]] = []
+    # Projection of the result
+    select: ClassVar[List[pl.Expr]] = []
+    # Condition every result row is expected to meet
+    expect: ClassVar[Optional[pl.Expr]] = None
+    # File name of the violations, defaults to the snake case rule name
+    out_name: ClassVar[str] = ""
+
+    def __init_subclass__(cls: Type["SpecRule"], **kwargs: object) -> None:
+        """Derive the columns and partitions read by the rule."""
+        super().__init_subclass__(**kwargs)
+        if "columns" not in cls.__dict__:
+            aggs = [
+                agg.partial if isinstance(agg, MergeableAgg) else agg for agg in cls.agg
+            ]
+            names = get_root_names(cls.where + aggs) + cls.group_by
+            if len(cls.group_by) == 0:
+                names += get_root_names(cls.select)
+            cls.columns = list(dict.fromkeys(names))
+        if cls.out_name == "":
+            words = CAMEL_CASE_BOUNDARY.sub("_", cls.__name__).lower()
+            cls.out_name = f"{words}.parquet"
+        if "partition_filter" not in cls.__dict__:
+            partition_conditions = [
+                cond
+                for cond in cls.where
+                if set(cond.meta.root_names()).issubset(PARTITION_COLUMNS)
+            ]
+            if len(partition_conditions) != 0:
+                cls.partition_filter = pl.all_horizontal(partition_conditions)
+
+    def is_mergeable(self: "SpecRule") -> bool:
+        """Check if the rule is computed from per file partial aggregates.
+
+        Returns
+        -------
+        bool
+            Flag indicating all aggregations of the rule are mergeable.
+        """
+        return len(self.group_by) != 0 and all(
+            isinstance(agg, MergeableAgg) for agg in self.agg
+        )
+
+    def is_row_level(self: "SpecRule") -> bool:
+        """Check if each measurement row is judged on its own.
+
+        Returns
+        -------
+        bool
+            Flag indicating the rule does not group rows.
+        """
+        return len(self.group_by) == 0
+
+    def plan_partial(self: "SpecRule", df: pl.LazyFrame) -> pl.LazyFrame:
+        """Build the query of the partial aggregates of a mergeable rule.
+
+        Parameters
+        ----------
+        df : pl.LazyFrame
+            Mesaurement lazyframe, usually of a single measurement file.
+
+        Returns
+        -------
+        pl.LazyFrame
+            Partial aggregates for each group.
+        """
+        if len(self.columns) != 0:
+            df = df.select(self.columns)
+        if len(self.where) != 0:
+            df = df.filter(pl.all_horizontal(self.where))
+        return df.group_by(self.group_by).agg(
+            [agg.partial for agg in self.agg]  # type: ignore
+        )
+
+    def plan_merge(self: "SpecRule", partials: pl.LazyFrame) -> pl.LazyFrame:
+        """Build the query of a mergeable rule from partial aggregates.
+
+        Parameters
+        ----------
+        partials : pl.LazyFrame
+            Partial aggregates, see `plan_partial`.
+
+        Returns
+        -------
+        pl.LazyFrame
+            Violations of the rule.
+        """
+        df = partials.group_by(self.group_by).agg(
+            [agg.merge for agg in self.agg]  # type: ignore
+        )
+        return self.plan_result(df)
+
+    def plan_result(self: "SpecRule", df: pl.LazyFrame) -> pl.LazyFrame:
+        """Project the result and keep the violations.
+
+        Parameters
+        ----------
+        df : pl.LazyFrame
+            Aggregated or filtered measurements.
+
+        Returns
+        -------
+        pl.LazyFrame
+            Violations of the rule.
+        """
+        if len(self.select) != 0:
+            df = df.select(self.select)
+        if self.expect is not None:
+            df = df.filter(self.expect.not_())
+        return df
+
+    def plan(self: "SpecRule", df: pl.LazyFrame) -> pl.LazyFrame:
+        """Build the query of the rule from its specification.
+
+        Parameters
+        ----------
+        df : pl.LazyFrame
+            Mesaurement lazyframe.
+
+        Returns
+        -------
+        pl.LazyFrame
+            Violations of the rule.
+        """
+        if self.is_mergeable():
+            return self.plan_merge(self.plan_partial(df))
+        if len(self.columns) != 0:
+            df = df.select(self.columns)
+        if len(self.where) != 0:
+            df = df.filter(pl.all_horizontal(self.where))
+        if len(self.group_by) != 0:
+            df = df.group_by(self.group_by).agg(self.agg)
+        return self.plan_result(df)
+
+    def validate(self: "SpecRule", df: pl.LazyFrame) -> bool:
+        """Run validation on its own, instead of together with other rules.
 
         Parameters
         ----------
@@ -74,29 +839,60 @@ class CheckJUMPProjectStructure(BaseRule):
         bool
             Flag indicating check passed or not.
         """
-        # Setup out path for the check output
-        out_path = self.out_path.joinpath("check_jump_project_structure.parquet")
+        return evaluate_rules([self], df)[0]
+
+    def get_sink_path(self: "SpecRule") -> Optional[Path]:
+        """Get the parquet file the violations are streamed to.
+
+        Only row level violations are streamed, aggregated results are small
+        and are collected together with the other rules.
+
+        Returns
+        -------
+        Optional[Path]
+            Path of the sink, None if the result is collected in memory.
+        """
+        if not self.is_row_level():
+            return None
+        return self.out_path.joinpath(self.out_name)
 
-        # filter and group jump project entries
-        jump_projects = df.filter(pl.col("dataset_id").str.contains("jump+"))
-        project_groups = jump_projects.group_by("dataset_id")
+    def get_output_paths(self: "SpecRule") -> List[Path]:
+        """Get the files written by the rule.
 
-        project_workspace_dirs = project_groups.agg(pl.col("workspace_dir").unique())
+        Returns
+        -------
+        List[Path]
+            Paths of the rule outputs.
+        """
+        return [self.out_path.joinpath(self.out_name)]
 
-        # Write out the final dataframe.
-        final_df = project_workspace_dirs.collect()
-        final_df.write_parquet(str(out_path.absolute()))
-        final_dict = final_df.to_dict()
-        for folders in final_dict["workspace_dir"]:
-            print(list(folders))
+    def report(self: "SpecRule", result: pl.DataFrame, num_rows: int) -> bool:
+        """Write out the violations of the rule.
 
-        return False
+        Parameters
+        ----------
+        result : pl.DataFrame
+            Violations of the rule, or a sample of them if they were streamed
+            to the sink path.
+        num_rows : int
+            Number of violations.
 
+        Returns
+        -------
+        bool
+            Flag indicating check passed or not.
+        """
+        if self.get_sink_path() is None:
+            result.write_parquet(self.out_path.joinpath(self.out_name))
+        print(f"{type(self).__name__}: {num_rows} violations")
+        print(result.head(REPORT_SAMPLE_SIZE))
+        return num_rows == 0
 
-class CheckWorkspaceDirs(BaseRule):
-    """Check if all defined dirs are present in a workspace for all projects."""
 
-    def validate(self: "CheckWorkspaceDirs", df: pl.LazyFrame) -> bool:
+class CheckProjectDirs(BaseRule):
+    """Check if all defined dirs are present for a project."""
+
+    def validate(self: "CheckProjectDirs", df: pl.LazyFrame) -> bool:
         """Run validation.
 
         Parameters
@@ -109,17 +905,40 @@ class CheckWorkspaceDirs(BaseRule):
         bool
             Flag indicating check passed or not.
         """
-        project_groups = df.groupby("dataset_id")
-        project_workspace_dirs = project_groups.agg(
-            pl.col("workspace_dir").unique()
-        ).collect()
-        print(project_workspace_dirs.head())
-        project_wdirs_unique = project_workspace_dirs.with_columns(
-            (pl.col("workspace_dir").list.set_difference(["imagess"])).alias(
-                "check_wdirs"
-            )
-        )
-        print(project_wdirs_unique)
-        # final_df = project_wdirs_unique.select(pl.col("check_wdirs").ne())
         return True
-        # for row in project_workspace_dirs.iter_rows
+
+
+class CheckParsingErrors(SpecRule):
+    """Check if all prefixes are parsed without errors."""
+
+    where: ClassVar[List[pl.Expr]] = [pl.col("is_parsing_error").eq(True)]
+    select: ClassVar[List[pl.Expr]] = [pl.col("obj_key"), pl.col("error_code")]
+
+
+class CheckJUMPProjectStructure(SpecRule):
+    """Check if the JUMP projects meets the required directory structure."""
+
+    where: ClassVar[List[pl.Expr]] = [
+        pl.col("dataset_id").cast(pl.Utf8).str.contains("jump+")
+    ]
+    group_by: ClassVar[List[str]] = ["dataset_id"]
+    agg: ClassVar[List[Union[pl.Expr, MergeableAgg]]] = [
+        agg_set(pl.col("workspace_dir"))
+    ]
+    out_name: ClassVar[str] = "check_jump_project_structure.parquet"
+
+
+class CheckWorkspaceDirs(SpecRule):
+    """Check if all defined dirs are present in a workspace for all projects."""
+
+    group_by: ClassVar[List[str]] = ["dataset_id"]
+    agg: ClassVar[List[Union[pl.Expr, MergeableAgg]]] = [
+        agg_set(pl.col("workspace_dir").cast(pl.Utf8))
+    ]
+    expect: ClassVar[Optional[pl.Expr]] = (
+        pl.col("workspace_dir")
+        .list.set_intersection(REQUIRED_WORKSPACE_DIRS)
+        .list.len()
+        .eq(len(REQUIRED_WORKSPACE_DIRS))
+    )
+    out_name: ClassVar[str] = "check_workspace_dirs.parquet"
@@ -3,19 +3,59 @@
 This module provide utility functions shared by other modules in the package.
 """
 
+import hashlib
 import json
 import os
-import re
-import subprocess
+import queue
+import threading
+import time
 from collections.abc import Sequence
-from contextlib import redirect_stdout
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from fnmatch import fnmatch
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
 
+import boto3
+import pyarrow as pa
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore import UNSIGNED
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from joblib import Parallel, cpu_count, delayed
+from pyarrow import parquet as pq
+from s3transfer.subscribers import BaseSubscriber
 from tqdm import tqdm
 
+from cpgdata.metrics import RunMetrics, write_metrics
+
+# Concurrent requests, and pooled connections, of the S3 transfer engine
+S3_MAX_CONCURRENCY = 32
+# Objects larger than the threshold are fetched with concurrent ranged GETs
+S3_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+S3_MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+# Attempts per request, including throttled and dropped connections
+S3_MAX_ATTEMPTS = 10
+
+# Bytes read at a time when streaming objects and hashing files
+SYNC_CHUNK_SIZE = 8 * 1024 * 1024
+# Suffix of partially downloaded files, resumed by the next sync
+SYNC_PARTIAL_SUFFIX = ".part"
+# Verified checksums of synced files, saves hashing them on every sync
+SYNC_STATE = ".sync_state.json"
+# Manifest of the synced inventory revision, next to the data dir
+INVENTORY_MANIFEST = "inventory_manifest.json"
+# S3 error codes of requests that can succeed when retried, besides 5xx errors
+S3_RETRYABLE_ERRORS = {
+    "RequestTimeout",
+    "SlowDown",
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+}
+# Delay before the first retry of a resumed download, doubled on each retry
+S3_RETRY_BACKOFF = 0.1
+S3_RETRY_MAX_BACKOFF = 20.0
+
 
 def slice_iterable(iterable: Sequence, count: int) -> List[slice]:
     """Create slices of the given iterable.
@@ -41,8 +81,13 @@ def slice_iterable(iterable: Sequence, count: int) -> List[slice]:
         raise Exception(
             f"Length of iterable: {len(iterable)} is less than count: {count}"
         )
-    for i in range(0, len(iterable), len(iterable) // count):
-        slices.append(slice(i, i + len(iterable) // count))
+    # Spread the remainder over the first slices, sizes differ by at most one
+    size, remainder = divmod(len(iterable), count)
+    start = 0
+    for i in range(count):
+        stop = start + size + (1 if i < remainder else 0)
+        slices.append(slice(start, stop))
+        start = stop
     return slices
 
 
@@ -52,9 +97,17 @@ def parallel(
     args: List[Any] = [],
     jobs: Optional[int] = None,
     timeout: Optional[float] = None,
+    sizes: Optional[Sequence[float]] = None,
+    dynamic: bool = False,
+    metrics: Optional[RunMetrics] = None,
 ) -> Any:  # noqa: ANN401
     """Distribute process on iterable.
 
+    By default the iterable is cut into one slice per job up front. In
+    dynamic mode every item is a separate task: tasks are queued largest
+    first and handed to the reused workers as they become free, so skewed
+    item sizes do not leave workers idle.
+
     Parameters
     ----------
     iterable : Sequence
@@ -67,6 +120,12 @@ def parallel(
         Number of jobs to launch, by default None
     timeout: float, optional
         Timeout for worker processes.
+    sizes : Sequence[float], optional
+        Amount of work for each item, used to order tasks in dynamic mode.
+    dynamic : bool
+        Schedule one task per item from a queue instead of static slices.
+    metrics : Optional[RunMetrics]
+        Records the wall time and number of items as the `parallel` stage.
 
     Returns
     -------
@@ -74,14 +133,32 @@ def parallel(
         A list of outputs genetated by function.
 
     """
-    jobs = jobs or cpu_count()
-    if len(iterable) <= jobs:
-        jobs = len(iterable)
-    slices = slice_iterable(iterable, jobs)
-    return Parallel(n_jobs=jobs, timeout=timeout)(
-        delayed(func)(chunk, *args, idx % jobs)
-        for idx, chunk in enumerate([iterable[s] for s in slices])
-    )
+    metrics = metrics or RunMetrics()
+    with metrics.timed("parallel", len(iterable)):
+        jobs = jobs or cpu_count()
+        if len(iterable) <= jobs:
+            jobs = len(iterable)
+        if dynamic is True:
+            order = list(range(len(iterable)))
+            if sizes is not None:
+                order.sort(key=lambda i: sizes[i], reverse=True)
+            # One task per dispatch so free workers always pick the next item
+            outputs = Parallel(
+                n_jobs=jobs, timeout=timeout, batch_size=1, pre_dispatch="n_jobs"
+            )(
+                delayed(func)([iterable[i]], *args, task_idx % jobs)
+                for task_idx, i in enumerate(order)
+            )
+            # Outputs follow the order of the iterable
+            ordered_outputs = [None] * len(iterable)
+            for i, output in zip(order, outputs):
+                ordered_outputs[i] = output
+            return ordered_outputs
+        slices = slice_iterable(iterable, jobs)
+        return Parallel(n_jobs=jobs, timeout=timeout)(
+            delayed(func)(chunk, *args, idx % jobs)
+            for idx, chunk in enumerate([iterable[s] for s in slices])
+        )
 
 
 def get_package_root_path() -> Path:
@@ -96,10 +173,498 @@ def get_package_root_path() -> Path:
     return Path(__file__).parents[1].absolute()
 
 
+def get_s3_client(
+    unsigned: bool = True,
+    endpoint_url: Optional[str] = None,
+    max_pool_connections: int = S3_MAX_CONCURRENCY,
+) -> Any:  # noqa: ANN401
+    """Create a pooled S3 client.
+
+    The client is thread safe and keeps connections alive, share it
+    between transfers instead of creating one per object. The endpoint
+    defaults to the `AWS_ENDPOINT_URL` environment variable, which can
+    point to a local S3 stand-in like MinIO.
+
+    Parameters
+    ----------
+    unsigned : bool
+        Send anonymous requests, the Cell Painting Gallery is public.
+    endpoint_url : Optional[str]
+        S3 endpoint url.
+    max_pool_connections : int
+        Number of connections kept in the pool.
+
+    Returns
+    -------
+    botocore.client.S3
+        S3 client.
+
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "adaptive"},
+    )
+    if unsigned is True:
+        config = config.merge(Config(signature_version=UNSIGNED))
+    return boto3.session.Session().client(
+        "s3", endpoint_url=endpoint_url, config=config
+    )
+
+
+class DownloadProgress(BaseSubscriber):
+    """Update a progress bar once a download is done.
+
+    Parameters
+    ----------
+    pbar : tqdm
+        Progress bar counting downloaded objects.
+
+    """
+
+    def __init__(self: "DownloadProgress", pbar: tqdm) -> None:
+        """Initialize the subscriber.
+
+        Parameters
+        ----------
+        pbar : tqdm
+            Progress bar counting downloaded objects.
+
+        """
+        self.pbar = pbar
+
+    def on_done(
+        self: "DownloadProgress", future: Any, **kwargs: Any  # noqa: ANN401
+    ) -> None:
+        """Count a finished download.
+
+        Parameters
+        ----------
+        future : s3transfer.futures.TransferFuture
+            Future of the download.
+        kwargs : Any
+            Keyword args passed by s3transfer.
+
+        """
+        self.pbar.update(1)
+
+
+def download_s3_objects(
+    bucket: str,
+    keys: List[str],
+    out_path: Path,
+    flatten: bool = False,
+    client: Optional[Any] = None,  # noqa: ANN401
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+    no_progress: bool = False,
+) -> List[Path]:
+    """Download S3 objects concurrently in process.
+
+    All objects share one client and one pool of transfer threads. Large
+    objects are split into concurrent ranged GETs, failed requests are
+    retried and files are only moved in place once fully downloaded.
+
+    Parameters
+    ----------
+    bucket : str
+        S3 bucket identifier.
+    keys : List[str]
+        S3 keys to download.
+    out_path : Path
+        Path to save the objects.
+    flatten : bool
+        Save all files in single directory ignoring prefix structure.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+    max_concurrency : int
+        Number of concurrent requests.
+    no_progress : bool
+        Flag to control display of transfer progress.
+
+    Returns
+    -------
+    List[Path]
+        Paths of the downloaded files.
+
+    """
+    if client is None:
+        client = get_s3_client(max_pool_connections=max_concurrency)
+    config = TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+        max_concurrency=max_concurrency,
+    )
+    write_paths = []
+    with tqdm(
+        total=len(keys), desc="Downloading files", disable=no_progress
+    ) as pbar, create_transfer_manager(client, config) as manager:
+        futures = []
+        for key in keys:
+            if flatten is True:
+                write_path = out_path.joinpath(key.split("/")[-1])
+            else:
+                write_path = out_path.joinpath(key)
+            write_path.parent.mkdir(parents=True, exist_ok=True)
+            futures.append(
+                manager.download(
+                    bucket,
+                    key,
+                    str(write_path),
+                    subscribers=[DownloadProgress(pbar)],
+                )
+            )
+            write_paths.append(write_path)
+        # Raise the first failed download
+        for future in futures:
+            future.result()
+    return write_paths
+
+
+def md5_file(path: Path, md5: Optional[Any] = None) -> Any:  # noqa: ANN401
+    """Hash a file in chunks.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the file.
+    md5 : Optional[hashlib._Hash]
+        Hash to update, a new md5 hash by default.
+
+    Returns
+    -------
+    hashlib._Hash
+        Updated hash.
+
+    """
+    if md5 is None:
+        md5 = hashlib.md5()
+    with path.open("rb") as f:
+        while chunk := f.read(SYNC_CHUNK_SIZE):
+            md5.update(chunk)
+    return md5
+
+
+def read_sync_state(out_path: Path) -> Dict[str, dict]:
+    """Read verified checksums of synced files.
+
+    Parameters
+    ----------
+    out_path : Path
+        Path to dir containing synced files.
+
+    Returns
+    -------
+    Dict[str, dict]
+        Size, modification time and md5 checksum by file name.
+
+    """
+    state_json = out_path.joinpath(SYNC_STATE)
+    if not state_json.exists():
+        return {}
+    with state_json.open() as f:
+        return json.load(f)
+
+
+def write_sync_state(out_path: Path, state: Dict[str, dict]) -> None:
+    """Write verified checksums of synced files.
+
+    Parameters
+    ----------
+    out_path : Path
+        Path to dir containing synced files.
+    state : Dict[str, dict]
+        Size, modification time and md5 checksum by file name.
+
+    """
+    tmp_json = out_path.joinpath(SYNC_STATE + SYNC_PARTIAL_SUFFIX)
+    with tmp_json.open("w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    tmp_json.replace(out_path.joinpath(SYNC_STATE))
+
+
+def get_sync_entry(path: Path, md5: Optional[str]) -> dict:
+    """Get the sync state entry of a verified file.
+
+    Parameters
+    ----------
+    path : Path
+        Path to the file.
+    md5 : Optional[str]
+        Verified md5 checksum of the file.
+
+    Returns
+    -------
+    dict
+        Sync state entry.
+
+    """
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "md5": md5}
+
+
+def is_retryable_error(e: Exception) -> bool:
+    """Check if a failed S3 request can be retried.
+
+    Parameters
+    ----------
+    e : Exception
+        Error raised by the request.
+
+    Returns
+    -------
+    bool
+        True for connection errors, throttling and server errors.
+
+    """
+    if isinstance(e, BotoCoreError):
+        return True
+    if isinstance(e, ClientError):
+        code = e.response.get("Error", {}).get("Code")
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in S3_RETRYABLE_ERRORS or status >= 500
+    return False
+
+
+def resume_s3_download(
+    client: Any,  # noqa: ANN401
+    bucket: str,
+    key: str,
+    part_path: Path,
+    size: int,
+    pbar: tqdm,
+) -> Any:  # noqa: ANN401
+    """Download the rest of an S3 object into a partial file.
+
+    Dropped connections, throttling and server errors are retried with an
+    exponential backoff from the bytes already written.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client, see `get_s3_client`.
+    bucket : str
+        S3 bucket identifier.
+    key : str
+        S3 key of the object.
+    part_path : Path
+        Path to the partial file, created if missing.
+    size : int
+        Size of the object in bytes.
+    pbar : tqdm
+        Progress bar counting synced bytes.
+
+    Returns
+    -------
+    hashlib._Hash
+        md5 hash of the complete file.
+
+    """
+    if part_path.exists() and part_path.stat().st_size > size:
+        part_path.unlink()
+    part_path.touch()
+    hash_md5 = md5_file(part_path)
+    offset = part_path.stat().st_size
+    pbar.update(offset)
+    for attempt in range(S3_MAX_ATTEMPTS):
+        if offset >= size:
+            return hash_md5
+        try:
+            response = client.get_object(
+                Bucket=bucket, Key=key, Range=f"bytes={offset}-"
+            )
+            with part_path.open("ab") as f:
+                for chunk in response["Body"].iter_chunks(SYNC_CHUNK_SIZE):
+                    f.write(chunk)
+                    hash_md5.update(chunk)
+                    offset += len(chunk)
+                    pbar.update(len(chunk))
+        except (BotoCoreError, ClientError) as e:
+            if not is_retryable_error(e) or attempt == S3_MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(min(S3_RETRY_BACKOFF * 2**attempt, S3_RETRY_MAX_BACKOFF))
+    if offset < size:
+        raise Exception(f"Incomplete download of s3://{bucket}/{key}")
+    return hash_md5
+
+
+def sync_s3_object(
+    client: Any,  # noqa: ANN401
+    bucket: str,
+    key: str,
+    write_path: Path,
+    size: int,
+    md5: Optional[str] = None,
+    entry: Optional[dict] = None,
+    pbar: Optional[tqdm] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> dict:
+    """Download an S3 object unless an identical file is present.
+
+    The object is streamed to a partial file next to `write_path` while
+    hashing it, and moved in place once its md5 checksum is verified. A
+    partial file left behind by an interrupted sync is resumed with a
+    ranged GET instead of downloaded again.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client, see `get_s3_client`.
+    bucket : str
+        S3 bucket identifier.
+    key : str
+        S3 key of the object.
+    write_path : Path
+        Path to save the object.
+    size : int
+        Size of the object in bytes.
+    md5 : Optional[str]
+        Expected md5 checksum of the object, not verified if missing.
+    entry : Optional[dict]
+        Sync state entry of `write_path` from a previous sync.
+    pbar : Optional[tqdm]
+        Progress bar counting synced bytes.
+    metrics : Optional[RunMetrics]
+        Records the verify and download stages and the transferred bytes.
+
+    Returns
+    -------
+    dict
+        Sync state entry of the verified file.
+
+    """
+    pbar = pbar or tqdm(disable=True)
+    metrics = metrics or RunMetrics()
+    # Skip present files, hashing them only if they changed since last sync
+    if write_path.exists() and write_path.stat().st_size == size:
+        verified = get_sync_entry(write_path, md5)
+        with metrics.timed("verify", 0 if md5 is None or entry == verified else 1):
+            present = (
+                md5 is None
+                or entry == verified
+                or md5_file(write_path).hexdigest() == md5
+            )
+        if present:
+            pbar.update(size)
+            metrics.inc("files_skipped")
+            return verified
+
+    part_path = write_path.with_name(write_path.name + SYNC_PARTIAL_SUFFIX)
+    resumed = part_path.stat().st_size if part_path.exists() else 0
+    with metrics.timed("download", 1):
+        digest = resume_s3_download(
+            client, bucket, key, part_path, size, pbar
+        ).hexdigest()
+    transferred = size - resumed if resumed <= size else size
+    metrics.inc("bytes_read", transferred)
+    metrics.inc("bytes_written", transferred)
+    metrics.inc("files_downloaded")
+    if md5 is not None and digest != md5:
+        part_path.unlink()
+        raise ValueError(
+            f"Checksum mismatch for s3://{bucket}/{key}: expected {md5}, got {digest}"
+        )
+    part_path.replace(write_path)
+    return get_sync_entry(write_path, md5)
+
+
+def sync_s3_objects(
+    bucket: str,
+    objects: List[dict],
+    out_path: Path,
+    client: Optional[Any] = None,  # noqa: ANN401
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+    force: bool = False,
+    metrics: Optional[RunMetrics] = None,
+    relative_to: Optional[str] = None,
+) -> List[Path]:
+    """Sync S3 objects listed in an AWS inventory manifest.
+
+    Objects are saved flat in `out_path`, or with their keys relative to
+    `relative_to`. Files that are present with the expected size and
+    checksum are skipped, interrupted downloads are resumed and every
+    download is verified against its md5 checksum.
+
+    Parameters
+    ----------
+    bucket : str
+        S3 bucket identifier.
+    objects : List[dict]
+        Manifest entries with `key`, `size` and optionally `MD5checksum`.
+    out_path : Path
+        Path to save the objects.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+    max_concurrency : int
+        Number of objects downloaded concurrently.
+    force : bool
+        Verify the checksums of all present files again.
+    metrics : Optional[RunMetrics]
+        Records the verify and download stages and the transferred bytes.
+    relative_to : Optional[str]
+        Prefix stripped from the keys, the structure below it is kept.
+
+    Returns
+    -------
+    List[Path]
+        Paths of the synced files.
+
+    """
+    if client is None:
+        client = get_s3_client(max_pool_connections=max_concurrency)
+    out_path.mkdir(parents=True, exist_ok=True)
+    state = {} if force is True else read_sync_state(out_path)
+    if relative_to is None:
+        names = [obj["key"].split("/")[-1] for obj in objects]
+    else:
+        names = [obj["key"].removeprefix(relative_to).lstrip("/") for obj in objects]
+    write_paths = [out_path.joinpath(name) for name in names]
+    for write_path in write_paths:
+        write_path.parent.mkdir(parents=True, exist_ok=True)
+    failures = []
+    with tqdm(
+        total=sum(obj["size"] for obj in objects),
+        desc="Syncing files",
+        unit="B",
+        unit_scale=True,
+    ) as pbar, ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {
+            pool.submit(
+                sync_s3_object,
+                client,
+                bucket,
+                obj["key"],
+                write_path,
+                obj["size"],
+                obj.get("MD5checksum"),
+                state.get(name),
+                pbar,
+                metrics,
+            ): name
+            for obj, name, write_path in zip(objects, names, write_paths)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    state[futures[future]] = future.result()
+                except Exception as e:
+                    failures.append(e)
+        finally:
+            # Keep verified files when the sync fails or is interrupted
+            write_sync_state(out_path, state)
+    if len(failures) != 0:
+        raise Exception(
+            f"Failed to sync {len(failures)} of {len(objects)} files"
+        ) from failures[0]
+    return write_paths
+
+
 def download_s3_file(
-    bucket: str, key: str, out_path: Path, no_progress: bool = True
+    bucket: str,
+    key: str,
+    out_path: Path,
+    no_progress: bool = True,
+    client: Optional[Any] = None,  # noqa: ANN401
 ) -> None:
-    """Download file from S3 using aws cli.
+    """Download file from S3.
 
     Parameters
     ----------
@@ -111,18 +676,25 @@ def download_s3_file(
         Path to save the object.
     no_progress: bool
         Flag to control progress bar.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
 
     """
-    cli_args = [
-        "s3",
-        "cp",
-        f"s3://{bucket.rstrip('/')}/{key.lstrip('/')}",
-        str(out_path.absolute()),
-    ]
-    if no_progress is True:
-        cli_args = cli_args + ["--no-progress"]
-    cli_args = cli_args + ["--no-sign-request"]
-    subprocess.run(["aws"] + cli_args)
+    if client is None:
+        client = get_s3_client()
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    config = TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    )
+    with tqdm(desc=key, unit="B", unit_scale=True, disable=no_progress) as pbar:
+        client.download_file(
+            bucket.strip("/"),
+            key.lstrip("/"),
+            str(out_path.absolute()),
+            Config=config,
+            Callback=pbar.update,
+        )
 
 
 def download_s3_files(
@@ -134,6 +706,9 @@ def download_s3_files(
 ) -> None:
     """Download a list of S3 objects.
 
+    Objects are downloaded concurrently by `download_s3_objects`, a
+    single job is usually enough to saturate the network.
+
     Parameters
     ----------
     key_list : List[str]
@@ -148,24 +723,26 @@ def download_s3_files(
         Index of the worker if available.
 
     """
-    w_id = os.getpid()
-    for key in tqdm(key_list, desc=f"Downloading files: Worker {w_id}", position=idx):
-        if flatten is True:
-            write_path = out_path.joinpath(key.split("/")[-1])
-        else:
-            write_path = out_path.joinpath(key)
-        download_s3_file(bucket, key, write_path)
+    download_s3_objects(bucket, key_list, out_path, flatten)
 
 
-def download_s3_prefix(
+def sync_s3_prefix(
     bucket: str,
     prefix: str,
     out_path: Path,
     include: Optional[str] = None,
     exclude: Optional[str] = None,
-    no_progress: bool = False,
-) -> None:
-    """Download files under an S3 prefix using aws cli.
+    client: Optional[Any] = None,  # noqa: ANN401
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+    force: bool = False,
+    metrics: Optional[RunMetrics] = None,
+) -> List[Path]:
+    """Sync files under an S3 prefix like `aws s3 sync`.
+
+    The prefix is listed concurrently, see `gen_s3_listing`, and the listed
+    objects are synced by `sync_s3_objects` with the structure of their
+    keys below the prefix. ETags of single part uploads are verified as md5
+    checksums.
 
     Parameters
     ----------
@@ -174,103 +751,657 @@ def download_s3_prefix(
     prefix : str
         S3 bucket full prefix.
     out_path : Path
-        Path to save the object.
+        Path to save the objects.
     include: Optional[str]
-        regex pattern to include files to download.
+        Glob pattern of keys relative to the prefix to sync again after
+        `exclude`, like the `--include` filter of `aws s3 sync`.
     exclude: Optional[str]
-        regex pattern to exclude files to download.
-    no_progress: bool
-        Flag to control display of transfer progress. Defaults to False.
+        Glob pattern of keys relative to the prefix to skip.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+    max_concurrency : int
+        Number of concurrent list requests and downloads.
+    force : bool
+        Verify the checksums of all present files again.
+    metrics : Optional[RunMetrics]
+        Records the verify and download stages and the transferred bytes.
+
+    Returns
+    -------
+    List[Path]
+        Paths of the synced files.
 
     """
-    cli_args = [
-        "s3",
-        "cp",
-        f"s3://{bucket.rstrip('/')}/{prefix.lstrip('/')}",
-        str(out_path.absolute()),
-        "--recursive",
+    bucket = bucket.strip("/")
+    # The prefix is synced as a directory
+    prefix = prefix.strip("/") + "/" if prefix.strip("/") != "" else ""
+    if client is None:
+        client = get_s3_client(max_pool_connections=max_concurrency)
+    objects = []
+    for batch in gen_s3_listing(
+        bucket, prefix, client, max_concurrency=max_concurrency
+    ):
+        for row in batch.select(
+            ["key", "size", "e_tag", "is_multipart_uploaded"]
+        ).to_pylist():
+            name = row["key"].removeprefix(prefix).lstrip("/")
+            # Later filters take precedence, like the filters of the aws cli
+            synced = exclude is None or not fnmatch(name, exclude)
+            if include is not None and fnmatch(name, include):
+                synced = True
+            if synced is True:
+                objects.append(
+                    {
+                        "key": row["key"],
+                        "size": row["size"],
+                        "MD5checksum": (
+                            None if row["is_multipart_uploaded"] else row["e_tag"]
+                        ),
+                    }
+                )
+    return sync_s3_objects(
+        bucket,
+        objects,
+        out_path,
+        client,
+        max_concurrency,
+        force,
+        metrics,
+        relative_to=prefix,
+    )
+
+
+# Schema of AWS inventory parquet files
+S3_INVENTORY_SCHEMA = pa.schema(
+    [
+        ("bucket", pa.string()),
+        ("key", pa.string()),
+        ("size", pa.int64()),
+        ("last_modified_date", pa.timestamp("ms", tz="UTC")),
+        ("e_tag", pa.string()),
+        ("storage_class", pa.string()),
+        ("is_multipart_uploaded", pa.bool_()),
+        ("replication_status", pa.string()),
+        ("encryption_status", pa.string()),
+        ("object_lock_retain_until_date", pa.timestamp("ms", tz="UTC")),
+        ("object_lock_mode", pa.string()),
+        ("object_lock_legal_hold_status", pa.string()),
+        ("intelligent_tiering_access_tier", pa.string()),
+        ("bucket_key_status", pa.string()),
+        ("checksum_algorithm", pa.string()),
+        ("object_access_control_list", pa.string()),
+        ("object_owner", pa.string()),
     ]
-    if include is not None:
-        cli_args = cli_args + ["--include", include]
-    if exclude is not None:
-        cli_args = cli_args + ["--exclude", exclude]
-    if no_progress is True:
-        cli_args = cli_args + ["--no-progress"]
-    cli_args = cli_args + ["--no-sign-request"]
-    subprocess.run(["aws"] + cli_args)
+)
+# Number of delimiter levels listed before subtrees are listed concurrently,
+# two levels fan out to the cpgXXXX/source_N/ prefixes of the gallery
+S3_LISTING_FAN_OUT_DEPTH = 2
+# Number of inventory rows written per row group
+INVENTORY_ROW_GROUP_SIZE = 100000
+# Maximum number of rows per batch of a local listing
+LOCAL_LISTING_BATCH_SIZE = 10000
+# Required inventory fields that listings do not report, left null in built
+# inventories and listed in the schema metadata under this key, so they are
+# measured as optional fields
+LISTING_UNREPORTED_FIELDS = [
+    "storage_class",
+    "encryption_status",
+    "bucket_key_status",
+    "object_access_control_list",
+    "object_owner",
+]
+UNREPORTED_FIELDS_METADATA_KEY = b"cpgdata.unreported_fields"
+# Directories scanned concurrently by a local listing, scans mostly wait on I/O
+LOCAL_LISTING_WORKERS = 32
 
 
-def sync_s3_prefix(
+def gen_inventory_batch(columns: Dict[str, list], num_rows: int) -> pa.RecordBatch:
+    """Create an inventory record batch from the known columns.
+
+    Parameters
+    ----------
+    columns : Dict[str, list]
+        Values by inventory column, missing columns are null.
+    num_rows : int
+        Number of rows.
+
+    Returns
+    -------
+    pa.RecordBatch
+        Record batch with the AWS inventory schema.
+
+    """
+    data = {
+        field.name: columns.get(field.name, [None] * num_rows)
+        for field in S3_INVENTORY_SCHEMA
+    }
+    return pa.RecordBatch.from_pydict(data, schema=S3_INVENTORY_SCHEMA)
+
+
+def gen_s3_listing_batch(bucket: str, objects: List[dict]) -> pa.RecordBatch:
+    """Convert ListObjectsV2 contents to an inventory record batch.
+
+    Inventory fields that are not part of a listing are null.
+
+    Parameters
+    ----------
+    bucket : str
+        S3 bucket identifier.
+    objects : List[dict]
+        Contents of ListObjectsV2 responses.
+
+    Returns
+    -------
+    pa.RecordBatch
+        Record batch with the AWS inventory schema.
+
+    """
+    e_tags = [obj["ETag"].strip('"') for obj in objects]
+    columns = {
+        "bucket": [bucket] * len(objects),
+        "key": [obj["Key"] for obj in objects],
+        "size": [obj["Size"] for obj in objects],
+        "last_modified_date": [obj["LastModified"] for obj in objects],
+        "e_tag": e_tags,
+        "storage_class": [obj.get("StorageClass") for obj in objects],
+        # Multipart uploads have an ETag suffixed with the number of parts
+        "is_multipart_uploaded": ["-" in e_tag for e_tag in e_tags],
+        "checksum_algorithm": [
+            (obj.get("ChecksumAlgorithm") or [None])[0] for obj in objects
+        ],
+        "object_owner": [obj.get("Owner", {}).get("ID") for obj in objects],
+    }
+    return gen_inventory_batch(columns, len(objects))
+
+
+def list_s3_level(
+    client: Any, bucket: str, prefix: str  # noqa: ANN401
+) -> Tuple[List[str], List[dict]]:
+    """List one level of an S3 prefix.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client, see `get_s3_client`.
+    bucket : str
+        S3 bucket identifier.
+    prefix : str
+        S3 prefix to list.
+
+    Returns
+    -------
+    Tuple[List[str], List[dict]]
+        Sub prefixes and objects directly under the prefix.
+
+    """
+    prefixes, objects = [], []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        prefixes += [common["Prefix"] for common in page.get("CommonPrefixes", [])]
+        objects += page.get("Contents", [])
+    return prefixes, objects
+
+
+def fan_out_s3_prefix(
+    client: Any,  # noqa: ANN401
     bucket: str,
     prefix: str,
-    out_path: Path,
-    include: Optional[str] = None,
-    exclude: Optional[str] = None,
-    no_progress: bool = False,
+    depth: int,
+    pool: ThreadPoolExecutor,
+) -> Tuple[List[str], List[dict]]:
+    """Find the sub prefixes of an S3 prefix a number of levels down.
+
+    Parameters
+    ----------
+    client : botocore.client.S3
+        S3 client, see `get_s3_client`.
+    bucket : str
+        S3 bucket identifier.
+    prefix : str
+        S3 prefix to list.
+    depth : int
+        Number of delimiter levels to list.
+    pool : ThreadPoolExecutor
+        Pool listing the prefixes of a level concurrently.
+
+    Returns
+    -------
+    Tuple[List[str], List[dict]]
+        Sub prefixes at `depth`, and objects found in the levels above.
+
+    """
+    prefixes, objects = [prefix], []
+    for _ in range(depth):
+        levels = list(
+            pool.map(lambda level: list_s3_level(client, bucket, level), prefixes)
+        )
+        prefixes = [
+            sub_prefix for sub_prefixes, _ in levels for sub_prefix in sub_prefixes
+        ]
+        objects += [obj for _, level_objects in levels for obj in level_objects]
+    return prefixes, objects
+
+
+def put_until_stopped(
+    items: queue.Queue, item: Any, stop: threading.Event  # noqa: ANN401
+) -> None:
+    """Put an item in a bounded queue unless the consumer stopped.
+
+    Parameters
+    ----------
+    items : queue.Queue
+        Bounded queue.
+    item : Any
+        Item to put.
+    stop : threading.Event
+        Set once the consumer stopped reading the queue.
+
+    """
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def list_s3_subtree(
+    client: Any,  # noqa: ANN401
+    bucket: str,
+    prefix: str,
+    pages: queue.Queue,
+    stop: threading.Event,
 ) -> None:
-    """Download files under an S3 prefix using aws cli.
+    """List all objects under an S3 prefix into a queue.
 
     Parameters
     ----------
+    client : botocore.client.S3
+        S3 client, see `get_s3_client`.
     bucket : str
         S3 bucket identifier.
     prefix : str
-        S3 bucket full prefix.
-    out_path : Path
-        Path to save the object.
-    include: Optional[str]
-        regex pattern to include files to download.
-    exclude: Optional[str]
-        regex pattern to exclude files to download.
-    no_progress: bool
-        Flag to control display of transfer progress. Defaults to False.
+        S3 prefix to list.
+    pages : queue.Queue
+        Queue receiving a record batch per listing page, an exception if the
+        listing failed and `None` once done.
+    stop : threading.Event
+        Set once the consumer stopped reading the queue.
 
     """
-    cli_args = [
-        "s3",
-        "sync",
-        f"s3://{bucket.rstrip('/')}/{prefix.lstrip('/')}",
-        str(out_path.absolute()),
-    ]
-    if exclude is not None:
-        cli_args = cli_args + ["--exclude", exclude]
-    if include is not None:
-        cli_args = cli_args + ["--include", include]
-    if no_progress is True:
-        cli_args = cli_args + ["--no-progress"]
-    cli_args = cli_args + ["--no-sign-request"]
-    subprocess.run(["aws"] + cli_args)
+    paginator = client.get_paginator("list_objects_v2")
+    try:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            if stop.is_set():
+                break
+            if len(page.get("Contents", [])) != 0:
+                batch = gen_s3_listing_batch(bucket, page["Contents"])
+                put_until_stopped(pages, batch, stop)
+    except Exception as e:
+        put_until_stopped(pages, e, stop)
+    put_until_stopped(pages, None, stop)
+
+
+def gen_s3_listing(
+    bucket: str,
+    prefix: str = "",
+    client: Optional[Any] = None,  # noqa: ANN401
+    fan_out_depth: int = S3_LISTING_FAN_OUT_DEPTH,
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+) -> Generator[pa.RecordBatch, None, None]:
+    """List all objects under an S3 prefix concurrently.
+
+    The first `fan_out_depth` levels are listed with a delimiter to find
+    sub prefixes, then each sub prefix is listed recursively in its own
+    thread. Listing pages are streamed as they arrive through a bounded
+    queue, in no particular order.
+
+    Parameters
+    ----------
+    bucket : str
+        S3 bucket identifier.
+    prefix : str
+        S3 prefix to list.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+    fan_out_depth : int
+        Number of delimiter levels to fan out.
+    max_concurrency : int
+        Number of concurrent list requests.
 
+    Yields
+    ------
+    pa.RecordBatch
+        Listed objects with the AWS inventory schema.
+
+    """
+    if client is None:
+        client = get_s3_client(max_pool_connections=max_concurrency)
+    pages: queue.Queue = queue.Queue(maxsize=2 * max_concurrency)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        prefixes, objects = fan_out_s3_prefix(
+            client, bucket, prefix.lstrip("/"), fan_out_depth, pool
+        )
+        if len(objects) != 0:
+            yield gen_s3_listing_batch(bucket, objects)
+        for sub_prefix in prefixes:
+            pool.submit(list_s3_subtree, client, bucket, sub_prefix, pages, stop)
+        try:
+            remaining = len(prefixes)
+            while remaining != 0:
+                item = pages.get()
+                if isinstance(item, Exception):
+                    raise item
+                if item is None:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
 
-BLANK_RGX = re.compile(r" +")
 
+def write_inventory(
+    batches: Iterable[pa.RecordBatch],
+    out_file: Path,
+    desc: str = "Listing",
+    unreported_fields: Optional[List[str]] = None,
+) -> int:
+    """Write inventory record batches to a parquet file.
 
-def parse_ls_out(line: str) -> str:
-    """Parse s3 prefix path from aws cli ls output.
+    Batches are buffered into large row groups, memory usage is bounded by
+    the row group size.
 
     Parameters
     ----------
-    line : str
-        AWS Cli ls output line.
+    batches : Iterable[pa.RecordBatch]
+        Record batches with the AWS inventory schema.
+    out_file : Path
+        Path of the inventory parquet file.
+    desc : str
+        Progress bar description.
+    unreported_fields : Optional[List[str]]
+        Required inventory fields the batches leave null, recorded in the
+        schema metadata, see `get_unreported_fields`.
+
+    Returns
+    -------
+    int
+        Number of written rows.
+
+    """
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    num_rows = 0
+    buffered_rows = 0
+    buffered: List[pa.RecordBatch] = []
+    schema = S3_INVENTORY_SCHEMA
+    if unreported_fields is not None:
+        schema = schema.with_metadata(
+            {UNREPORTED_FIELDS_METADATA_KEY: json.dumps(unreported_fields)}
+        )
+    with pq.ParquetWriter(out_file, schema) as pq_writer, tqdm(
+        desc=desc, unit=" rows"
+    ) as pbar:
+        for batch in batches:
+            buffered.append(batch)
+            num_rows += batch.num_rows
+            buffered_rows += batch.num_rows
+            pbar.update(batch.num_rows)
+            if buffered_rows >= INVENTORY_ROW_GROUP_SIZE:
+                pq_writer.write_table(pa.Table.from_batches(buffered))
+                buffered = []
+                buffered_rows = 0
+        if len(buffered) != 0:
+            pq_writer.write_table(pa.Table.from_batches(buffered))
+    return num_rows
+
+
+def write_s3_listing(
+    bucket: str,
+    prefix: str,
+    out_file: Path,
+    client: Optional[Any] = None,  # noqa: ANN401
+    fan_out_depth: int = S3_LISTING_FAN_OUT_DEPTH,
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+) -> int:
+    """Write all objects under an S3 prefix as an inventory parquet file.
+
+    Parameters
+    ----------
+    bucket : str
+        S3 bucket identifier.
+    prefix : str
+        S3 prefix to list.
+    out_file : Path
+        Path of the inventory parquet file.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+    fan_out_depth : int
+        Number of delimiter levels to fan out, see `gen_s3_listing`.
+    max_concurrency : int
+        Number of concurrent list requests.
+
+    Returns
+    -------
+    int
+        Number of listed objects.
+
+    """
+    return write_inventory(
+        gen_s3_listing(bucket, prefix, client, fan_out_depth, max_concurrency),
+        out_file,
+        desc=f"Listing s3://{bucket}/{prefix}",
+        unreported_fields=LISTING_UNREPORTED_FIELDS,
+    )
+
+
+def get_unreported_fields(inventory_file: Path) -> List[str]:
+    """Get the required inventory fields that an inventory file leaves null.
+
+    Inventories built from a listing do not have all fields of an AWS
+    inventory, see `write_inventory`.
+
+    Parameters
+    ----------
+    inventory_file : Path
+        Path of the inventory parquet file.
+
+    Returns
+    -------
+    List[str]
+        Unreported inventory fields, empty for AWS inventories.
+
+    """
+    metadata = pq.read_schema(inventory_file).metadata or {}
+    return json.loads(metadata.get(UNREPORTED_FIELDS_METADATA_KEY, b"[]"))
+
+
+def get_local_e_tag(stat: os.stat_result) -> str:
+    """Get an entity tag of a local file without reading it.
+
+    The tag changes with the size or modification time of the file, like the
+    ETag of an S3 object changes with its content.
+
+    Parameters
+    ----------
+    stat : os.stat_result
+        Status of the file.
 
     Returns
     -------
     str
-        Parsed S3 prefix path
+        Entity tag.
+
+    """
+    return hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+def scan_local_dir(
+    path: Path, root: Path, bucket: str, prefix: str = ""
+) -> Tuple[List[Path], List[pa.RecordBatch], int]:
+    """Scan a local directory into inventory rows.
+
+    Inventory fields that a local file does not have are null. Broken
+    symlinks are skipped.
+
+    Parameters
+    ----------
+    path : Path
+        Directory to scan.
+    root : Path
+        Root of the local tree, keys are relative to it.
+    bucket : str
+        Bucket name recorded in the inventory.
+    prefix : str
+        Prefix prepended to the keys.
+
+    Returns
+    -------
+    Tuple[List[Path], List[pa.RecordBatch], int]
+        Sub directories, record batches of the files in the directory and
+        number of skipped broken symlinks.
 
     """
-    line = line.rstrip("\n")
-    line = line.replace("//", "/")
-    elems = BLANK_RGX.split(line, maxsplit=3)
-    return elems[-1]
+    sub_dirs, keys, sizes, mtimes, e_tags = [], [], [], [], []
+    skipped = 0
+    key_prefix = "/".join(
+        part
+        for part in [prefix.strip("/"), path.relative_to(root).as_posix()]
+        if part not in ["", "."]
+    )
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(Path(entry.path))
+                continue
+            # Symlinked dirs are not followed to avoid cycles
+            if entry.is_dir():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                skipped += 1
+                continue
+            keys.append(f"{key_prefix}/{entry.name}" if key_prefix else entry.name)
+            sizes.append(stat.st_size)
+            mtimes.append(stat.st_mtime_ns // 1_000_000)
+            e_tags.append(get_local_e_tag(stat))
+    batches = []
+    for start in range(0, len(keys), LOCAL_LISTING_BATCH_SIZE):
+        stop = start + LOCAL_LISTING_BATCH_SIZE
+        num_rows = len(keys[start:stop])
+        batches.append(
+            gen_inventory_batch(
+                {
+                    "bucket": [bucket] * num_rows,
+                    "key": keys[start:stop],
+                    "size": sizes[start:stop],
+                    "last_modified_date": mtimes[start:stop],
+                    "e_tag": e_tags[start:stop],
+                    "is_multipart_uploaded": [False] * num_rows,
+                },
+                num_rows,
+            )
+        )
+    return sub_dirs, batches, skipped
+
+
+def gen_local_listing(
+    root: Path,
+    bucket: str,
+    prefix: str = "",
+    max_workers: int = LOCAL_LISTING_WORKERS,
+) -> Generator[pa.RecordBatch, None, None]:
+    """List all files of a local tree concurrently.
+
+    Every directory is scanned in its own task, and the sub directories it
+    finds are scanned as soon as a worker is free. Batches are yielded as
+    directories are scanned, in no particular order. The number of skipped
+    broken symlinks is reported once the tree is listed.
+
+    Parameters
+    ----------
+    root : Path
+        Root of the local tree.
+    bucket : str
+        Bucket name recorded in the inventory.
+    prefix : str
+        Prefix prepended to the keys, the S3 prefix the tree is uploaded to.
+    max_workers : int
+        Number of directories scanned concurrently.
+
+    Yields
+    ------
+    pa.RecordBatch
+        Listed files with the AWS inventory schema.
+
+    """
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(scan_local_dir, root, root, bucket, prefix)}
+        while len(pending) != 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                sub_dirs, batches, dir_skipped = future.result()
+                skipped += dir_skipped
+                pending |= {
+                    pool.submit(scan_local_dir, sub_dir, root, bucket, prefix)
+                    for sub_dir in sub_dirs
+                }
+                yield from batches
+    if skipped != 0:
+        print(f"Skipped {skipped} broken symlinks under {root}")
+
+
+def build_inventory(
+    source: str,
+    out_file: Path,
+    bucket: str = "cellpainting-gallery",
+    prefix: str = "",
+    max_concurrency: int = S3_MAX_CONCURRENCY,
+) -> int:
+    """Build an inventory parquet file from a listing.
+
+    Parameters
+    ----------
+    source : str
+        Local directory, or an `s3://bucket/prefix` url to list.
+    out_file : Path
+        Path of the inventory parquet file.
+    bucket : str
+        Bucket name recorded for local files.
+    prefix : str
+        Prefix prepended to the keys of local files.
+    max_concurrency : int
+        Number of concurrent list requests or directory scans.
+
+    Returns
+    -------
+    int
+        Number of listed objects.
+
+    """
+    if source.startswith("s3://"):
+        s3_bucket, _, s3_prefix = source.removeprefix("s3://").partition("/")
+        return write_s3_listing(
+            s3_bucket, s3_prefix, out_file, max_concurrency=max_concurrency
+        )
+    root = Path(source)
+    return write_inventory(
+        gen_local_listing(root, bucket, prefix, max_concurrency),
+        out_file,
+        desc=f"Listing {root}",
+        unreported_fields=LISTING_UNREPORTED_FIELDS,
+    )
 
 
 def ls_s3_prefix(
     bucket: str,
     prefix: str,
     recursive: bool = False,
+    client: Optional[Any] = None,  # noqa: ANN401
 ) -> list:
-    """Download files under an S3 prefix using aws cli.
+    """List an S3 prefix like `aws s3 ls`.
 
     Parameters
     ----------
@@ -278,32 +1409,49 @@ def ls_s3_prefix(
         S3 bucket identifier.
     prefix : str
         S3 bucket full prefix.
-    out_path : Path
-        Path to save the object.
     recursive: bool
         Flag to allow recursive listing of files. Defaults to False.
+    client : Optional[botocore.client.S3]
+        S3 client, see `get_s3_client`.
+
+    Returns
+    -------
+    list
+        Keys of all objects if recursive, otherwise names of the sub prefixes
+        and objects relative to the parent of the prefix.
 
     """
     bucket = bucket.strip("/")
     prefix = prefix.lstrip("/")
-    cli_args = [
-        "s3",
-        "ls",
-        f"s3://{bucket}/{prefix}",
-    ]
-    out_list = []
+    if client is None:
+        client = get_s3_client()
     if recursive is not False:
-        cli_args = cli_args + ["--recursive"]
-    cli_args = cli_args + ["--no-sign-request"]
-    ls_prefix = subprocess.run(["aws"] + cli_args, capture_output=True, text=True)
-    for line in ls_prefix.stdout.splitlines():
-        out_list.append(f"{parse_ls_out(line)}")
-    return out_list
+        return [
+            key
+            for batch in gen_s3_listing(bucket, prefix, client)
+            for key in batch.column("key").to_pylist()
+        ]
+    prefixes, objects = list_s3_level(client, bucket, prefix)
+    parent = prefix[: prefix.rfind("/") + 1]
+    return [sub_prefix[len(parent) :] for sub_prefix in prefixes] + [
+        obj["Key"][len(parent) :] for obj in objects
+    ]
 
 
-def sync_inventory(bucket: str, prefix: str, out_path: Path, revision: int = 0) -> None:
+def sync_inventory(
+    bucket: str,
+    prefix: str,
+    out_path: Path,
+    revision: int = 0,
+    force: bool = False,
+    metrics_dir: Optional[Path] = None,
+    prometheus: bool = False,
+) -> None:
     """Sync inventory files of a specific revision.
 
+    Only inventory files that are missing or differ from the manifest
+    checksums are downloaded, so an interrupted sync can be run again.
+
     Parameters
     ----------
     bucket : str
@@ -314,21 +1462,27 @@ def sync_inventory(bucket: str, prefix: str, out_path: Path, revision: int = 0)
         Path to save synced files.
     revision : int
         Revision to sync. 0 is the latest revision.
+    force : bool
+        Verify the checksums of all present inventory files again.
+    metrics_dir : Optional[Path]
+        Path to dir to write the run report, see `write_run_report`.
+    prometheus : bool
+        Also write the run report in the Prometheus text format.
 
     """
-    dirs = ls_s3_prefix(bucket, prefix)
+    start = time.perf_counter()
+    metrics = RunMetrics()
+    client = get_s3_client()
+    dirs = ls_s3_prefix(bucket, prefix, client=client)
     dirs.sort()
     manifest_revision = dirs[-(abs(revision) + 3)]
     print(manifest_revision)
-    sync_s3_prefix(
-        bucket,
-        prefix,
-        exclude="*",
-        include=f"*{manifest_revision}*",
-        no_progress=False,
-        out_path=out_path,
-    )
+    # Revisions are listed relative to the parent of the prefix
+    manifest_key = f"{prefix[: prefix.rfind('/') + 1]}{manifest_revision}manifest.json"
     manifest_json = out_path.joinpath(f"{manifest_revision}/manifest.json")
+    download_s3_file(
+        bucket, manifest_key, manifest_json, no_progress=False, client=client
+    )
     with manifest_json.open() as f:
         manifest = json.load(f)
         total_size = 0
@@ -336,7 +1490,14 @@ def sync_inventory(bucket: str, prefix: str, out_path: Path, revision: int = 0)
             total_size += file["size"]
         print(f"Total no of file: {len(manifest['files'])}")
         print(f"Total file size: ~{round(total_size / (1024 * 1024 * 1024))}GB")
-        file_keys = [obj["key"] for obj in manifest["files"]]
-        out_path = out_path.joinpath("data")
-        out_path.mkdir(parents=True, exist_ok=True)
-        parallel(file_keys, download_s3_files, [bucket, out_path, True])
+        sync_s3_objects(
+            bucket,
+            manifest["files"],
+            out_path.joinpath("data"),
+            client=client,
+            force=force,
+            metrics=metrics,
+        )
+    # Checksums of the synced revision, used by `measure` to skip unchanged files
+    out_path.joinpath(INVENTORY_MANIFEST).write_text(json.dumps(manifest))
+    write_metrics(metrics_dir, "sync", [metrics.snapshot()], start, prometheus)
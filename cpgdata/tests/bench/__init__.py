@@ -0,0 +1 @@
+"""Benchmarks of the measurement engine on synthetic inventories."""
@@ -0,0 +1,114 @@
+"""Benchmark cases of the measurement hot path.
+
+Every case runs in a fresh process, so the peak RSS of a case is not
+hidden by the one of an earlier case.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import cpgparser
+from cpgdata.metrics import get_peak_rss
+from cpgdata.pipe import (
+    gen_inventory_batches,
+    gen_measurement,
+    measure_batch,
+    parse_batch,
+    plan_measurement_tasks,
+)
+
+
+def bench_parse_prefix(files: List[Path], out_path: Path) -> None:
+    """Parse keys one by one with `cpgparser.parse_prefix`."""
+    for file in files:
+        for batch in gen_inventory_batches(file, ["key"]):
+            for key in batch["key"]:
+                try:
+                    cpgparser.parse_prefix(key)  # type: ignore
+                except ValueError:
+                    pass
+
+
+def bench_parse_prefixes(files: List[Path], out_path: Path) -> None:
+    """Parse batches of keys with a cached `cpgparser.PrefixParser`."""
+    parser = cpgparser.PrefixParser(4096)  # type: ignore
+    for file in files:
+        for batch in gen_inventory_batches(file, ["key"]):
+            parser.parse_prefixes(batch["key"].to_arrow(), 1)
+
+
+def bench_parse_batch(files: List[Path], out_path: Path) -> None:
+    """Measure batches with the pydantic reference engine."""
+    for file in files:
+        for batch in gen_inventory_batches(file):
+            parse_batch(batch)
+
+
+def bench_measure_batch(files: List[Path], out_path: Path) -> None:
+    """Measure batches with the columnar engine."""
+    parser = cpgparser.PrefixParser(4096)  # type: ignore
+    for file in files:
+        for batch in gen_inventory_batches(file):
+            measure_batch(batch, parser=parser)
+
+
+def bench_gen_measurement(files: List[Path], out_path: Path) -> None:
+    """Read, measure and write inventory files like a measure job."""
+    gen_measurement(plan_measurement_tasks(files, 1), out_path)
+
+
+BENCH_CASES: Dict[str, Callable[[List[Path], Path], None]] = {
+    "parse_prefix": bench_parse_prefix,
+    "parse_prefixes": bench_parse_prefixes,
+    "parse_batch": bench_parse_batch,
+    "measure_batch": bench_measure_batch,
+    "gen_measurement": bench_gen_measurement,
+}
+
+
+def run_case(case: str, files: List[Path], out_path: Path) -> dict:
+    """Run a benchmark case.
+
+    Parameters
+    ----------
+    case : str
+        Name of the case, see `BENCH_CASES`.
+    files : List[Path]
+        Inventory files.
+    out_path : Path
+        Path to dir for outputs of the case.
+
+    Returns
+    -------
+    dict
+        Seconds spent in the case and peak RSS of the process.
+    """
+    start = time.perf_counter()
+    BENCH_CASES[case](files, out_path)
+    return {"seconds": time.perf_counter() - start, "peak_rss_bytes": get_peak_rss()}
+
+
+def run_isolated(case: str, files: List[Path], out_path: Path) -> dict:
+    """Run a benchmark case in a fresh process.
+
+    Parameters
+    ----------
+    case : str
+        Name of the case, see `BENCH_CASES`.
+    files : List[Path]
+        Inventory files.
+    out_path : Path
+        Path to dir for outputs of the case.
+
+    Returns
+    -------
+    dict
+        Seconds spent in the case and peak RSS of the process.
+    """
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        return pool.submit(run_case, case, files, out_path).result()
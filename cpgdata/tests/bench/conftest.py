@@ -0,0 +1,89 @@
+"""Benchmark options and fixtures."""
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from .synthetic import SYNTHETIC_SEED, SyntheticInventory, write_synthetic_inventory
+
+BENCH_RESULTS = pytest.StashKey[List[dict]]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the benchmark options."""
+    group = parser.getgroup("cpgdata benchmarks")
+    group.addoption(
+        "--bench-rows",
+        default="",
+        help="Comma separated inventory sizes to benchmark, "
+        "e.g. 1000000,10000000,100000000. Benchmarks are skipped without it.",
+    )
+    group.addoption(
+        "--bench-seed",
+        type=int,
+        default=SYNTHETIC_SEED,
+        help="Seed of the synthetic inventories.",
+    )
+    group.addoption(
+        "--bench-data",
+        default=None,
+        help="Path to dir to keep synthetic inventories, "
+        "defaults to the pytest cache.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Collect benchmark results for the summary."""
+    config.stash[BENCH_RESULTS] = []
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    """Parametrize benchmarks by inventory size."""
+    if "num_rows" not in metafunc.fixturenames:
+        return
+    bench_rows = metafunc.config.getoption("--bench-rows", default="")
+    rows = [int(num_rows) for num_rows in bench_rows.split(",") if num_rows]
+    if len(rows) == 0:
+        rows = [pytest.param(0, marks=pytest.mark.skip(reason="--bench-rows not set"))]
+    metafunc.parametrize("num_rows", rows, scope="session")
+
+
+@pytest.fixture(scope="session")
+def synthetic_inventory(
+    request: pytest.FixtureRequest, num_rows: int
+) -> SyntheticInventory:
+    """Synthetic inventory, generated once and reused across runs."""
+    seed = request.config.getoption("--bench-seed", default=SYNTHETIC_SEED)
+    bench_data = request.config.getoption("--bench-data", default=None)
+    data_path = (
+        Path(bench_data)
+        if bench_data is not None
+        else request.config.cache.mkdir("bench")  # type: ignore
+    )
+    return write_synthetic_inventory(
+        data_path.joinpath(f"rows={num_rows}-seed={seed}"), num_rows, seed
+    )
+
+
+@pytest.fixture
+def bench_results(request: pytest.FixtureRequest) -> List[dict]:
+    """Benchmark results of the session."""
+    return request.config.stash[BENCH_RESULTS]
+
+
+def pytest_terminal_summary(terminalreporter: pytest.TerminalReporter) -> None:
+    """Report throughput and peak memory of the benchmarks."""
+    results = terminalreporter.config.stash.get(BENCH_RESULTS, [])
+    if len(results) == 0:
+        return
+    terminalreporter.section("cpgdata benchmarks")
+    terminalreporter.write_line(
+        f"{'case':<20}{'rows':>12}{'keys/sec':>14}{'MB/sec':>10}{'peak RSS MB':>14}"
+    )
+    for result in results:
+        terminalreporter.write_line(
+            f"{result['case']:<20}{result['rows']:>12}"
+            f"{result['keys_per_sec']:>14.0f}{result['mb_per_sec']:>10.1f}"
+            f"{result['peak_rss_mb']:>14.1f}"
+        )
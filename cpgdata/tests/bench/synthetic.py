@@ -0,0 +1,368 @@
+"""Deterministic synthetic inventory generator.
+
+Keys cover the branches of `key_parser.pest` in proportions close to the
+ones of `cpg0016-jump`, and are clustered by plate like in an AWS inventory,
+so the directory cache of the prefix parser sees realistic hit rates.
+"""
+
+import json
+import random
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Generator, List, NamedTuple, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from cpgdata.utils import gen_inventory_batch, write_inventory
+from pyarrow import parquet as pq
+
+SYNTHETIC_SEED = 0
+# Bumped when the generated rows change, to invalidate cached inventories
+SYNTHETIC_VERSION = 2
+SYNTHETIC_BATCH_SIZE = 100000
+SYNTHETIC_ROWS_PER_FILE = 10000000
+SYNTHETIC_MANIFEST = "synthetic.json"
+SYNTHETIC_BUCKET = "cellpainting-gallery"
+SYNTHETIC_OWNER = "0" * 64
+# Base64 encoded ACL granting full control to the owner
+SYNTHETIC_ACL = (
+    "eyJ2ZXJzaW9uIjoiMjAyMi0xMS0zMCIsInN0YXR1cyI6IkFWQUlMQUJMRSIsImdyYW50cyI6W3sicGVy"
+    "bWlzc2lvbiI6IkZVTExfQ09OVFJPTCIsInR5cGUiOiJDYW5vbmljYWxVc2VyIn1dfQ=="
+)
+DATASET_ID = "cpg0016-jump"
+NUM_SOURCES = 15
+NUM_BATCHES = 12
+NUM_PLATES = 40
+CHANNELS = ["DNA", "ER", "RNA", "AGP", "Mito"]
+COMPARTMENTS = ["Cells", "Cytoplasm", "Nuclei", "Image", "Experiment"]
+LAST_MODIFIED_START = int(datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+LAST_MODIFIED_RANGE = 365 * 24 * 3600 * 1000
+
+
+class Plate(NamedTuple):
+    """Plate directory shared by a run of keys."""
+
+    source_id: str
+    batch_id: str
+    plate_id: str
+
+    @property
+    def prefix(self: "Plate") -> str:
+        """Dataset and source prefix of the plate."""
+        return f"{DATASET_ID}/{self.source_id}"
+
+
+class SyntheticInventory(NamedTuple):
+    """Synthetic inventory files and their size."""
+
+    files: List[Path]
+    num_rows: int
+    key_bytes: int
+
+
+def pick_plate(rng: random.Random) -> Plate:
+    """Pick a random plate.
+
+    Parameters
+    ----------
+    rng : random.Random
+        Random generator.
+
+    Returns
+    -------
+    Plate
+        Plate directory.
+    """
+    batch = rng.randint(1, NUM_BATCHES)
+    return Plate(
+        f"source_{rng.randint(1, NUM_SOURCES)}",
+        f"2021_{batch:02d}_01_Batch{batch}",
+        f"BR00{rng.randint(117000, 117000 + NUM_PLATES)}",
+    )
+
+
+def gen_images_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the images of a well."""
+    well = f"r{rng.randint(1, 16):02d}c{rng.randint(1, 24):02d}"
+    root = (
+        f"{plate.prefix}/images/{plate.batch_id}/images/"
+        f"{plate.plate_id}__2021-05-31T15_35_31-Measurement1/Images"
+    )
+    return [
+        f"{root}/{well}f{site:02d}p01-ch{channel}sk1fk1fl1.tiff"
+        for site in range(1, 10)
+        for channel in range(1, 9)
+    ]
+
+
+def gen_illum_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the illumination functions of a plate."""
+    return [
+        f"{plate.prefix}/images/{plate.batch_id}/illum/{plate.plate_id}/"
+        f"{plate.plate_id}_Illum{channel}.npy"
+        for channel in CHANNELS
+    ]
+
+
+def gen_analysis_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the CellProfiler analysis output of a site."""
+    well = f"{chr(rng.randint(65, 80))}{rng.randint(1, 24):02d}"
+    site = f"{plate.plate_id}-{well}-{rng.randint(1, 9)}"
+    root = (
+        f"{plate.prefix}/workspace/analysis/{plate.batch_id}/{plate.plate_id}"
+        f"/analysis/{site}"
+    )
+    return [f"{root}/{compartment}.csv" for compartment in COMPARTMENTS] + [
+        f"{root}/outlines/{site}--nuclei_outlines.png"
+    ]
+
+
+def gen_backend_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the backend files of a plate."""
+    root = f"{plate.prefix}/workspace/backend/{plate.batch_id}/{plate.plate_id}"
+    return [f"{root}/{plate.plate_id}.sqlite", f"{root}/{plate.plate_id}.csv"]
+
+
+def gen_load_data_csv_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the load data csv files of a plate."""
+    root = f"{plate.prefix}/workspace/load_data_csv/{plate.batch_id}/{plate.plate_id}"
+    return [f"{root}/load_data.csv", f"{root}/load_data_with_illum.csv"]
+
+
+def gen_profiles_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the profiles of a plate."""
+    root = f"{plate.prefix}/workspace/profiles/{plate.batch_id}/{plate.plate_id}"
+    return [f"{root}/{plate.plate_id}.parquet"]
+
+
+def gen_workspace_dl_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate the deep learning embeddings of a well."""
+    well = f"{chr(rng.randint(65, 80))}{rng.randint(1, 24):02d}"
+    root = (
+        f"{plate.prefix}/workspace_dl/embeddings/efficientnet_v2_0260bc96"
+        f"/{plate.batch_id}/{plate.plate_id}"
+    )
+    return [f"{root}/{well}-{site}/embedding.parquet" for site in range(1, 10)]
+
+
+def gen_invalid_keys(rng: random.Random, plate: Plate) -> List[str]:
+    """Generate a key that the grammar rejects or only matches partially."""
+    batch_id, plate_id = plate.batch_id, plate.plate_id
+    return [
+        rng.choice(
+            [
+                ".DS_Store",
+                DATASET_ID,
+                f"@eaDir/{plate.prefix}/{plate_id}.csv",
+                f"{plate.prefix}/images/{batch_id}/",
+                f"{plate.prefix}/workspace/unknown_dir/{plate_id}/{plate_id}.csv",
+                f"{plate.prefix}/images/{batch_id}/images/{plate_id}/README",
+                f"{plate.prefix}/workspace/profiles/{batch_id}/{plate_id}/@.parquet",
+            ]
+        )
+    ]
+
+
+# Branch key generators with their share of the keys
+KEY_BRANCHES: Dict[str, Tuple[Callable[[random.Random, Plate], List[str]], float]] = {
+    "images": (gen_images_keys, 0.62),
+    "illum": (gen_illum_keys, 0.01),
+    "analysis": (gen_analysis_keys, 0.2),
+    "backend": (gen_backend_keys, 0.01),
+    "load_data_csv": (gen_load_data_csv_keys, 0.01),
+    "profiles": (gen_profiles_keys, 0.01),
+    "workspace_dl": (gen_workspace_dl_keys, 0.13),
+    "invalid": (gen_invalid_keys, 0.01),
+}
+
+
+def gen_synthetic_keys(
+    num_rows: int, seed: int = SYNTHETIC_SEED, batch_idx: int = 0
+) -> List[str]:
+    """Generate a deterministic batch of keys.
+
+    Parameters
+    ----------
+    num_rows : int
+        Number of keys.
+    seed : int
+        Seed of the inventory.
+    batch_idx : int
+        Index of the batch, batches of the same seed are independent.
+
+    Returns
+    -------
+    List[str]
+        Keys clustered by plate.
+    """
+    rng = random.Random(f"{seed}-{batch_idx}")
+    gen_fns = [gen_fn for gen_fn, _ in KEY_BRANCHES.values()]
+    # Generators emit runs of keys, weight them by the keys per run
+    weights = [
+        share / len(gen_fn(random.Random(0), pick_plate(random.Random(0))))
+        for gen_fn, share in KEY_BRANCHES.values()
+    ]
+    keys: List[str] = []
+    while len(keys) < num_rows:
+        gen_fn = rng.choices(gen_fns, weights)[0]
+        keys.extend(gen_fn(rng, pick_plate(rng)))
+    return keys[:num_rows]
+
+
+def gen_synthetic_batch(
+    num_rows: int, seed: int = SYNTHETIC_SEED, batch_idx: int = 0
+) -> pa.RecordBatch:
+    """Generate a deterministic inventory batch.
+
+    Parameters
+    ----------
+    num_rows : int
+        Number of rows.
+    seed : int
+        Seed of the inventory.
+    batch_idx : int
+        Index of the batch.
+
+    Returns
+    -------
+    pa.RecordBatch
+        Record batch with the AWS inventory schema.
+    """
+    rng = random.Random(f"{seed}-{batch_idx}-objects")
+    sizes = [rng.randint(1000, 20000000) for _ in range(num_rows)]
+    return gen_inventory_batch(
+        {
+            "bucket": [SYNTHETIC_BUCKET] * num_rows,
+            "key": gen_synthetic_keys(num_rows, seed, batch_idx),
+            "size": sizes,
+            "last_modified_date": [
+                LAST_MODIFIED_START + rng.randrange(LAST_MODIFIED_RANGE)
+                for _ in range(num_rows)
+            ],
+            "e_tag": [f"{rng.getrandbits(128):032x}" for _ in range(num_rows)],
+            "storage_class": [
+                "STANDARD" if rng.random() < 0.9 else "INTELLIGENT_TIERING"
+                for _ in range(num_rows)
+            ],
+            "is_multipart_uploaded": [size > 8 * 1024 * 1024 for size in sizes],
+            "encryption_status": ["SSE-S3"] * num_rows,
+            "bucket_key_status": ["DISABLED"] * num_rows,
+            "object_access_control_list": [SYNTHETIC_ACL] * num_rows,
+            "object_owner": [SYNTHETIC_OWNER] * num_rows,
+        },
+        num_rows,
+    )
+
+
+def gen_synthetic_batches(
+    num_rows: int, seed: int = SYNTHETIC_SEED, start_batch: int = 0
+) -> Generator[pa.RecordBatch, None, None]:
+    """Generate deterministic inventory batches.
+
+    Parameters
+    ----------
+    num_rows : int
+        Number of rows over all batches.
+    seed : int
+        Seed of the inventory.
+    start_batch : int
+        Index of the first batch.
+
+    Yields
+    ------
+    pa.RecordBatch
+        Record batches with the AWS inventory schema.
+    """
+    for batch_idx, start in enumerate(range(0, num_rows, SYNTHETIC_BATCH_SIZE)):
+        yield gen_synthetic_batch(
+            min(SYNTHETIC_BATCH_SIZE, num_rows - start), seed, start_batch + batch_idx
+        )
+
+
+def read_synthetic_inventory(out_path: Path) -> SyntheticInventory:
+    """Read a synthetic inventory written by `write_synthetic_inventory`.
+
+    Parameters
+    ----------
+    out_path : Path
+        Path to the inventory dir.
+
+    Returns
+    -------
+    SyntheticInventory
+        Inventory files and their size.
+    """
+    manifest = json.loads(out_path.joinpath(SYNTHETIC_MANIFEST).read_text())
+    return SyntheticInventory(
+        [out_path.joinpath(name) for name in manifest["files"]],
+        manifest["num_rows"],
+        manifest["key_bytes"],
+    )
+
+
+def write_synthetic_inventory(
+    out_path: Path,
+    num_rows: int,
+    seed: int = SYNTHETIC_SEED,
+    rows_per_file: int = SYNTHETIC_ROWS_PER_FILE,
+) -> SyntheticInventory:
+    """Write a synthetic inventory, reusing it if it was written before.
+
+    Parameters
+    ----------
+    out_path : Path
+        Path to the inventory dir.
+    num_rows : int
+        Number of rows.
+    seed : int
+        Seed of the inventory, the same seed writes the same inventory.
+    rows_per_file : int
+        Maximum number of rows per inventory file.
+
+    Returns
+    -------
+    SyntheticInventory
+        Inventory files and their size.
+    """
+    manifest_json = out_path.joinpath(SYNTHETIC_MANIFEST)
+    if manifest_json.exists():
+        manifest = json.loads(manifest_json.read_text())
+        if manifest.get("version") == SYNTHETIC_VERSION and (
+            manifest["num_rows"] == num_rows
+            and manifest["seed"] == seed
+            and manifest.get("rows_per_file") == rows_per_file
+        ):
+            return read_synthetic_inventory(out_path)
+    batches_per_file = max(rows_per_file // SYNTHETIC_BATCH_SIZE, 1)
+    files = []
+    for file_idx, start in enumerate(
+        range(0, num_rows, batches_per_file * SYNTHETIC_BATCH_SIZE)
+    ):
+        file = out_path.joinpath(f"synthetic-{file_idx:05d}.parquet")
+        write_inventory(
+            gen_synthetic_batches(
+                min(batches_per_file * SYNTHETIC_BATCH_SIZE, num_rows - start),
+                seed,
+                file_idx * batches_per_file,
+            ),
+            file,
+            desc=f"Generating {file.name}",
+        )
+        files.append(file)
+    key_bytes = 0
+    for file in files:
+        for batch in pq.ParquetFile(file).iter_batches(columns=["key"]):
+            key_bytes += pc.sum(pc.binary_length(batch.column("key"))).as_py()
+    manifest_json.write_text(
+        json.dumps(
+            {
+                "version": SYNTHETIC_VERSION,
+                "seed": seed,
+                "num_rows": num_rows,
+                "rows_per_file": rows_per_file,
+                "key_bytes": key_bytes,
+                "files": [file.name for file in files],
+            }
+        )
+    )
+    return read_synthetic_inventory(out_path)
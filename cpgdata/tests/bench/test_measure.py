@@ -0,0 +1,39 @@
+"""Benchmarks of the measurement hot path."""
+
+from pathlib import Path
+from typing import List
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from .cases import BENCH_CASES, run_isolated
+from .synthetic import SyntheticInventory
+
+
+@pytest.mark.parametrize("case", list(BENCH_CASES))
+def test_bench(
+    benchmark: BenchmarkFixture,
+    case: str,
+    num_rows: int,
+    synthetic_inventory: SyntheticInventory,
+    bench_results: List[dict],
+    tmp_path: Path,
+) -> None:
+    """Benchmark a case on a synthetic inventory."""
+    benchmark.group = f"{num_rows} rows"
+    result = benchmark.pedantic(
+        run_isolated,
+        args=(case, synthetic_inventory.files, tmp_path),
+        rounds=1,
+        iterations=1,
+    )
+    # Timed in the benchmark process, without the process start up
+    stats = {
+        "case": case,
+        "rows": synthetic_inventory.num_rows,
+        "keys_per_sec": synthetic_inventory.num_rows / result["seconds"],
+        "mb_per_sec": synthetic_inventory.key_bytes / result["seconds"] / 1e6,
+        "peak_rss_mb": result["peak_rss_bytes"] / 1e6,
+    }
+    benchmark.extra_info.update(stats)
+    bench_results.append(stats)
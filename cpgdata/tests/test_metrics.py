@@ -0,0 +1,127 @@
+"""Tests of the run metrics."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import pyarrow.parquet as pq
+from cpgdata.metrics import (
+    RunMetrics,
+    format_prometheus,
+    gen_metric_samples,
+    merge_snapshots,
+    write_run_report,
+)
+
+
+def gen_snapshots() -> List[dict]:
+    """Generate snapshots of two workers, one of them reporting twice."""
+    return [
+        {
+            "pid": 1,
+            "peak_rss_bytes": 100,
+            "stages": {"parse": {"rows": 10, "seconds": 2.0, "workers": 2}},
+            "counters": {"bytes_read": 5},
+        },
+        {
+            "pid": 1,
+            "peak_rss_bytes": 300,
+            "stages": {"parse": {"rows": 30, "seconds": 2.0, "workers": 2}},
+            "counters": {"bytes_read": 7, "parse_errors": 1},
+        },
+        {
+            "pid": 2,
+            "peak_rss_bytes": 200,
+            "stages": {"write": {"rows": 40, "seconds": 0.0, "workers": 1}},
+            "counters": {"bytes_read": 3},
+        },
+    ]
+
+
+def test_merge_snapshots() -> None:
+    """Snapshots are summed, and merged into one worker per process."""
+    summary = merge_snapshots(gen_snapshots())
+    assert summary["stages"] == {
+        "parse": {"rows": 40, "seconds": 4.0, "workers": 2, "rows_per_sec": 20.0},
+        "write": {"rows": 40, "seconds": 0.0, "workers": 1, "rows_per_sec": 0.0},
+    }
+    assert summary["counters"] == {"bytes_read": 15, "parse_errors": 1}
+    assert [
+        (worker["pid"], worker["peak_rss_bytes"]) for worker in summary["workers"]
+    ] == [(1, 300), (2, 200)]
+    assert summary["workers"][0]["stages"]["parse"]["rows"] == 40
+
+
+def test_merge_run_metrics() -> None:
+    """Snapshots of recorded metrics merge like reported ones."""
+    metrics = RunMetrics()
+    with metrics.timed("parse", 10):
+        metrics.inc("bytes_read", 5)
+    metrics.inc("bytes_read", 5)
+    summary = merge_snapshots([metrics.snapshot(), metrics.snapshot()])
+    assert summary["stages"]["parse"]["rows"] == 20
+    assert summary["counters"] == {"bytes_read": 20}
+    assert len(summary["workers"]) == 1
+
+
+def test_snapshot_while_stages_are_created() -> None:
+    """Snapshots are taken while threads create stages."""
+    metrics = RunMetrics()
+
+    def record(i: int) -> None:
+        with metrics.timed(f"stage_{i % 50}", 1):
+            metrics.snapshot()
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(record, range(1000)))
+    snapshot = metrics.snapshot()
+    assert len(snapshot["stages"]) == 50
+    assert sum(stage["rows"] for stage in snapshot["stages"].values()) == 1000
+
+
+def test_format_prometheus() -> None:
+    """Samples are typed once per metric and their labels are sorted."""
+    report = {
+        "command": "measure",
+        "wall_seconds": 1.5,
+        **merge_snapshots(gen_snapshots()[2:]),
+    }
+    assert format_prometheus(gen_metric_samples(report)) == (
+        "# TYPE cpgdata_run_wall_seconds gauge\n"
+        'cpgdata_run_wall_seconds{command="measure"} 1.5\n'
+        "# TYPE cpgdata_stage_rows gauge\n"
+        'cpgdata_stage_rows{command="measure",stage="write"} 40\n'
+        "# TYPE cpgdata_stage_seconds gauge\n"
+        'cpgdata_stage_seconds{command="measure",stage="write"} 0.0\n'
+        "# TYPE cpgdata_stage_rows_per_sec gauge\n"
+        'cpgdata_stage_rows_per_sec{command="measure",stage="write"} 0.0\n'
+        "# TYPE cpgdata_bytes_read gauge\n"
+        'cpgdata_bytes_read{command="measure"} 3\n'
+        "# TYPE cpgdata_worker_peak_rss_bytes gauge\n"
+        'cpgdata_worker_peak_rss_bytes{command="measure",pid="2"} 200\n'
+    )
+
+
+def test_write_run_report(tmp_path: Path) -> None:
+    """Reports are written as JSON, parquet and Prometheus text."""
+    report_json = write_run_report(
+        tmp_path, "check", gen_snapshots(), 3.0, prometheus=True
+    )
+    assert report_json == tmp_path.joinpath("check.json")
+    report = json.loads(report_json.read_text())
+    assert report["command"] == "check"
+    assert report["wall_seconds"] == 3.0
+    assert report["counters"] == {"bytes_read": 15, "parse_errors": 1}
+
+    samples = pq.read_table(tmp_path.joinpath("check.parquet")).to_pylist()
+    assert len(samples) == len(gen_metric_samples(report))
+    assert {
+        "metric": "stage_rows",
+        "command": "check",
+        "stage": "parse",
+        "pid": None,
+        "value": 40.0,
+    } in samples
+    prom = tmp_path.joinpath("check.prom").read_text()
+    assert 'cpgdata_parse_errors{command="check"} 1\n' in prom
@@ -0,0 +1,282 @@
+"""Tests of the columnar measurement engine against the pydantic reference."""
+
+from pathlib import Path
+from typing import List, Optional
+
+import cpgparser
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from cpgdata.parser import ErrorCode, MeasuredPrefix
+from cpgdata.pipe import (
+    ERRORS_SCHEMA,
+    check,
+    diff,
+    gen_pq_schema,
+    get_measurement_files,
+    measure,
+    measure_batch,
+    parse_batch,
+    plan_measurement_tasks,
+    scan_measurements,
+)
+from cpgdata.utils import build_inventory
+
+from .bench.synthetic import gen_synthetic_batch, write_synthetic_inventory
+
+# The columnar engine needs the batch API of cpgparser 0.5
+pytestmark = pytest.mark.skipif(
+    not hasattr(cpgparser, "parse_prefixes"),
+    reason="cpgparser predates the parse_prefixes batch API",
+)
+
+EDGE_CASE_KEYS = [
+    None,
+    "",
+    "/",
+    "cpg0016-jump",
+    "cpg0016-jump/",
+    "cpg0016-jump/source_4/",
+    "cpg0016-jump/source_4/images/2021_04_26_Batch1/",
+    "cpg0016-jump/source_4/workspace/unknown_dir/BR00121424/BR00121424.csv",
+    "cpg0016-jump/source_4/workspace/embeddings/Batch1/BR00121424/emb.parquet",
+    "unknown/prefix/file.csv",
+    ".DS_Store",
+]
+
+
+def gen_batch(keys: List[Optional[str]], seed: int = 0) -> pl.DataFrame:
+    """Generate an inventory batch with the given keys."""
+    batch = pl.from_arrow(gen_synthetic_batch(len(keys), seed))
+    return batch.with_columns(key=pl.Series("key", keys, dtype=pl.Utf8))  # type: ignore
+
+
+def to_frame(table: pa.Table) -> pl.DataFrame:
+    """Convert a table to a frame comparable across dictionaries."""
+    return pl.from_arrow(table).with_columns(  # type: ignore
+        pl.col(pl.Categorical).cast(pl.Utf8)
+    )
+
+
+def measure_both(batch: pl.DataFrame) -> List[pl.DataFrame]:
+    """Measure a batch with both engines.
+
+    Returns the columnar and reference measurements, then their errors.
+    """
+    pq_schema = gen_pq_schema(MeasuredPrefix)
+    columnar_errors: List[pa.Table] = [ERRORS_SCHEMA.empty_table()]
+    reference_errors: List[pa.Table] = [ERRORS_SCHEMA.empty_table()]
+    columnar = measure_batch(batch, errors=columnar_errors)
+    reference = pa.Table.from_pydict(
+        parse_batch(batch, errors=reference_errors), schema=pq_schema
+    )
+    # The columnar engine groups errors by kind, the reference by row
+    error_order = ["obj_key", "error_code", "error_message"]
+    return [
+        to_frame(columnar),
+        to_frame(reference),
+        to_frame(pa.concat_tables(columnar_errors)).sort(error_order),
+        to_frame(pa.concat_tables(reference_errors)).sort(error_order),
+    ]
+
+
+def test_null_key() -> None:
+    """A missing key becomes a parse error in both engines."""
+    columnar, reference, columnar_errors, reference_errors = measure_both(
+        gen_batch([None])
+    )
+    assert columnar.get_column("is_parsing_error").to_list() == [True]
+    assert columnar.get_column("error_code").to_list() == [ErrorCode.PARSE.value]
+    assert columnar_errors.get_column("error_message").to_list() == ["key is null"]
+    assert columnar.equals(reference)
+    assert columnar_errors.equals(reference_errors)
+
+
+@pytest.mark.parametrize("keys", [EDGE_CASE_KEYS, []])
+def test_edge_case_keys(keys: List[Optional[str]]) -> None:
+    """Both engines measure edge case keys the same."""
+    columnar, reference, columnar_errors, reference_errors = measure_both(
+        gen_batch(keys)
+    )
+    assert len(columnar) == len(keys)
+    assert columnar.equals(reference)
+    assert columnar_errors.equals(reference_errors)
+
+
+def test_synthetic_keys() -> None:
+    """Both engines measure a synthetic inventory with invalid rows the same."""
+    synthetic = pl.from_arrow(gen_synthetic_batch(3000, seed=1))
+    batch = pl.concat([synthetic, gen_batch(EDGE_CASE_KEYS)])  # type: ignore
+    # Rows failing validation are handed over to the reference implementation
+    batch = batch.with_columns(
+        size=pl.when(pl.int_range(0, len(batch)) % 97 == 0)
+        .then(None)
+        .otherwise(pl.col("size"))
+    )
+    columnar, reference, columnar_errors, reference_errors = measure_both(batch)
+    assert len(columnar) == len(batch)
+    assert set(columnar_errors.get_column("error_code")) == {
+        ErrorCode.PARSE.value,
+        ErrorCode.VALIDATION.value,
+    }
+    assert columnar.equals(reference)
+    assert columnar_errors.equals(reference_errors)
+
+
+def test_workspace_dir() -> None:
+    """The workspace dir is measured from the parsed workspace root dir."""
+    columnar, reference, _, _ = measure_both(
+        gen_batch(
+            [
+                "cpg0016-jump/source_4/workspace/profiles/Batch1/BR00121424/a.parquet",
+                "cpg0016-jump/source_4/workspace/embeddings/Batch1/BR00121424/a.csv",
+                "cpg0016-jump/source_4/images/Batch1/illum/BR00121424/a.npy",
+            ]
+        )
+    )
+    assert columnar.get_column("workspace_dir").to_list() == [
+        "profiles",
+        "embeddings",
+        "None",
+    ]
+    assert columnar.equals(reference)
+
+
+def test_workspace_dl_embeddings() -> None:
+    """Synthetic deep learning embeddings are measured like the reference."""
+    batch = pl.from_arrow(gen_synthetic_batch(3000, seed=1))
+    embeddings = batch.filter(  # type: ignore
+        pl.col("key").str.contains("/workspace_dl/embeddings/")
+    )
+    columnar, reference, _, _ = measure_both(embeddings)
+    assert len(columnar) != 0
+    assert columnar.get_column("is_parsing_error").not_().all()
+    assert columnar.equals(reference)
+
+
+def test_measure_and_check(tmp_path: Path) -> None:
+    """Measure and check a small synthetic inventory end to end."""
+    inventory = write_synthetic_inventory(tmp_path.joinpath("inventory"), 2000)
+    out_path = tmp_path.joinpath("out")
+    measure(inventory.files[0].parent, out_path, jobs=1)
+    measurements = pl.read_parquet(out_path.joinpath("measurements", "*.parquet"))
+    assert len(measurements) == inventory.num_rows
+    assert measurements.get_column("is_parsing_error").not_().any()
+
+    check(inventory.files[0].parent, out_path, jobs=1)
+    check_files = {file.name for file in out_path.joinpath("checks").glob("*.parquet")}
+    assert "check_workspace_dirs.parquet" in check_files
+
+
+def test_measure_built_inventory(tmp_path: Path) -> None:
+    """Fields that a listing does not report are measured as nulls."""
+    root = tmp_path.joinpath("cpg0016-jump")
+    plate_dir = root.joinpath("source_4", "workspace", "profiles", "Batch1", "P1")
+    plate_dir.mkdir(parents=True)
+    plate_dir.joinpath("P1.parquet").write_bytes(b"0" * 100)
+    inventory_path = tmp_path.joinpath("inventory")
+    build_inventory(
+        str(root), inventory_path.joinpath("inventory.parquet"), prefix=root.name
+    )
+    out_path = tmp_path.joinpath("out")
+    measure(inventory_path, out_path, jobs=1)
+    measurements = pl.read_parquet(out_path.joinpath("measurements", "*.parquet"))
+    assert measurements.get_column("is_parsing_error").not_().all()
+    assert measurements.get_column("error_code").is_null().all()
+    assert measurements.get_column("object_owner").is_null().all()
+
+
+def test_diff(tmp_path: Path) -> None:
+    """Row level rules are checked on the delta of two revisions."""
+    old_path = tmp_path.joinpath("old")
+    old_path.mkdir()
+    inventory = write_synthetic_inventory(tmp_path.joinpath("new"), 2000)
+    out_path = tmp_path.joinpath("delta")
+    diff(old_path, inventory.files[0].parent, out_path, jobs=1)
+    changes = pl.read_parquet(out_path.joinpath("changes.parquet"))
+    assert len(changes) == inventory.num_rows
+    assert changes.get_column("change").eq("added").all()
+    measurements = pl.read_parquet(out_path.joinpath("measurements", "*.parquet"))
+    errors = measurements.get_column("is_parsing_error").sum()
+    # Synthetic inventories contain keys outside the layout
+    assert errors != 0
+    violations = out_path.joinpath("checks", "check_parsing_errors.parquet")
+    assert len(pl.read_parquet(violations)) == errors
+
+
+def test_measure_incremental(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Only changed inventory files or changed options are measured again."""
+    inventory = write_synthetic_inventory(tmp_path.joinpath("synthetic"), 1000)
+    in_path = tmp_path.joinpath("inventory")
+    in_path.mkdir()
+    table = pq.read_table(inventory.files[0])
+    for name in ["a.parquet", "b.parquet"]:
+        pq.write_table(table, in_path.joinpath(name))
+    out_path = tmp_path.joinpath("out")
+
+    measure(in_path, out_path, jobs=1)
+    assert "Measuring 2 inventory files, 0 up to date" in capsys.readouterr().out
+    measure(in_path, out_path, jobs=1)
+    assert "Measuring 0 inventory files, 2 up to date" in capsys.readouterr().out
+
+    pq.write_table(table.slice(0, 500), in_path.joinpath("b.parquet"))
+    measure(in_path, out_path, jobs=1)
+    assert "Measuring 1 inventory files, 1 up to date" in capsys.readouterr().out
+    measurements = pl.read_parquet(out_path.joinpath("measurements", "*.parquet"))
+    assert len(measurements) == 1500
+
+    measure(in_path, out_path, jobs=1, partition=True)
+    assert "Measuring 2 inventory files, 0 up to date" in capsys.readouterr().out
+
+
+def count_rows(files: List[Path]) -> int:
+    """Count the rows of parquet files."""
+    return sum(pq.read_metadata(file).num_rows for file in files)
+
+
+def test_measure_partitioned(tmp_path: Path) -> None:
+    """Partition filters only select the matching hive partitions."""
+    inventory = write_synthetic_inventory(tmp_path.joinpath("inventory"), 2000)
+    out_path = tmp_path.joinpath("out")
+    measure(inventory.files[0].parent, out_path, jobs=1, partition=True)
+    measurements_dir = out_path.joinpath("measurements")
+    all_files = get_measurement_files(measurements_dir)
+    assert count_rows(all_files) == inventory.num_rows
+
+    partition_filter = pl.col("source_id").eq("source_4")
+    files = get_measurement_files(measurements_dir, partition_filter)
+    assert 0 < len(files) < len(all_files)
+    for file in files:
+        relative = file.relative_to(measurements_dir).parts
+        assert relative[:2] == ("dataset_id=cpg0016-jump", "source_id=source_4")
+    measurements = scan_measurements(measurements_dir).filter(partition_filter)
+    assert count_rows(files) == len(measurements.collect())
+
+
+def test_split_row_groups_and_compact(tmp_path: Path) -> None:
+    """Row group tasks of an inventory file are compacted into one file."""
+    inventory = write_synthetic_inventory(tmp_path.joinpath("synthetic"), 1000)
+    in_path = tmp_path.joinpath("inventory")
+    in_path.mkdir()
+    inventory_file = in_path.joinpath("inventory.parquet")
+    pq.write_table(
+        pq.read_table(inventory.files[0]), inventory_file, row_group_size=100
+    )
+
+    tasks = plan_measurement_tasks([inventory_file], 4, split_row_groups=True)
+    assert len(tasks) == 4
+    assert sum(task.num_rows for task in tasks) == 1000
+    assert sorted(
+        row_group for task in tasks for row_group in task.row_groups or []
+    ) == list(range(10))
+
+    out_path = tmp_path.joinpath("out")
+    measure(in_path, out_path, jobs=1, split_row_groups=True, compact=True)
+    measurement_files = list(out_path.joinpath("measurements").glob("*.parquet"))
+    assert measurement_files == [out_path.joinpath("measurements", "inventory.parquet")]
+    measurement_meta = pq.read_metadata(measurement_files[0])
+    assert measurement_meta.num_rows == 1000
+    assert measurement_meta.num_row_groups == len(tasks)
@@ -0,0 +1,181 @@
+"""Tests of the rules."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import ClassVar, List, Union
+
+import cpgdata.rule
+import polars as pl
+import pytest
+from cpgdata.rule import (
+    REQUIRED_WORKSPACE_DIRS,
+    BaseRule,
+    CheckWorkspaceDirs,
+    MergeableAgg,
+    PartialStore,
+    SpecRule,
+    agg_count,
+    agg_max,
+    agg_min,
+    agg_set,
+    agg_sum,
+)
+
+# Rule defined at runtime, so that its identity is built from its attributes
+RUNTIME_RULE_SCRIPT = """
+from pathlib import Path
+
+import cpgdata.rule
+import polars as pl
+from cpgdata.rule import SpecRule
+
+
+class CheckImageSizes(SpecRule):
+    where = [pl.col("extension").is_in(["tiff", "png"])]
+    extensions = frozenset({"tiff", "png", "npy"})
+    is_large = lambda size: size > (lambda: 2**20)() and size in {1, 2, 3}
+
+
+print(CheckImageSizes(Path("checks")).get_identity())
+"""
+
+
+class CheckEmptyFiles(SpecRule):
+    """Check no file is empty."""
+
+    where: ClassVar[List[pl.Expr]] = [pl.col("size").eq(0)]
+    select: ClassVar[List[pl.Expr]] = [pl.col("obj_key")]
+
+
+class SummarizeDatasets(SpecRule):
+    """Summarize the files of each dataset."""
+
+    group_by: ClassVar[List[str]] = ["dataset_id"]
+    agg: ClassVar[List[Union[pl.Expr, MergeableAgg]]] = [
+        agg_set(pl.col("workspace_dir")),
+        agg_count("num_files"),
+        agg_sum(pl.col("size").alias("total_size")),
+        agg_min(pl.col("size").alias("min_size")),
+        agg_max(pl.col("size").alias("max_size")),
+    ]
+
+
+def write_measurements(path: Path, seed: int) -> Path:
+    """Write a measurement file of two datasets."""
+    rows = 10 + seed
+    pl.DataFrame(
+        {
+            "dataset_id": [f"cpg000{i % 2}" for i in range(rows)],
+            "workspace_dir": [f"dir_{(i + seed) % 5}" for i in range(rows)],
+            "size": [(i * 7 + seed) % 13 for i in range(rows)],
+        }
+    ).write_parquet(path)
+    return path
+
+
+def summarize(df: pl.LazyFrame) -> pl.DataFrame:
+    """Summarize the datasets in a single aggregation, sorted to compare."""
+    return (
+        df.group_by("dataset_id")
+        .agg(
+            pl.col("workspace_dir").unique().sort(),
+            pl.len().alias("num_files"),
+            pl.col("size").sum().alias("total_size"),
+            pl.col("size").min().alias("min_size"),
+            pl.col("size").max().alias("max_size"),
+        )
+        .sort("dataset_id")
+        .collect()
+    )
+
+
+def test_rule_requires_validate(tmp_path: Path) -> None:
+    """Rules that are not specs fail at instantiation without `validate`."""
+
+    class CheckNothing(BaseRule):
+        """Rule without validation."""
+
+    with pytest.raises(TypeError):
+        CheckNothing(tmp_path)  # type: ignore
+
+
+def test_spec_rule_validate(tmp_path: Path) -> None:
+    """Spec rules validate on their own."""
+    df = pl.LazyFrame({"obj_key": ["a.csv", "b.csv"], "size": [0, 10]})
+    rule = CheckEmptyFiles(tmp_path)
+    assert rule.validate(df) is False
+    violations = pl.read_parquet(tmp_path.joinpath(rule.out_name))
+    assert violations.get_column("obj_key").to_list() == ["a.csv"]
+    assert rule.validate(df.filter(pl.col("size").ne(0))) is True
+
+
+def test_check_workspace_dirs(tmp_path: Path) -> None:
+    """Projects missing a required workspace dir are violations."""
+    complete = ["cpg0016-jump"] * len(REQUIRED_WORKSPACE_DIRS)
+    df = pl.LazyFrame(
+        {
+            "dataset_id": complete + ["cpg0037-oasis", "cpg0037-oasis"],
+            "workspace_dir": REQUIRED_WORKSPACE_DIRS + ["analysis", "None"],
+        }
+    )
+    rule = CheckWorkspaceDirs(tmp_path)
+    assert rule.validate(df) is False
+    violations = pl.read_parquet(tmp_path.joinpath(rule.out_name))
+    assert violations.get_column("dataset_id").to_list() == ["cpg0037-oasis"]
+    assert rule.validate(df.filter(pl.col("dataset_id").eq("cpg0016-jump"))) is True
+
+
+def test_rule_identity_is_stable() -> None:
+    """Identity of a rule without source does not depend on the process."""
+    identities = [
+        subprocess.run(
+            [sys.executable, "-c", RUNTIME_RULE_SCRIPT],
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in [1, 2]
+    ]
+    assert identities[0] != ""
+    assert identities[0] == identities[1]
+
+
+def test_partial_store_matches_full_recompute(tmp_path: Path) -> None:
+    """Merged partials equal a full recompute after a file is added."""
+    rule = SummarizeDatasets(tmp_path.joinpath("checks"))
+    assert rule.is_mergeable()
+    store_dir = tmp_path.joinpath("partials")
+    files = [write_measurements(tmp_path.joinpath(f"{i}.parquet"), i) for i in [0, 1]]
+    store = PartialStore(store_dir, files)
+    store.update([rule])
+    partials = {
+        path: path.stat().st_mtime_ns for path in store_dir.glob("**/*.parquet")
+    }
+
+    files.append(write_measurements(tmp_path.joinpath("2.parquet"), 2))
+    store = PartialStore(store_dir, files)
+    store.update([rule])
+    merged = store.plan(rule).with_columns(pl.col("workspace_dir").list.sort())
+    expected = summarize(pl.scan_parquet(files))
+    assert merged.sort("dataset_id").collect().equals(expected)
+    # Partials of the unchanged files are reused
+    assert all(path.stat().st_mtime_ns == mtime for path, mtime in partials.items())
+    assert len(list(store_dir.glob("**/*.parquet"))) == len(files)
+
+
+def test_rule_identity_includes_base_classes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Changes to the base classes of a rule change its identity."""
+    rule = CheckEmptyFiles(tmp_path)
+    identity = rule.get_identity()
+    get_class_source = cpgdata.rule.get_class_source
+    monkeypatch.setattr(
+        cpgdata.rule,
+        "get_class_source",
+        lambda cls: "changed" if cls is SpecRule else get_class_source(cls),
+    )
+    assert rule.get_identity() != identity
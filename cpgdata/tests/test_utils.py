@@ -0,0 +1,384 @@
+"""Tests of the inventory utilities."""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Generator, List
+
+import pyarrow.parquet as pq
+import pytest
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError, ResponseStreamingError
+from cpgdata.metrics import RunMetrics
+from cpgdata.parser import gen_projected_model
+from cpgdata.utils import (
+    INVENTORY_MANIFEST,
+    LISTING_UNREPORTED_FIELDS,
+    S3_INVENTORY_SCHEMA,
+    build_inventory,
+    download_s3_objects,
+    gen_s3_listing,
+    get_s3_client,
+    get_unreported_fields,
+    ls_s3_prefix,
+    parallel,
+    resume_s3_download,
+    slice_iterable,
+    sync_inventory,
+    sync_s3_objects,
+    sync_s3_prefix,
+)
+from moto import mock_aws
+from tqdm import tqdm
+
+BUCKET = "cellpainting-gallery"
+INVENTORY_BUCKET = "cellpainting-gallery-inventory"
+INVENTORY_PREFIX = "cellpainting-gallery/whole_bucket/"
+
+
+@pytest.fixture
+def s3_client(monkeypatch: pytest.MonkeyPatch) -> Generator[BaseClient, None, None]:
+    """Create an S3 client of a mocked S3 with the gallery buckets."""
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = get_s3_client()
+        client.create_bucket(Bucket=BUCKET)
+        client.create_bucket(Bucket=INVENTORY_BUCKET)
+        yield client
+
+
+class FlakyBody:
+    """Response body dropping the connection after some bytes."""
+
+    def __init__(self: "FlakyBody", body: Any, fail_after: int) -> None:  # noqa: ANN401
+        """Wrap a response body.
+
+        Parameters
+        ----------
+        body : botocore.response.StreamingBody
+            Body of the response.
+        fail_after : int
+            Number of bytes read before the connection drops.
+
+        """
+        self.body = body
+        self.fail_after = fail_after
+
+    def iter_chunks(self: "FlakyBody", chunk_size: int) -> Generator[bytes, None, None]:
+        """Yield some bytes, then fail like a dropped connection."""
+        yield self.body.read(self.fail_after)
+        raise ResponseStreamingError(error="Connection reset by peer")
+
+
+class FlakyClient:
+    """S3 client failing the first `get_object` calls with the given errors."""
+
+    def __init__(self: "FlakyClient", client: BaseClient, failures: List[Any]) -> None:
+        """Wrap a client.
+
+        Parameters
+        ----------
+        client : BaseClient
+            S3 client serving the requests that do not fail.
+        failures : List[Any]
+            Error raised by each failing request, or a number of bytes read
+            before the connection drops.
+
+        """
+        self.client = client
+        self.failures = failures
+        self.ranges: List[str] = []
+
+    def get_object(self: "FlakyClient", **kwargs: str) -> Dict[str, Any]:
+        """Get an object, failing the first calls."""
+        self.ranges.append(kwargs["Range"])
+        response = self.client.get_object(**kwargs)
+        if len(self.failures) == 0:
+            return response
+        failure = self.failures.pop(0)
+        if isinstance(failure, Exception):
+            raise failure
+        return {**response, "Body": FlakyBody(response["Body"], failure)}
+
+
+def gen_client_error(code: str, status: int) -> ClientError:
+    """Generate the error of a failed GetObject request."""
+    return ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "GetObject",
+    )
+
+
+def put_public_object(client: BaseClient, bucket: str, key: str, body: bytes) -> None:
+    """Upload a public object, the gallery is read anonymously."""
+    client.put_object(Bucket=bucket, Key=key, Body=body, ACL="public-read")
+
+
+@pytest.mark.parametrize("length,count", [(10, 3), (9, 3), (100, 7), (5, 5)])
+def test_slice_iterable(length: int, count: int) -> None:
+    """Slices cover the iterable in order with sizes differing by one at most."""
+    slices = slice_iterable(list(range(length)), count)
+    assert len(slices) == count
+    assert [item for s in slices for item in range(length)[s]] == list(range(length))
+    sizes = [s.stop - s.start for s in slices]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def offset_items(items: List[int], offset: int, job_idx: int = 0) -> List[int]:
+    """Offset the items of a task."""
+    return [item + offset for item in items]
+
+
+def test_parallel_dynamic() -> None:
+    """Outputs of dynamic tasks follow the input order, not the task order."""
+    items = list(range(8))
+    outputs = parallel(items, offset_items, [10], jobs=2, sizes=items, dynamic=True)
+    assert outputs == [[item + 10] for item in items]
+
+
+def test_build_local_inventory(tmp_path: Path) -> None:
+    """Local inventories leave unreported fields null and skip broken symlinks."""
+    root = tmp_path.joinpath("cpg0016-jump")
+    plate_dir = root.joinpath("source_4", "workspace", "profiles", "Batch1", "P1")
+    plate_dir.mkdir(parents=True)
+    plate_dir.joinpath("P1.parquet").write_bytes(b"0" * 100)
+    root.joinpath("README.md").write_text("readme")
+    plate_dir.joinpath("broken.csv").symlink_to(tmp_path.joinpath("missing.csv"))
+    out_file = tmp_path.joinpath("inventory", "inventory.parquet")
+
+    assert build_inventory(str(root), out_file, prefix="cpg0016-jump") == 2
+    rows = pq.read_table(out_file).sort_by("key").to_pylist()
+    assert [row["key"] for row in rows] == [
+        "cpg0016-jump/README.md",
+        "cpg0016-jump/source_4/workspace/profiles/Batch1/P1/P1.parquet",
+    ]
+    assert get_unreported_fields(out_file) == LISTING_UNREPORTED_FIELDS
+    model = gen_projected_model(
+        [
+            name
+            for name in S3_INVENTORY_SCHEMA.names
+            if name not in LISTING_UNREPORTED_FIELDS
+        ]
+    )
+    for row in rows:
+        assert all(row[name] is None for name in LISTING_UNREPORTED_FIELDS)
+        model.model_validate(row)
+        assert row["is_multipart_uploaded"] is False
+    assert rows[1]["size"] == 100
+
+
+@pytest.mark.parametrize("flatten", [False, True])
+def test_download_s3_objects(
+    s3_client: BaseClient, tmp_path: Path, flatten: bool
+) -> None:
+    """Objects are downloaded with or without their prefix structure."""
+    objects = {f"cpg0016-jump/source_{i}/a{i}.csv": f"{i}" * i for i in range(5)}
+    for key, body in objects.items():
+        put_public_object(s3_client, BUCKET, key, body.encode())
+
+    paths = download_s3_objects(
+        BUCKET, list(objects), tmp_path, flatten, client=s3_client, no_progress=True
+    )
+    for (key, body), path in zip(objects.items(), paths):
+        expected = tmp_path.joinpath(key.split("/")[-1] if flatten else key)
+        assert path == expected
+        assert path.read_text() == body
+
+
+def test_sync_inventory(s3_client: BaseClient, tmp_path: Path) -> None:
+    """The manifest of the requested revision is downloaded and synced."""
+    files = []
+    for i in range(3):
+        body = f"inventory {i}".encode()
+        key = f"{INVENTORY_PREFIX}data/{i}.parquet"
+        put_public_object(s3_client, INVENTORY_BUCKET, key, body)
+        md5 = hashlib.md5(body).hexdigest()
+        files.append({"key": key, "size": len(body), "MD5checksum": md5})
+    # Revisions sort before the data and hive dirs of the inventory
+    for revision, num_files in [("2024-01-01T01-00Z", 1), ("2024-01-02T01-00Z", 3)]:
+        manifest = {"files": files[:num_files]}
+        put_public_object(
+            s3_client,
+            INVENTORY_BUCKET,
+            f"{INVENTORY_PREFIX}{revision}/manifest.json",
+            json.dumps(manifest).encode(),
+        )
+    put_public_object(s3_client, INVENTORY_BUCKET, f"{INVENTORY_PREFIX}hive/x", b"")
+
+    sync_inventory(INVENTORY_BUCKET, INVENTORY_PREFIX, tmp_path, revision=1)
+    assert tmp_path.joinpath("2024-01-01T01-00Z", "manifest.json").exists()
+    synced = json.loads(tmp_path.joinpath(INVENTORY_MANIFEST).read_text())
+    assert synced["files"] == files[:1]
+    assert sorted(path.name for path in tmp_path.joinpath("data").iterdir()) == [
+        ".sync_state.json",
+        "0.parquet",
+    ]
+
+
+def put_sync_objects(client: BaseClient, num_objects: int) -> List[dict]:
+    """Upload objects to sync and get their manifest entries."""
+    objects = []
+    for i in range(num_objects):
+        body = f"{i}".encode() * 1000
+        key = f"{INVENTORY_PREFIX}data/{i}.parquet"
+        put_public_object(client, INVENTORY_BUCKET, key, body)
+        md5 = hashlib.md5(body).hexdigest()
+        objects.append({"key": key, "size": len(body), "MD5checksum": md5})
+    return objects
+
+
+def test_sync_s3_objects_skips_present(s3_client: BaseClient, tmp_path: Path) -> None:
+    """Present files are skipped, changed files are downloaded again."""
+    objects = put_sync_objects(s3_client, 3)
+    metrics = RunMetrics()
+    sync_s3_objects(INVENTORY_BUCKET, objects, tmp_path, s3_client, metrics=metrics)
+    assert metrics.counters == {
+        "bytes_read": 3000,
+        "bytes_written": 3000,
+        "files_downloaded": 3,
+    }
+
+    metrics = RunMetrics()
+    sync_s3_objects(INVENTORY_BUCKET, objects, tmp_path, s3_client, metrics=metrics)
+    assert metrics.counters == {"files_skipped": 3}
+
+    # Same size, so only the checksum tells the file changed
+    tmp_path.joinpath("1.parquet").write_bytes(b"x" * 1000)
+    metrics = RunMetrics()
+    paths = sync_s3_objects(
+        INVENTORY_BUCKET, objects, tmp_path, s3_client, metrics=metrics
+    )
+    assert metrics.counters["files_skipped"] == 2
+    assert metrics.counters["files_downloaded"] == 1
+    for obj, path in zip(objects, paths):
+        assert hashlib.md5(path.read_bytes()).hexdigest() == obj["MD5checksum"]
+
+
+def test_sync_s3_objects_resumes(s3_client: BaseClient, tmp_path: Path) -> None:
+    """Partial files of an interrupted sync are resumed."""
+    objects = put_sync_objects(s3_client, 1)
+    tmp_path.joinpath("0.parquet.part").write_bytes(b"0" * 400)
+    metrics = RunMetrics()
+    [path] = sync_s3_objects(
+        INVENTORY_BUCKET, objects, tmp_path, s3_client, metrics=metrics
+    )
+    assert metrics.counters["bytes_read"] == 600
+    assert path.read_bytes() == b"0" * 1000
+    assert not tmp_path.joinpath("0.parquet.part").exists()
+
+
+def test_sync_s3_prefix(s3_client: BaseClient, tmp_path: Path) -> None:
+    """Keys below the prefix are synced with their structure and filters."""
+    index_prefix = "cellpainting-gallery/index"
+    objects = {
+        f"{index_prefix}/cpg0016-jump/index.parquet": b"0" * 10,
+        f"{index_prefix}/cpg0016-jump/README.md": b"1" * 20,
+        f"{index_prefix}/cpg0016-jump/keep.md": b"2" * 30,
+        f"{index_prefix}2/other.parquet": b"3" * 40,
+    }
+    for key, body in objects.items():
+        put_public_object(s3_client, INVENTORY_BUCKET, key, body)
+
+    metrics = RunMetrics()
+    paths = sync_s3_prefix(
+        INVENTORY_BUCKET,
+        index_prefix,
+        tmp_path,
+        include="*keep.md",
+        exclude="*.md",
+        client=s3_client,
+        metrics=metrics,
+    )
+    assert sorted(paths) == [
+        tmp_path.joinpath("cpg0016-jump", "index.parquet"),
+        tmp_path.joinpath("cpg0016-jump", "keep.md"),
+    ]
+    assert metrics.counters["files_downloaded"] == 2
+    assert tmp_path.joinpath("cpg0016-jump", "keep.md").read_bytes() == b"2" * 30
+
+    metrics = RunMetrics()
+    sync_s3_prefix(
+        INVENTORY_BUCKET, index_prefix, tmp_path, client=s3_client, metrics=metrics
+    )
+    assert metrics.counters["files_skipped"] == 2
+    assert metrics.counters["files_downloaded"] == 1
+
+
+def test_resume_s3_download_retries(
+    s3_client: BaseClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Dropped connections, throttling and server errors are retried."""
+    monkeypatch.setattr("cpgdata.utils.S3_RETRY_BACKOFF", 0)
+    [obj] = put_sync_objects(s3_client, 1)
+    client = FlakyClient(
+        s3_client,
+        [
+            300,
+            gen_client_error("SlowDown", 503),
+            200,
+            gen_client_error("InternalError", 500),
+        ],
+    )
+    part_path = tmp_path.joinpath("0.parquet.part")
+    md5 = resume_s3_download(
+        client, INVENTORY_BUCKET, obj["key"], part_path, obj["size"], tqdm(disable=True)
+    )
+    assert md5.hexdigest() == obj["MD5checksum"]
+    assert part_path.read_bytes() == b"0" * 1000
+    assert client.ranges == [
+        "bytes=0-",
+        "bytes=300-",
+        "bytes=300-",
+        "bytes=500-",
+        "bytes=500-",
+    ]
+
+
+def test_resume_s3_download_raises(s3_client: BaseClient, tmp_path: Path) -> None:
+    """Errors that a retry does not fix are raised right away."""
+    [obj] = put_sync_objects(s3_client, 1)
+    client = FlakyClient(s3_client, [gen_client_error("AccessDenied", 403)])
+    with pytest.raises(ClientError):
+        resume_s3_download(
+            client,
+            INVENTORY_BUCKET,
+            obj["key"],
+            tmp_path.joinpath("0.parquet.part"),
+            obj["size"],
+            tqdm(disable=True),
+        )
+    assert client.ranges == ["bytes=0-"]
+
+
+def test_gen_s3_listing(s3_client: BaseClient) -> None:
+    """Listings fanned out at any depth have every key exactly once."""
+    keys = ["cpg0016-jump/README.md", "cpg0016-jump/source_4/a.csv"]
+    keys += [f"cpg0016-jump/source_{i}/workspace/b{i}.csv" for i in range(3)]
+    # More keys than a listing page in one subtree
+    keys += [f"cpg0016-jump/source_9/images/P1/{i:04}.tiff" for i in range(1100)]
+    for key in keys:
+        s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"")
+    s3_client.put_object(Bucket=BUCKET, Key="cpg0037-oasis/source_1/c.csv", Body=b"")
+
+    for fan_out_depth in [0, 1, 2, 3, 6]:
+        listed = [
+            key
+            for batch in gen_s3_listing(
+                BUCKET, "cpg0016-jump/", s3_client, fan_out_depth, max_concurrency=4
+            )
+            for key in batch.column("key").to_pylist()
+        ]
+        assert len(listed) == len(keys)
+        assert sorted(listed) == sorted(keys)
+
+
+def test_ls_s3_prefix(s3_client: BaseClient) -> None:
+    """Prefixes are listed one level down, or recursively."""
+    keys = ["cpg0016-jump/README.md", "cpg0016-jump/source_4/a.csv"]
+    for key in keys:
+        s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"")
+    assert ls_s3_prefix(BUCKET, "cpg0016-jump/", client=s3_client) == [
+        "source_4/",
+        "README.md",
+    ]
+    assert sorted(ls_s3_prefix(BUCKET, "cpg0016-jump/", True, s3_client)) == keys
@@ -1,11 +1,25 @@
+use arrow::{
+    array::{Array, ArrayData, ArrayRef, AsArray, Int64Builder, StringBuilder, make_array},
+    compute::concat,
+    datatypes::{DataType, Field, Schema},
+    error::ArrowError,
+    pyarrow::{PyArrowType, ToPyArrow},
+    record_batch::RecordBatch,
+};
 use pyo3::{
     exceptions::PyValueError,
-    types::PyModuleMethods,
-    prelude::{pyfunction, pymodule, wrap_pyfunction, PyModule, PyResult, Python, Bound},
+    types::{PyAnyMethods, PyModuleMethods},
+    prelude::{
+        pyclass, pyfunction, pymethods, pymodule, wrap_pyfunction, Bound, PyErr, PyModule,
+        PyObject, PyResult, Python,
+    },
 };
-use std::collections::HashMap;
+use std::collections::{BTreeMap, HashMap};
 use std::fmt;
+use std::sync::{Arc, Mutex};
+use std::thread;
 
+use pest::error::{Error, ErrorVariant, InputLocation};
 use pest::{Parser, Token};
 use pest_derive::Parser;
 
@@ -19,39 +33,570 @@ impl fmt::Display for Rule {
     }
 }
 
+/// Grammar rules that emit tokens, in the column order used by `parse_prefixes`.
+///
+/// Silent rules (`_{ ... }`) never show up in the token stream and are left out.
+const PREFIX_COLUMNS: [&str; 23] = [
+    "key",
+    "root_dir",
+    "sep",
+    "images",
+    "workspace",
+    "workspace_dl",
+    "dataset_id",
+    "source_id",
+    "batch_id",
+    "plate_id",
+    "well_id",
+    "site_id",
+    "well_site_id",
+    "plate_well_site_id",
+    "model_id",
+    "leaf_node",
+    "filename",
+    "extension",
+    "software_hash",
+    "software",
+    "hash",
+    "allowed_names",
+    "workspace_root_dir",
+];
+
+/// Name of the column holding the parser error message in `parse_prefixes`.
+const ERROR_COLUMN: &str = "error";
+
+/// Name of the column holding the grammar rule expected where parsing failed.
+const ERROR_RULE_COLUMN: &str = "error_rule";
+
+/// Name of the column holding the byte position where parsing failed.
+const ERROR_POS_COLUMN: &str = "error_pos";
+
+/// Number of columns returned by `parse_prefixes`.
+const NUM_COLUMNS: usize = PREFIX_COLUMNS.len() + 3;
+
+type PrefixSpans = [Option<(usize, usize)>; PREFIX_COLUMNS.len()];
+
+/// Parser error of a prefix.
+///
+/// The message does not quote the key, so errors of many keys share it.
+#[derive(Clone, Debug, PartialEq)]
+struct PrefixError {
+    /// Full error report, quoting the key and pointing at the position
+    report: String,
+    message: String,
+    /// First grammar rule expected where parsing failed
+    rule: Option<String>,
+    /// Byte position where parsing failed
+    pos: Option<usize>,
+}
+
+impl PrefixError {
+    fn null_key() -> Self {
+        PrefixError {
+            report: "key is null".to_string(),
+            message: "key is null".to_string(),
+            rule: None,
+            pos: None,
+        }
+    }
+
+    /// Convert to a `ValueError` whose only argument is the full report, as in
+    /// cpgparser < 0.5, with the `message`, `rule` and `pos` attributes.
+    fn into_py_err(self, py: Python<'_>) -> PyErr {
+        let err = PyValueError::new_err(self.report);
+        let value = err.value_bound(py);
+        // Setting attributes of a fresh exception instance does not fail
+        let _ = value.setattr("message", self.message);
+        let _ = value.setattr("rule", self.rule);
+        let _ = value.setattr("pos", self.pos);
+        err
+    }
+}
+
+impl From<Error<Rule>> for PrefixError {
+    fn from(e: Error<Rule>) -> Self {
+        let pos = match e.location {
+            InputLocation::Pos(pos) => pos,
+            InputLocation::Span((start, _)) => start,
+        };
+        let rule = match &e.variant {
+            ErrorVariant::ParsingError { positives, .. } => {
+                positives.first().map(|rule| rule.to_string())
+            }
+            ErrorVariant::CustomError { .. } => None,
+        };
+        PrefixError {
+            report: e.to_string(),
+            message: e.variant.message().into_owned(),
+            rule,
+            pos: Some(pos),
+        }
+    }
+}
+
+/// Column index of a grammar rule in `PREFIX_COLUMNS`.
+fn column_index(rule: Rule) -> Option<usize> {
+    match rule {
+        Rule::key => Some(0),
+        Rule::root_dir => Some(1),
+        Rule::sep => Some(2),
+        Rule::images => Some(3),
+        Rule::workspace => Some(4),
+        Rule::workspace_dl => Some(5),
+        Rule::dataset_id => Some(6),
+        Rule::source_id => Some(7),
+        Rule::batch_id => Some(8),
+        Rule::plate_id => Some(9),
+        Rule::well_id => Some(10),
+        Rule::site_id => Some(11),
+        Rule::well_site_id => Some(12),
+        Rule::plate_well_site_id => Some(13),
+        Rule::model_id => Some(14),
+        Rule::leaf_node => Some(15),
+        Rule::filename => Some(16),
+        Rule::extension => Some(17),
+        Rule::software_hash => Some(18),
+        Rule::software => Some(19),
+        Rule::hash => Some(20),
+        Rule::allowed_names => Some(21),
+        Rule::workspace_root_dir => Some(22),
+        _ => None,
+    }
+}
+
+/// Parse a prefix into byte spans, one per column of `PREFIX_COLUMNS`.
+///
+/// A rule matched more than once keeps the span of its last match.
+///
+/// * `prefix`: S3 prefix as a string
+fn parse_spans(prefix: &str) -> Result<PrefixSpans, PrefixError> {
+    let mut starts = [0usize; PREFIX_COLUMNS.len()];
+    let mut open = [false; PREFIX_COLUMNS.len()];
+    let mut spans: PrefixSpans = [None; PREFIX_COLUMNS.len()];
+    let key = KeyParser::parse(Rule::key, prefix)?;
+    for token in key.tokens() {
+        match token {
+            Token::Start { rule, pos } => {
+                if let Some(idx) = column_index(rule) {
+                    starts[idx] = pos.pos();
+                    open[idx] = true;
+                }
+            }
+            Token::End { rule, pos } => {
+                if let Some(idx) = column_index(rule) {
+                    if open[idx] {
+                        spans[idx] = Some((starts[idx], pos.pos()));
+                        open[idx] = false;
+                    }
+                }
+            }
+        }
+    }
+    Ok(spans)
+}
+
+/// Parse a prefix into a map from grammar rule to matched text.
+///
+/// * `prefix`: S3 prefix as a string
+fn parse_prefix_map(prefix: &str) -> Result<HashMap<String, String>, PrefixError> {
+    let spans = parse_spans(prefix)?;
+    Ok(PREFIX_COLUMNS
+        .iter()
+        .zip(spans)
+        .filter_map(|(name, span)| {
+            span.map(|(start, end)| (name.to_string(), prefix[start..end].to_string()))
+        })
+        .collect())
+}
+
 /// Parse S3 prefixs in Cell painting gallery.
 ///
+/// Raises a `ValueError` for keys that fail to parse. `str(e)` is the full
+/// parser report as before; the short message, the expected grammar rule and
+/// the byte position are available as `e.message`, `e.rule` and `e.pos`.
+///
 /// * `prefix`: S3 prefix as a string
 #[pyfunction]
-fn parse_prefix(prefix: String) -> PyResult<HashMap<String, String>> {
-    let mut token_pos0: HashMap<String, usize> = HashMap::new();
-    let mut parsed_prefix: HashMap<String, String> = HashMap::new();
-    let key = KeyParser::parse(Rule::key, &prefix);
-    match key {
-        Ok(key) => {
-            let key_tokens = key.tokens();
-            for token in key_tokens {
-                match token {
-                    Token::Start { rule, pos } => {
-                        token_pos0.insert(rule.to_string(), pos.pos());
-                    }
-                    Token::End { rule, pos } => {
-                        if let Some((_, v)) = token_pos0.remove_entry(&rule.to_string()) {
-                            let value: String = (&prefix[v..pos.pos()]).into();
-                            parsed_prefix.insert(rule.to_string(), value);
-                        }
+fn parse_prefix(py: Python<'_>, prefix: String) -> PyResult<HashMap<String, String>> {
+    parse_prefix_map(&prefix).map_err(|e| e.into_py_err(py))
+}
+
+/// Position of a span boundary relative to the leaf `filename.extension` of a key.
+#[derive(Clone, Copy, Debug, PartialEq)]
+enum Anchor {
+    Dir(usize),
+    LeafStart,
+    Dot,
+    AfterDot,
+    End,
+}
+
+/// Spans of a parsed key expressed as anchors, shared by all keys of a directory.
+type PrefixTemplate = [Option<(Anchor, Anchor)>; PREFIX_COLUMNS.len()];
+
+/// Byte offsets of the leaf `filename.extension` segment of a key.
+struct Leaf {
+    start: usize,
+    dot: usize,
+    end: usize,
+}
+
+impl Leaf {
+    fn anchor(&self, pos: usize) -> Option<Anchor> {
+        if pos < self.start {
+            Some(Anchor::Dir(pos))
+        } else if pos == self.start {
+            Some(Anchor::LeafStart)
+        } else if pos == self.dot {
+            Some(Anchor::Dot)
+        } else if pos == self.dot + 1 {
+            Some(Anchor::AfterDot)
+        } else if pos == self.end {
+            Some(Anchor::End)
+        } else {
+            None
+        }
+    }
+
+    fn position(&self, anchor: Anchor) -> usize {
+        match anchor {
+            Anchor::Dir(pos) => pos,
+            Anchor::LeafStart => self.start,
+            Anchor::Dot => self.dot,
+            Anchor::AfterDot => self.dot + 1,
+            Anchor::End => self.end,
+        }
+    }
+}
+
+fn is_name_char(c: &u8) -> bool {
+    c.is_ascii_alphanumeric() || matches!(c, b'_' | b'-' | b' ')
+}
+
+/// Split a key into its directory and a leaf matching `allowed_names "." allowed_names`.
+///
+/// The grammar can only branch on the directory part for such leaves, so all
+/// keys of a directory with a matching leaf share the same parse structure.
+///
+/// * `key`: S3 prefix as a string
+fn split_leaf(key: &str) -> Option<(&str, Leaf)> {
+    let start = key.rfind('/')? + 1;
+    let dot = start + key[start..].find('.')?;
+    let bytes = key.as_bytes();
+    let (name, ext) = (&bytes[start..dot], &bytes[dot + 1..]);
+    if name.is_empty() || ext.is_empty() || !name.iter().all(is_name_char) || !ext.iter().all(is_name_char) {
+        return None;
+    }
+    Some((&key[..start], Leaf { start, dot, end: key.len() }))
+}
+
+fn to_template(spans: &PrefixSpans, leaf: &Leaf) -> Option<PrefixTemplate> {
+    let mut template: PrefixTemplate = [None; PREFIX_COLUMNS.len()];
+    for (idx, span) in spans.iter().enumerate() {
+        if let Some((start, end)) = span {
+            template[idx] = Some((leaf.anchor(*start)?, leaf.anchor(*end)?));
+        }
+    }
+    Some(template)
+}
+
+fn apply_template(template: &PrefixTemplate, leaf: &Leaf) -> PrefixSpans {
+    let mut spans: PrefixSpans = [None; PREFIX_COLUMNS.len()];
+    for (idx, anchors) in template.iter().enumerate() {
+        if let Some((start, end)) = anchors {
+            spans[idx] = Some((leaf.position(*start), leaf.position(*end)));
+        }
+    }
+    spans
+}
+
+/// LRU cache of prefix templates keyed on the directory part of a key.
+struct DirCache {
+    capacity: usize,
+    tick: u64,
+    hits: usize,
+    misses: usize,
+    entries: HashMap<String, (u64, PrefixTemplate)>,
+    order: BTreeMap<u64, String>,
+}
+
+impl DirCache {
+    fn new(capacity: usize) -> Self {
+        DirCache {
+            capacity,
+            tick: 0,
+            hits: 0,
+            misses: 0,
+            entries: HashMap::new(),
+            order: BTreeMap::new(),
+        }
+    }
+
+    fn get(&mut self, dir: &str) -> Option<PrefixTemplate> {
+        match self.entries.get_mut(dir) {
+            Some(entry) => {
+                self.tick += 1;
+                if let Some(dir) = self.order.remove(&entry.0) {
+                    self.order.insert(self.tick, dir);
+                }
+                entry.0 = self.tick;
+                self.hits += 1;
+                Some(entry.1)
+            }
+            None => {
+                self.misses += 1;
+                None
+            }
+        }
+    }
+
+    fn insert(&mut self, dir: &str, template: PrefixTemplate) {
+        if self.capacity == 0 || self.entries.contains_key(dir) {
+            return;
+        }
+        if self.entries.len() >= self.capacity {
+            if let Some((_, oldest)) = self.order.pop_first() {
+                self.entries.remove(&oldest);
+            }
+        }
+        self.tick += 1;
+        self.order.insert(self.tick, dir.to_string());
+        self.entries.insert(dir.to_string(), (self.tick, template));
+    }
+
+    fn clear(&mut self) {
+        self.entries.clear();
+        self.order.clear();
+        self.hits = 0;
+        self.misses = 0;
+    }
+}
+
+/// Parse a prefix into byte spans, reusing the parse of keys in the same directory.
+///
+/// * `prefix`: S3 prefix as a string
+/// * `cache`: Directory cache shared by all parser threads
+fn parse_spans_cached(prefix: &str, cache: &Mutex<DirCache>) -> Result<PrefixSpans, PrefixError> {
+    let (dir, leaf) = match split_leaf(prefix) {
+        Some(split) => split,
+        None => return parse_spans(prefix),
+    };
+    let cached = cache.lock().expect("prefix cache lock poisoned").get(dir);
+    if let Some(template) = cached {
+        return Ok(apply_template(&template, &leaf));
+    }
+    // Errors are not cached since their position depends on the whole key
+    let spans = parse_spans(prefix)?;
+    if let Some(template) = to_template(&spans, &leaf) {
+        cache.lock().expect("prefix cache lock poisoned").insert(dir, template);
+    }
+    Ok(spans)
+}
+
+/// Parse a slice of prefixes into one string column per grammar rule plus the error columns.
+///
+/// * `keys`: S3 prefixes, `None` for missing values
+/// * `parse`: Function parsing a single prefix into spans
+fn parse_keys<F>(keys: &[Option<&str>], parse: &F) -> Vec<ArrayRef>
+where
+    F: Fn(&str) -> Result<PrefixSpans, PrefixError>,
+{
+    let mut builders: Vec<StringBuilder> = (0..PREFIX_COLUMNS.len() + 2)
+        .map(|_| StringBuilder::with_capacity(keys.len(), 0))
+        .collect();
+    let mut pos_builder = Int64Builder::with_capacity(keys.len());
+    let error_idx = PREFIX_COLUMNS.len();
+    let rule_idx = error_idx + 1;
+    for key in keys.iter().copied() {
+        let parsed = match key {
+            Some(key) => parse(key),
+            None => Err(PrefixError::null_key()),
+        };
+        match parsed {
+            Ok(spans) => {
+                // Key is always present when parsing succeeded
+                let key = key.unwrap_or_default();
+                for (builder, span) in builders.iter_mut().zip(spans.iter()) {
+                    match span {
+                        Some((start, end)) => builder.append_value(&key[*start..*end]),
+                        None => builder.append_null(),
                     }
                 }
+                builders[error_idx].append_null();
+                builders[rule_idx].append_null();
+                pos_builder.append_null();
+            }
+            Err(e) => {
+                for builder in builders.iter_mut().take(error_idx) {
+                    builder.append_null();
+                }
+                builders[error_idx].append_value(e.message);
+                builders[rule_idx].append_option(e.rule);
+                pos_builder.append_option(e.pos.map(|pos| pos as i64));
             }
-            return Ok(parsed_prefix);
         }
-        Err(e) => return Err(PyValueError::new_err(e.to_string())),
+    }
+    let mut columns: Vec<ArrayRef> = builders
+        .iter_mut()
+        .map(|builder| Arc::new(builder.finish()) as ArrayRef)
+        .collect();
+    columns.push(Arc::new(pos_builder.finish()));
+    columns
+}
+
+/// Parse a slice of prefixes on `n_threads` native threads, keeping the input order.
+///
+/// * `keys`: S3 prefixes, `None` for missing values
+/// * `n_threads`: Number of threads, `0` uses all available cores
+/// * `parse`: Function parsing a single prefix into spans
+fn parse_keys_parallel<F>(
+    keys: &[Option<&str>],
+    n_threads: usize,
+    parse: &F,
+) -> Result<Vec<ArrayRef>, ArrowError>
+where
+    F: Fn(&str) -> Result<PrefixSpans, PrefixError> + Sync,
+{
+    let n_threads = match n_threads {
+        0 => thread::available_parallelism().map(|n| n.get()).unwrap_or(1),
+        n => n,
+    };
+    if n_threads <= 1 || keys.len() < 2 {
+        return Ok(parse_keys(keys, parse));
+    }
+    let chunk_size = (keys.len() + n_threads - 1) / n_threads;
+    let parts: Vec<Vec<ArrayRef>> = thread::scope(|s| {
+        let handles: Vec<_> = keys
+            .chunks(chunk_size)
+            .map(|chunk| s.spawn(move || parse_keys(chunk, parse)))
+            .collect();
+        handles
+            .into_iter()
+            .map(|handle| handle.join().expect("prefix parser thread panicked"))
+            .collect()
+    });
+    (0..NUM_COLUMNS)
+        .map(|idx| {
+            let arrays: Vec<&dyn Array> = parts.iter().map(|part| part[idx].as_ref()).collect();
+            concat(&arrays)
+        })
+        .collect()
+}
+
+/// Collect the values of an arrow string array.
+///
+/// * `array`: Arrow array of type `string`, `large_string` or `string_view`
+fn string_values(array: &ArrayRef) -> PyResult<Vec<Option<&str>>> {
+    match array.data_type() {
+        DataType::Utf8 => Ok(array.as_string::<i32>().iter().collect()),
+        DataType::LargeUtf8 => Ok(array.as_string::<i64>().iter().collect()),
+        DataType::Utf8View => Ok(array.as_string_view().iter().collect()),
+        data_type => Err(PyValueError::new_err(format!(
+            "Expected a string array, got an array of type {data_type}"
+        ))),
+    }
+}
+
+/// Schema of the record batch returned by `parse_prefixes`.
+fn prefixes_schema() -> Schema {
+    let mut fields: Vec<Field> = PREFIX_COLUMNS
+        .iter()
+        .map(|name| Field::new(*name, DataType::Utf8, true))
+        .collect();
+    fields.push(Field::new(ERROR_COLUMN, DataType::Utf8, true));
+    fields.push(Field::new(ERROR_RULE_COLUMN, DataType::Utf8, true));
+    fields.push(Field::new(ERROR_POS_COLUMN, DataType::Int64, true));
+    Schema::new(fields)
+}
+
+/// Parse prefixes into a record batch with the `prefixes_schema`.
+fn prefixes_batch<F>(keys: &[Option<&str>], n_threads: usize, parse: &F) -> Result<RecordBatch, ArrowError>
+where
+    F: Fn(&str) -> Result<PrefixSpans, PrefixError> + Sync,
+{
+    let columns = parse_keys_parallel(keys, n_threads, parse)?;
+    RecordBatch::try_new(Arc::new(prefixes_schema()), columns)
+}
+
+/// Parse a column of S3 prefixs in Cell painting gallery.
+///
+/// Returns a `pyarrow.RecordBatch` with one column per grammar rule and, for
+/// keys that failed to parse, the parser error in the `error` column, the
+/// expected grammar rule in `error_rule` and the byte position in `error_pos`.
+/// Parsing runs with the GIL released and is split across `n_threads`
+/// native threads; rows are returned in input order.
+///
+/// * `keys`: S3 prefixes as a `pyarrow` string array
+/// * `n_threads`: Number of threads, `0` uses all available cores
+#[pyfunction]
+#[pyo3(signature = (keys, n_threads=1))]
+fn parse_prefixes(py: Python<'_>, keys: PyArrowType<ArrayData>, n_threads: usize) -> PyResult<PyObject> {
+    let keys = make_array(keys.0);
+    let values = string_values(&keys)?;
+    let batch = py
+        .allow_threads(|| prefixes_batch(&values, n_threads, &parse_spans))
+        .map_err(|e| PyValueError::new_err(e.to_string()))?;
+    batch.to_pyarrow(py)
+}
+
+/// Prefix parser with a LRU cache keyed on the directory part of the keys.
+///
+/// Keys sharing a directory only differ in their leaf `filename.extension`,
+/// so the directory is parsed once and later keys only remap the leaf spans.
+#[pyclass]
+struct PrefixParser {
+    cache: Mutex<DirCache>,
+}
+
+#[pymethods]
+impl PrefixParser {
+    /// * `cache_size`: Maximum number of cached directories, `0` disables the cache
+    #[new]
+    #[pyo3(signature = (cache_size=4096))]
+    fn new(cache_size: usize) -> Self {
+        PrefixParser {
+            cache: Mutex::new(DirCache::new(cache_size)),
+        }
+    }
+
+    /// Parse a column of S3 prefixs, same as the module level `parse_prefixes`.
+    ///
+    /// * `keys`: S3 prefixes as a `pyarrow` string array
+    /// * `n_threads`: Number of threads, `0` uses all available cores
+    #[pyo3(signature = (keys, n_threads=1))]
+    fn parse_prefixes(&self, py: Python<'_>, keys: PyArrowType<ArrayData>, n_threads: usize) -> PyResult<PyObject> {
+        let keys = make_array(keys.0);
+        let values = string_values(&keys)?;
+        let cache = &self.cache;
+        let batch = py
+            .allow_threads(|| {
+                prefixes_batch(&values, n_threads, &|key: &str| parse_spans_cached(key, cache))
+            })
+            .map_err(|e| PyValueError::new_err(e.to_string()))?;
+        batch.to_pyarrow(py)
+    }
+
+    /// Cache statistics with `hits`, `misses`, `maxsize` and `currsize`.
+    fn cache_info(&self) -> HashMap<&'static str, usize> {
+        let cache = self.cache.lock().expect("prefix cache lock poisoned");
+        HashMap::from([
+            ("hits", cache.hits),
+            ("misses", cache.misses),
+            ("maxsize", cache.capacity),
+            ("currsize", cache.entries.len()),
+        ])
+    }
+
+    /// Clear the cache and its statistics.
+    fn cache_clear(&self) {
+        self.cache.lock().expect("prefix cache lock poisoned").clear();
     }
 }
 
 #[pyfunction]
 fn parse_prefix_allow_threads(py: Python<'_>, prefix: String) -> PyResult<HashMap<String, String>> {
-    py.allow_threads(|| parse_prefix(prefix))
+    py.allow_threads(|| parse_prefix_map(&prefix))
+        .map_err(|e| e.into_py_err(py))
 }
 
 /// A Python module implemented in Rust.
@@ -59,25 +604,112 @@ fn parse_prefix_allow_threads(py: Python<'_>, prefix: String) -> PyResult<HashMa
 fn cpgparser(m: &Bound<'_, PyModule>) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(parse_prefix, m)?)?;
     m.add_function(wrap_pyfunction!(parse_prefix_allow_threads, m)?)?;
+    m.add_function(wrap_pyfunction!(parse_prefixes, m)?)?;
+    m.add_class::<PrefixParser>()?;
     Ok(())
 }
 
 #[cfg(test)]
 mod tests {
-    use crate::parse_prefix;
+    use crate::{
+        parse_keys, parse_keys_parallel, parse_prefix_map, parse_spans, parse_spans_cached,
+        prefixes_schema, DirCache, ERROR_POS_COLUMN, NUM_COLUMNS, PREFIX_COLUMNS,
+    };
+    use std::sync::Mutex;
+    use arrow::array::{Array, AsArray};
+    use arrow::datatypes::Int64Type;
 
     #[test]
     fn check_smaple_001() {
         let prefix: String = "cpg0000-jump-pilot/source_4/images/2020_11_04_CPJUMP1/illum/BR00116991/BR00116991_IllumHighZBF.npy".to_string();
-        let _ = parse_prefix(prefix);
+        let _ = parse_prefix_map(&prefix);
         // assert_eq!()
     }
 
     #[test]
     fn check_smaple_002() {
         let prefix: String = "cpg0037-oasis/axiom/workspace/scratch/prod_25/plate_41002688/biochem.parquet".to_string();
-        let res = parse_prefix(prefix);
+        let res = parse_prefix_map(&prefix);
         println!("{:?}", res);
         // assert_eq!()
     }
+
+    #[test]
+    fn check_parse_keys() {
+        let keys = [
+            Some("cpg0016-jump/source_4/workspace/profiles/2021_04_26_Batch1/BR00121424/BR00121424.parquet"),
+            None,
+        ];
+        let columns = parse_keys(&keys, &parse_spans);
+        assert_eq!(columns.len(), NUM_COLUMNS);
+        let plate_id = columns[9].as_string::<i32>();
+        assert_eq!(plate_id.value(0), "BR00121424");
+        assert!(plate_id.is_null(1));
+        let workspace_root_dir = columns[22].as_string::<i32>();
+        assert_eq!(
+            workspace_root_dir.value(0),
+            "profiles/2021_04_26_Batch1/BR00121424/BR00121424.parquet"
+        );
+        let errors = columns[PREFIX_COLUMNS.len()].as_string::<i32>();
+        assert!(errors.is_null(0));
+        assert!(errors.is_valid(1));
+        let error_pos = columns[NUM_COLUMNS - 1].as_primitive::<Int64Type>();
+        assert!(error_pos.is_null(0));
+    }
+
+    #[test]
+    fn check_parse_keys_error() {
+        // Dataset id without a separator, pest expects `sep` at byte 12
+        let keys = [Some("cpg0016-jump")];
+        let columns = parse_keys(&keys, &parse_spans);
+        let expected = parse_spans(keys[0].unwrap()).unwrap_err();
+        let errors = columns[PREFIX_COLUMNS.len()].as_string::<i32>();
+        assert_eq!(errors.value(0), expected.message);
+        assert!(!expected.report.is_empty());
+        let error_pos = columns[NUM_COLUMNS - 1].as_primitive::<Int64Type>();
+        assert_eq!(error_pos.value(0), 12);
+        assert_eq!(expected.rule.as_deref(), Some("sep"));
+    }
+
+    #[test]
+    fn check_parse_keys_parallel() {
+        let keys: Vec<Option<&str>> = vec![
+            Some("cpg0016-jump/source_4/images/2021_04_26_Batch1/illum/BR00121424/BR00121424_IllumDNA.npy"),
+            Some("cpg0016-jump/source_4/workspace/profiles/2021_04_26_Batch1/BR00121424/BR00121424.parquet"),
+            Some("cpg0016-jump/source_4/workspace/backend/2021_04_26_Batch1/BR00121425/BR00121425.sqlite"),
+            None,
+            Some("cpg0016-jump/source_4/workspace/load_data_csv/2021_04_26_Batch1/BR00121426/load_data.csv"),
+        ];
+        let serial = parse_keys(&keys, &parse_spans);
+        let parallel = parse_keys_parallel(&keys, 3, &parse_spans).unwrap();
+        assert_eq!(serial.len(), parallel.len());
+        let pos_idx = prefixes_schema().index_of(ERROR_POS_COLUMN).unwrap();
+        for (idx, (lhs, rhs)) in serial.iter().zip(parallel.iter()).enumerate() {
+            if idx == pos_idx {
+                assert_eq!(lhs.as_primitive::<Int64Type>(), rhs.as_primitive::<Int64Type>());
+            } else {
+                assert_eq!(lhs.as_string::<i32>(), rhs.as_string::<i32>());
+            }
+        }
+    }
+
+    #[test]
+    fn check_parse_spans_cached() {
+        let cache = Mutex::new(DirCache::new(2));
+        let keys = [
+            "cpg0016-jump/source_4/images/2021_04_26_Batch1/images/BR00121424/r01c01f01p01-ch1sk1fk1fl1.tiff",
+            "cpg0016-jump/source_4/images/2021_04_26_Batch1/images/BR00121424/r01c01f02p01-ch2sk1fk1fl1.tiff",
+            "cpg0016-jump/source_4/images/2021_04_26_Batch1/images/BR00121424/x.npy",
+            "cpg0016-jump/source_4/workspace/analysis/2021_04_26_Batch1/BR00121424/analysis/BR00121424-A01-1/Cells.csv",
+            "cpg0016-jump/x.csv",
+            "cpg0016-jump/y.parquet",
+            "cpg0016-jump/no_extension",
+        ];
+        for key in keys {
+            assert_eq!(parse_spans_cached(key, &cache), parse_spans(key));
+        }
+        let cache = cache.lock().unwrap();
+        assert_eq!(cache.hits, 3);
+        assert!(cache.entries.len() <= 2);
+    }
 }